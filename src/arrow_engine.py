@@ -0,0 +1,274 @@
+"""
+Columnar conversion engine of the JsonConverter based on pyarrow. The pyarrow package is an optional dependency
+installed with the "arrow" extra.
+
+The input CSV is read in column batches and whole typed columns are cast and serialized into JSON values at once.
+The JSON objects of the rows are then joined column-wise using the nested structure of the row conversion plan,
+so the payloads are serialized JSON documents and no Python objects are built for the rows. Columns that cannot be
+cast as a whole (e.g. numbers mixed with text in autodetected columns) fall back to the per-value cast of the plan,
+so the resulting documents are equal to the row by row conversion.
+"""
+
+import csv
+import io
+import json
+import logging
+import time
+from typing import Callable, Dict, Generator, List, Optional
+
+from json_converter import (
+    FALSE_VALUES,
+    FLOAT_PATTERN,
+    INTEGER_PATTERN,
+    TRUE_VALUES,
+    RowConversionPlan,
+    cast_bool,
+    cast_inferred,
+    cast_number,
+    cast_string,
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    from pyarrow import csv as pa_csv
+except ImportError:
+    pa = None
+
+DEFAULT_BLOCK_SIZE = 16 * 1024 * 1024
+CONTROL_CHARACTERS_PATTERN = "[\\x00-\\x1f]"
+
+
+def is_available() -> bool:
+    return pa is not None
+
+
+def to_binary_stream(in_stream) -> io.IOBase:
+    """
+    Returns a seekable binary stream of the text stream opened by the writer.
+    """
+    if isinstance(in_stream, io.TextIOWrapper):
+        return in_stream.buffer
+    if isinstance(in_stream, io.StringIO):
+        return io.BytesIO(in_stream.getvalue().encode("utf-8"))
+    return in_stream
+
+
+def _read_header(binary_stream) -> Optional[List[str]]:
+    """
+    Reads the header and leaves the stream positioned at the first data row.
+    """
+    lines = (line.decode("utf-8") for line in iter(binary_stream.readline, b""))
+    return next(csv.reader(lines, lineterminator="\n"), None)
+
+
+def _has_data(binary_stream) -> bool:
+    if hasattr(binary_stream, "peek"):
+        # sliced and compressed tables are not seekable
+        return bool(binary_stream.peek(1))
+    data_start = binary_stream.tell()
+    has_data = bool(binary_stream.read(1))
+    binary_stream.seek(data_start)
+    return has_data
+
+
+# ########### VECTORIZED CASTS, return JSON values of the whole column or None if the column must be cast per value
+
+
+def _all(mask) -> bool:
+    return pc.all(mask).as_py() is not False
+
+
+def _any(mask) -> bool:
+    return pc.any(mask).as_py() is True
+
+
+def _to_json_values(column):
+    return pc.fill_null(pc.cast(column, pa.string()), "null")
+
+
+def _cast_string_column(column):
+    if _any(pc.match_substring_regex(column, CONTROL_CHARACTERS_PATTERN)):
+        return None
+    escaped = pc.replace_substring(pc.replace_substring(column, "\\", "\\\\"), '"', '\\"')
+    return pc.binary_join_element_wise('"', escaped, '"', "")
+
+
+def _cast_number_column(column):
+    if not _all(pc.or_(pc.match_substring_regex(column, FLOAT_PATTERN.pattern), pc.equal(column, ""))):
+        return None
+    column = pc.if_else(pc.equal(column, ""), pa.scalar(None, pa.string()), column)
+    is_integer = pc.match_substring_regex(column, INTEGER_PATTERN.pattern)
+    if _all(is_integer):
+        return _to_json_values(pc.cast(column, pa.int64()))
+    if not _any(is_integer):
+        values = pc.cast(column, pa.float64())
+        # e.g. 1e999 out of the float range, not a number in JSON
+        if not _all(pc.is_finite(values)):
+            return None
+        return _to_json_floats(values)
+    return None
+
+
+def _to_json_floats(column):
+    # arrow formats the floats differently (e.g. 100000 or 1e-7), the python repr is what json.dumps produces
+    float_repr = float.__repr__
+    return pa.array(
+        ["null" if value is None else float_repr(value) for value in column.to_pylist()], pa.string()
+    )
+
+
+def _cast_bool_column(column):
+    lowered = pc.utf8_lower(column)
+    is_true = pc.is_in(lowered, value_set=pa.array(sorted(TRUE_VALUES)))
+    is_false = pc.is_in(lowered, value_set=pa.array(sorted(FALSE_VALUES)))
+    is_empty = pc.equal(column, "")
+    if not _all(pc.or_(pc.or_(is_true, is_false), is_empty)):
+        return None
+    return pc.if_else(is_empty, "null", pc.if_else(is_true, "true", "false"))
+
+
+def _cast_inferred_column(column):
+    is_number = pc.match_substring_regex(column, FLOAT_PATTERN.pattern)
+    lowered = pc.utf8_lower(column)
+    is_bool = pc.or_(pc.equal(lowered, "true"), pc.equal(lowered, "false"))
+    if not _any(pc.or_(is_number, is_bool)):
+        return _cast_string_column(column)
+    if _all(is_number):
+        return _cast_number_column(column)
+    if _all(is_bool):
+        return pc.if_else(pc.equal(lowered, "true"), "true", "false")
+    return None
+
+
+VECTORIZED_CASTS: Dict[Callable, Callable] = {
+    cast_string: _cast_string_column,
+    cast_number: _cast_number_column,
+    cast_bool: _cast_bool_column,
+    cast_inferred: _cast_inferred_column,
+}
+
+
+class ArrowBatchConverter:
+    """
+    Converts the CSV into serialized JSON payloads in column batches using the row conversion plan
+    of the JsonConverter.
+    """
+
+    def __init__(self, converter, block_size: int = DEFAULT_BLOCK_SIZE):
+        if not is_available():
+            raise ValueError('The "arrow" conversion engine requires the pyarrow package to be installed.')
+        self.converter = converter
+        self.block_size = block_size
+
+    def convert_stream(self, in_stream) -> Generator[bytes, None, None]:
+        binary_stream = to_binary_stream(in_stream)
+        header = _read_header(binary_stream)
+        if not header or not _has_data(binary_stream):
+            logging.warning("The file is empty!")
+            return
+
+        try:
+            batch_reader = pa_csv.open_csv(
+                binary_stream,
+                read_options=pa_csv.ReadOptions(column_names=header, block_size=self.block_size),
+                parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+                convert_options=pa_csv.ConvertOptions(
+                    column_types={name: pa.string() for name in header},
+                    strings_can_be_null=False,
+                    quoted_strings_can_be_null=False,
+                ),
+            )
+        except pa.ArrowInvalid as e:
+            raise ValueError(f"Failed to read the input CSV: {e}") from e
+
+        chunk_size = self.converter.chunk_size
+        plan: Optional[RowConversionPlan] = None
+        pending: List[str] = []
+
+        start = time.perf_counter()
+        while True:
+            try:
+                batch = batch_reader.read_next_batch()
+            except StopIteration:
+                break
+            except pa.ArrowInvalid as e:
+                raise ValueError(f"Failed to read the input CSV: {e}") from e
+            if batch.num_rows == 0:
+                continue
+
+            if plan is None:
+                plan = self._build_plan(header, batch)
+            pending.extend(self._convert_batch(plan, batch))
+
+            full_chunks_end = len(pending) - len(pending) % chunk_size
+            for offset in range(0, full_chunks_end, chunk_size):
+                chunk_end = offset + chunk_size
+                yield self._finish_chunk(pending[offset:chunk_end], start)
+                start = time.perf_counter()
+            del pending[:full_chunks_end]
+
+        if pending:
+            yield self._finish_chunk(pending, start)
+        else:
+            self.converter.conversion_seconds += time.perf_counter() - start
+
+    def _build_plan(self, header: List[str], first_batch) -> RowConversionPlan:
+        converter = self.converter
+        sample_rows = None
+        if converter.infer_data_types and converter.inference_sample_size:
+            sample = first_batch.slice(0, converter.inference_sample_size)
+            sample_rows = [list(row) for row in zip(*(column.to_pylist() for column in sample.columns))]
+        return converter.build_plan(header, sample_rows)
+
+    def _finish_chunk(self, rows: List[str], start: float) -> bytes:
+        converter = self.converter
+        data = converter.serialize_chunk(rows)
+        converter.rows_converted += len(rows)
+        converter.conversion_seconds += time.perf_counter() - start
+        return data
+
+    @staticmethod
+    def _cast_column(column_plan, column):
+        vectorized_cast = VECTORIZED_CASTS.get(column_plan.cast)
+        if vectorized_cast:
+            try:
+                values = vectorized_cast(column)
+                if values is not None:
+                    return values
+            except pa.ArrowInvalid:
+                # e.g. integers out of the int64 range
+                pass
+        cast = column_plan.cast
+        try:
+            return pa.array([json.dumps(cast(value)) for value in column.to_pylist()], pa.string())
+        except ValueError as e:
+            raise ValueError(f'Invalid value of the column "{column_plan.name}": {e}') from e
+
+    def _convert_batch(self, plan: RowConversionPlan, batch) -> List[str]:
+        # arrow requires the same number of columns in all rows, the width always matches the header
+        values_by_index = {
+            column_plan.index: self._cast_column(column_plan, batch.column(column_plan.index))
+            for column_plan in plan.columns
+        }
+        parts = []
+        self._append_object_parts(plan.structure, values_by_index, parts)
+        return pc.binary_join_element_wise(*parts, "").to_pylist()
+
+    def _append_object_parts(self, node: dict, values_by_index: dict, parts: list):
+        # the nested structure is resolved once per batch, literal parts are merged with their neighbours
+        self._append_literal(parts, "{")
+        for position, (key, value) in enumerate(node.items()):
+            self._append_literal(parts, ("," if position else "") + json.dumps(key) + ":")
+            if isinstance(value, dict):
+                self._append_object_parts(value, values_by_index, parts)
+            else:
+                parts.append(values_by_index[value])
+        self._append_literal(parts, "}")
+
+    @staticmethod
+    def _append_literal(parts: list, literal: str):
+        if parts and isinstance(parts[-1], str):
+            parts[-1] += literal
+        else:
+            parts.append(literal)
@@ -3,27 +3,61 @@ Template Component main class.
 
 """
 
+import codecs
 import csv
 import gzip
 import io
+import functools
+import json
 import logging
 import os
 import shutil
 import sys
 import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Optional
 
 from keboola.component import UserException
 from keboola.component.base import ComponentBase
+from keboola.component.dao import SupportedDataTypes, TableDefinition
 
 # parameters variables
 from configuration import WriterConfiguration, build_configuration, ValidationError, ConfigHelpers
 from http_generic.auth import AuthMethodBuilder, AuthBuilderError
-from http_generic.client import GenericHttpClient
+from dry_run import DryRunHttpClient, DryRunReport
+from http_generic.cassette import Cassette, CassetteError
+from http_generic.circuit_breaker import CircuitBreaker
+from http_generic.client import GenericHttpClient, RetryableRequestError
+from http_generic.hedging import HedgingPolicy
 from json_converter import JsonConverter
+from lanes import LanesStopped, OrderedLanes
+from multipart import SPOOL_MEMORY_SIZE, MultipartBody
+from ndjson import CONTENT_TYPE as NDJSON_CONTENT_TYPE, NdjsonConverter
+from pipeline import JsonPipeline
+from record_index import RecordIndex
+from request_dedup import RequestDeduplicator
+from retry_queue import DeferredRetryQueue
+from sharding import get_shard_slices, open_shard
+from table_reader import build_header, is_gzip, list_slices, open_table_stream
 from user_functions import UserFunctions
 
 
 KEY_USER_PARS = "user_parameters"
+# state
+KEY_STATE_AUTH_TOKEN = "#auth_token"
+# next row to send by table name, kept when writing of a table fails
+KEY_STATE_ROW_CHECKPOINTS = "row_checkpoints"
+
+# storage base types to datatypes of the JSON conversion, other base types (e.g. DATE) except STRING are sent as strings
+STORAGE_TYPES_MAPPING = {
+    SupportedDataTypes.INTEGER.value: "number",
+    SupportedDataTypes.NUMERIC.value: "number",
+    SupportedDataTypes.FLOAT.value: "number",
+    SupportedDataTypes.BOOLEAN.value: "bool",
+}
 
 KEY_PATH = "path"
 KEY_MODE = "mode"
@@ -52,10 +86,72 @@ MANDATORY_PARS = [KEY_PATH]
 MANDATORY_IMAGE_PARS = []
 
 SUPPORTED_MODES = ["JSON", "BINARY", "BINARY-GZ"]
+# content types with the request body kept in memory, so the failed requests can be retried later
+DEFERRED_RETRY_CONTENT_TYPES = ["JSON", "JSON_URL_ENCODED", "EMPTY_REQUEST"]
 
 APP_VERSION = "0.0.1"
 
 
+@dataclass
+class TableResult:
+    """
+    Result and metrics of writing a single input table.
+    """
+
+    table_name: str
+    rows_converted: int = 0
+    requests_sent: int = 0
+    # duplicate requests not sent
+    requests_skipped: int = 0
+    seconds: float = 0.0
+    error: Optional[Exception] = None
+    # known for the indexed tables only
+    rows_total: Optional[int] = None
+    start_row: int = 0
+    rows_sent: int = 0
+    resumable: bool = False
+    # identifies the content of the table the checkpoint belongs to, see Component._get_table_identity
+    table_identity: Optional[dict] = None
+    # requests failed with a retryable error are retried later, see Component._send_request
+    retry_queue: Optional[DeferredRetryQueue] = None
+    # the counters are updated by the lanes sending the iterations at the same time
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def add(self, requests_sent: int = 0, rows_converted: int = 0, requests_skipped: int = 0):
+        with self._lock:
+            self.requests_sent += requests_sent
+            self.rows_converted += rows_converted
+            self.requests_skipped += requests_skipped
+
+    def to_dict(self) -> dict:
+        return {
+            "rows_converted": self.rows_converted,
+            "requests_sent": self.requests_sent,
+            "requests_skipped": self.requests_skipped,
+            "seconds": round(self.seconds, 3),
+            "error": str(self.error) if self.error else None,
+        }
+
+    def get_progress(self, elapsed_seconds: float) -> str:
+        if self.rows_total is None:
+            return ""
+        rows_done = self.start_row + self.rows_sent
+        percent = round(100 * rows_done / self.rows_total, 1) if self.rows_total else 100.0
+        progress = f", rows {rows_done}/{self.rows_total} ({percent} %)"
+        if self.rows_sent:
+            eta = elapsed_seconds / self.rows_sent * (self.rows_total - rows_done)
+            progress += f", ETA {round(eta)} s"
+        return progress
+
+    def log(self):
+        status = f"failed: {self.error}" if self.error else "finished"
+        logging.info(
+            f'Table "{self.table_name}" {status}, {self.rows_converted} rows converted, '
+            f"{self.requests_sent} requests sent in {round(self.seconds, 2)} s"
+            + (f", {self.requests_skipped} duplicate requests skipped" if self.requests_skipped else "")
+        )
+
+
 class Component(ComponentBase):
     def __init__(self):
         super().__init__()
@@ -65,6 +161,13 @@ class Component(ComponentBase):
 
         self._configuration: WriterConfiguration = None
         self._client: GenericHttpClient = None
+        self._dry_run_report: DryRunReport = None
+        self._state: dict = {}
+        self._deferred_retries = False
+        self._deduplicator: Optional[RequestDeduplicator] = None
+        # the CA certificate and the client certificate & key written to temp files, see _write_certificates
+        self._ca_cert_file = ""
+        self._client_cert_key_file = ""
 
     def init_component(self):
         try:
@@ -88,24 +191,123 @@ class Component(ComponentBase):
             raise UserException(e) from e
 
         # init client
-        self._client = GenericHttpClient(
+        max_retries = self._configuration.api.retry_config.max_retries
+        self._deferred_retries = self._use_deferred_retries()
+        if self._deferred_retries:
+            # the failed requests are retried by the deferred retry queue instead
+            max_retries = 0
+        client_parameters = dict(
             base_url=self._configuration.api.base_url,
-            max_retries=self._configuration.api.retry_config.max_retries,
+            max_retries=max_retries,
             backoff_factor=self._configuration.api.retry_config.backoff_factor,
             status_forcelist=self._configuration.api.retry_config.codes,
             auth_method=auth_method,
+            transport=self._configuration.api.transport,
+            pool_size=self._configuration.api.connection.pool_size,
+            max_hosts=self._configuration.api.connection.max_hosts,
+            keep_alive_timeout=self._configuration.api.connection.keep_alive_timeout,
+            preconnect=self._configuration.api.connection.preconnect,
+            max_requests_per_host=self._configuration.api.connection.max_requests_per_host,
         )
+        circuit_breaker_cfg = self._configuration.api.retry_config.circuit_breaker
+        if circuit_breaker_cfg.enabled:
+            client_parameters["circuit_breaker"] = CircuitBreaker(
+                consecutive_failures=circuit_breaker_cfg.consecutive_failures,
+                error_rate=circuit_breaker_cfg.error_rate,
+                window_size=circuit_breaker_cfg.window_size,
+                open_seconds=circuit_breaker_cfg.open_seconds,
+                max_probes=circuit_breaker_cfg.max_probes,
+            )
+        try:
+            client_parameters["cassette"] = Cassette.from_environment(self.data_folder_path)
+        except CassetteError as e:
+            raise UserException(e) from e
+
+        try:
+            client_parameters["hedging"] = self._build_hedging_policy()
+            self._deduplicator = self._build_deduplicator()
+            if self._configuration.dry_run.enabled:
+                logging.warning("Running in dry run mode, no requests will be sent.")
+                self._dry_run_report = DryRunReport(self._configuration.dry_run.sample_requests)
+                self._client = DryRunHttpClient(report=self._dry_run_report, **client_parameters)
+            else:
+                self._client = GenericHttpClient(**client_parameters)
+        except ValueError as e:
+            raise UserException(e) from e
+        self._write_certificates()
         # to prevent field larger than field limit (131072) Errors
         # https://stackoverflow.com/questions/15063936/csv-error-field-larger-than-field-limit-131072
         csv.field_size_limit(sys.maxsize)
 
+    def _write_certificates(self):
+        """
+        Writes the CA certificate and the client certificate & key provided by the user to temp files. They are written
+        once, the same paths are used by all requests, so the requests share the pooled connections (the paths are
+        part of the connection pool key).
+        """
+        self._remove_certificates()
+        api_cfg = self._configuration.api
+        if api_cfg.ca_cert:
+            with tempfile.NamedTemporaryFile("w", delete=False) as cafp:
+                self._ca_cert_file = cafp.name
+                cafp.write(api_cfg.ca_cert)
+        if api_cfg.client_cert_key:
+            with tempfile.NamedTemporaryFile("w", delete=False) as ccfp:
+                self._client_cert_key_file = ccfp.name
+                ccfp.write(api_cfg.client_cert_key)
+
+    def _remove_certificates(self):
+        for path in (self._ca_cert_file, self._client_cert_key_file):
+            if path and os.path.exists(path):
+                os.remove(path)
+        self._ca_cert_file = ""
+        self._client_cert_key_file = ""
+
+    def _build_hedging_policy(self) -> Optional[HedgingPolicy]:
+        hedging_cfg = self._configuration.api.hedging
+        if not hedging_cfg.enabled:
+            return None
+        if self._configuration.partitioning.lanes > 1:
+            # the discarded duplicate may still be sent after the next request of the same key
+            logging.warning("Hedging is not supported with the partitioning lanes keeping the order, disabling.")
+            return None
+        policy = HedgingPolicy(
+            delay=hedging_cfg.delay,
+            percentile=hedging_cfg.percentile,
+            min_samples=hedging_cfg.min_samples,
+            max_ratio=hedging_cfg.max_ratio,
+            allow_non_idempotent=hedging_cfg.allow_non_idempotent,
+        )
+        method = self._configuration.request_parameters.method
+        if not policy.applies_to(method):
+            logging.warning(f"The {method} requests are not idempotent, they are not hedged.")
+        return policy
+
+    def _build_deduplicator(self) -> Optional[RequestDeduplicator]:
+        content_cfg = self._configuration.request_content
+        if not content_cfg.deduplication.enabled:
+            return None
+        if content_cfg.content_type != "EMPTY_REQUEST" or not content_cfg.iterate_by_columns:
+            logging.warning("Deduplication is supported by the EMPTY_REQUEST iterations only, ignoring.")
+            return None
+        return RequestDeduplicator(content_cfg.deduplication.max_entries)
+
     def run(self):
         """
         Main execution code
         """
         self.init_component()
+        self._load_state()
+        try:
+            self._write_data()
+        finally:
+            self._client.close()
+            self._remove_certificates()
+            self._store_state()
+
+    def _write_data(self):
         # login if auth method specified
-        self._client.login()
+        self._client.login(self._load_token_state())
 
         logging.info("Processing input mapping.")
 
@@ -114,33 +316,189 @@ class Component(ComponentBase):
         if len(in_tables) == 0:
             logging.exception("There is no table specified on the input mapping! You must provide one input table!")
             exit(1)
-        elif len(in_tables) > 1:
-            logging.warning(
-                "There is more than one table specified on the input mapping! You must provide one input table!"
+
+        results = self._write_tables(in_tables)
+
+        if self._dry_run_report:
+            for result in results:
+                self._dry_run_report.add_table_result(result.table_name, result.to_dict())
+            self._dry_run_report.log_summary()
+            report_path = self._dry_run_report.write(self.files_out_path)
+            logging.info(f"Dry run report written to {report_path}")
+
+        logging.info("Writer finished")
+
+    def _write_tables(self, in_tables: List[TableDefinition]) -> List[TableResult]:
+        """
+        Writes all input tables, concurrently if configured, sharing the client (connection pool and login).
+        """
+        results = [TableResult(in_table.name) for in_table in in_tables]
+        if len(in_tables) == 1:
+            self._write_table(in_tables[0], results[0])
+            results[0].log()
+            return results
+
+        concurrency = max(self._configuration.input_tables.concurrency, 1)
+        logging.info(f"Writing {len(in_tables)} input tables, {concurrency} at a time.")
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="table") as executor:
+            for in_table, result in zip(in_tables, results):
+                executor.submit(self._write_table_safe, in_table, result)
+
+        for result in results:
+            result.log()
+        failed = [result for result in results if result.error]
+        for result in failed:
+            if not isinstance(result.error, UserException):
+                raise result.error
+        if failed:
+            raise UserException(
+                f"Failed to write {len(failed)} of {len(results)} tables: "
+                + "; ".join(f'"{result.table_name}": {result.error}' for result in failed)
             )
+        return results
 
-        in_table = in_tables[0]
+    def _write_table_safe(self, in_table: TableDefinition, result: TableResult):
+        try:
+            self._write_table(in_table, result)
+        except Exception as e:
+            logging.error(f'Writing of the table "{in_table.name}" failed: {e}')
+            result.error = e
 
-        api_cfg = self._configuration.api
+    def _get_table_endpoint_path(self, in_table: TableDefinition) -> str:
+        endpoint_paths = self._configuration.input_tables.endpoint_paths
+        table_name = in_table.name
+        for name in (table_name, os.path.splitext(table_name)[0]):
+            if name in endpoint_paths:
+                return endpoint_paths[name]
+        return self._configuration.request_parameters.endpoint_path
+
+    def _use_deferred_retries(self) -> bool:
+        deferred_cfg = self._configuration.api.retry_config.deferred
+        if not deferred_cfg.enabled or self._configuration.dry_run.enabled:
+            return False
+        content_type = self._configuration.request_content.content_type
+        if content_type not in DEFERRED_RETRY_CONTENT_TYPES:
+            logging.warning(f"Deferred retries are not supported by the {content_type} content type, ignoring.")
+            return False
+        return True
+
+    def _write_table(self, in_table: TableDefinition, result: TableResult):
+        start = time.perf_counter()
+        logging.info(f'Writing table "{in_table.name}".')
+        result.retry_queue = self._build_retry_queue() if self._deferred_retries else None
+        try:
+            self._send_table(in_table, result)
+        except BaseException:
+            if result.retry_queue:
+                result.retry_queue.cancel()
+            raise
+        if result.retry_queue:
+            try:
+                result.retry_queue.drain()
+            finally:
+                result.add(requests_sent=result.retry_queue.succeeded)
+        result.seconds = time.perf_counter() - start
+
+    def _build_retry_queue(self) -> DeferredRetryQueue:
+        deferred_cfg = self._configuration.api.retry_config.deferred
+        return DeferredRetryQueue(
+            self._client.send_request,
+            max_attempts=deferred_cfg.max_attempts,
+            backoff_factor=deferred_cfg.backoff_factor,
+            max_backoff=deferred_cfg.max_backoff,
+            workers=deferred_cfg.workers,
+            max_pending=deferred_cfg.max_pending,
+        )
+
+    def _send_table(self, in_table: TableDefinition, result: TableResult):
         content_cfg = self._configuration.request_content
         request_cfg = self._configuration.request_parameters
         # iteration mode
         iteration_mode = content_cfg.iterate_by_columns
+        storage_column_types = None
+        if content_cfg.json_mapping and content_cfg.json_mapping.column_data_types.use_storage_types:
+            storage_column_types = self._get_storage_column_types(in_table)
         iteration_data = [{}]
         has_iterations = False
+        # the rows of the iteration are sent as one file
+        group_iterations = content_cfg.content_type == "MULTIPART"
 
         # TODO: add support for "chunked" iteration mode, sending requests in bulk grouped by iteration parameters
         if iteration_mode:
             has_iterations = True
-            iteration_data = self._get_iter_data(in_table.full_path)
+            if group_iterations:
+                iteration_data = self._get_iteration_groups(in_table)
+            else:
+                iteration_data = self._get_iter_data(in_table)
             logging.warning("Iteration parameters mode found, running multiple iterations.")
         logging.info(f"Sending data in content type: {content_cfg.content_type}, using {request_cfg.method} method")
+        lanes = self._build_lanes(has_iterations)
         # running iterations
+        try:
+            self._run_iterations(
+                in_table, result, iteration_data, has_iterations, group_iterations, storage_column_types, lanes
+            )
+        except LanesStopped:
+            # the error of the failed lane is raised when closing the lanes
+            pass
+        except BaseException:
+            if lanes:
+                lanes.cancel()
+            raise
+        if lanes:
+            lanes.close()
+
+    def _build_lanes(self, has_iterations: bool) -> Optional[OrderedLanes]:
+        partitioning_cfg = self._configuration.partitioning
+        if partitioning_cfg.lanes <= 1:
+            return None
+        if not has_iterations:
+            logging.warning("Partitioning is supported in the iteration mode only, sending the requests one by one.")
+            return None
+        if self._deferred_retries:
+            # a deferred request is sent after the following requests of the same key
+            logging.warning(
+                "Partitioning is not supported with the deferred retries not keeping the order, "
+                "sending the requests one by one."
+            )
+            return None
+        logging.info(f"Sending the iterations in {partitioning_cfg.lanes} ordered lanes.")
+        return OrderedLanes(partitioning_cfg.lanes, partitioning_cfg.queue_size)
+
+    def _get_partition_key(self, iter_data_row: dict) -> tuple:
+        key_columns = self._configuration.partitioning.key_columns
+        key_columns = key_columns or self._configuration.request_content.iterate_by_columns
+        try:
+            return tuple(iter_data_row[column] for column in key_columns)
+        except KeyError as e:
+            raise UserException(
+                f"The partitioning key column {e} does not exist in the data, please check for typos / case."
+            ) from e
+
+    def _run_iterations(
+        self,
+        in_table: TableDefinition,
+        result: TableResult,
+        iteration_data,
+        has_iterations: bool,
+        group_iterations: bool,
+        storage_column_types: Optional[dict],
+        lanes: Optional[OrderedLanes],
+    ):
+        api_cfg = self._configuration.api
+        content_cfg = self._configuration.request_content
+        request_cfg = self._configuration.request_parameters
         for index, iter_data_row in enumerate(iteration_data):
             iter_params = {}
             log_output = (index % 50) == 0
             in_stream = None
-            if has_iterations:
+            partition_key = None
+            if lanes:
+                # before the iteration columns are cut out of the row
+                partition_key = self._get_partition_key(iter_data_row[0] if group_iterations else iter_data_row)
+            if has_iterations and group_iterations:
+                iter_params, in_stream = iter_data_row
+            elif has_iterations:
                 iter_params = self._cut_out_iteration_params(iter_data_row)
                 # change source table with iteration data row
                 in_stream = self._create_iteration_data_table(iter_data_row)
@@ -162,68 +520,274 @@ class Component(ComponentBase):
             timeout = api_cfg.timeout
 
             # SSL verification parameters
-            # if user provided CA certificate or client certificate & key, those will be written to a temp file and used
-            if not api_cfg.ca_cert:
-                ca_cert_file = ""
-            else:
-                with tempfile.NamedTemporaryFile("w", delete=False) as cafp:
-                    ca_cert_file = cafp.name
-                    cafp.write(api_cfg.ca_cert)
-
-            if not api_cfg.client_cert_key:
-                client_cert_key_file = ""
-            else:
-                with tempfile.NamedTemporaryFile("w", delete=False) as ccfp:
-                    client_cert_key_file = ccfp.name
-                    ccfp.write(api_cfg.client_cert_key)
-
-            verify = ca_cert_file if ca_cert_file else api_cfg.ssl_verification
+            # the CA certificate or client certificate & key provided by the user are written to temp files once
+            verify = self._ca_cert_file if self._ca_cert_file else api_cfg.ssl_verification
 
             request_parameters = {
                 "params": query_parameters,
                 "headers": new_headers,
                 "timeout": timeout,
                 "verify": verify,
-                "cert": client_cert_key_file,
+                "cert": self._client_cert_key_file,
+                # resolved for each iteration, the shared client is not changed
+                "base_url": self._apply_iteration_params(api_cfg.base_url, iter_params),
             }
 
-            endpoint_path = request_cfg.endpoint_path
+            endpoint_path = self._get_table_endpoint_path(in_table)
             endpoint_path = self._apply_iteration_params(endpoint_path, iter_params)
-            self._client.base_url = self._apply_iteration_params(self._client.base_url, iter_params)
 
             if has_iterations and log_output:
                 logging.info(f"Running iteration nr. {index}")
             if log_output:
                 logging.info("Building parameters..")
 
-            if content_cfg.content_type in ["JSON", "JSON_URL_ENCODED"]:
-                if not in_stream:
-                    # if no iterations
-                    in_stream = open(in_table.full_path, mode="rt", encoding="utf-8")
-                self.send_json_data(in_stream, endpoint_path, request_parameters, log=not has_iterations)
-                in_stream.close()
-
-            elif content_cfg.content_type == "EMPTY_REQUEST":
-                # send empty request
-                self._client.send_request(method=request_cfg.method, endpoint_path=endpoint_path, **request_parameters)
-
-            elif content_cfg.content_type in ["BINARY", "BINARY_GZ"]:
-                if not in_stream:
-                    in_stream = open(in_table.full_path, mode="rb")
-                else:
-                    # in case of iteration mode
-                    in_stream = io.BytesIO(bytes(in_stream.getvalue(), "utf-8"))
-                self.send_binary_data(endpoint_path, request_parameters, in_stream)
-                in_stream.close()
+            if self._deduplicator and self._deduplicator.is_duplicate(
+                request_cfg.method,
+                self._client.build_url(request_parameters["base_url"], endpoint_path),
+                request_parameters["params"],
+                request_parameters["headers"],
+            ):
+                result.add(requests_skipped=1)
+                continue
 
-        logging.info("Writer finished")
+            file_name = None
+            if content_cfg.content_type == "MULTIPART":
+                file_name = self._apply_iteration_params(content_cfg.multipart.file_name or in_table.name, iter_params)
+            send_iteration = functools.partial(
+                self._send_iteration,
+                in_table,
+                endpoint_path,
+                request_parameters,
+                in_stream,
+                log=not has_iterations,
+                storage_column_types=storage_column_types,
+                file_name=file_name,
+                user_params=user_params,
+                result=result,
+            )
+            if lanes:
+                lanes.submit(partition_key, send_iteration)
+            else:
+                send_iteration()
+
+    def _send_iteration(
+        self,
+        in_table: TableDefinition,
+        endpoint_path: str,
+        request_parameters: dict,
+        in_stream,
+        log: bool,
+        storage_column_types: Optional[dict],
+        file_name: Optional[str],
+        user_params: dict,
+        result: TableResult,
+    ):
+        content_cfg = self._configuration.request_content
+        request_cfg = self._configuration.request_parameters
+        if content_cfg.content_type in ["JSON", "JSON_URL_ENCODED", "NDJSON"]:
+            if not in_stream:
+                # if no iterations
+                in_stream = self._open_input_table(in_table, result=result)
+            send_data = self.send_ndjson_data if content_cfg.content_type == "NDJSON" else self.send_json_data
+            send_data(
+                in_stream,
+                endpoint_path,
+                request_parameters,
+                log=log,
+                storage_column_types=storage_column_types,
+                result=result,
+            )
+            in_stream.close()
+
+        elif content_cfg.content_type == "EMPTY_REQUEST":
+            # send empty request
+            self._send_request(result, method=request_cfg.method, endpoint_path=endpoint_path, **request_parameters)
+
+        elif content_cfg.content_type in ["BINARY", "BINARY_GZ"]:
+            if not in_stream:
+                in_stream = self._open_input_table(in_table, binary=True)
+            else:
+                # in case of iteration mode
+                in_stream = io.BytesIO(bytes(in_stream.getvalue(), "utf-8"))
+            self.send_binary_data(endpoint_path, request_parameters, in_stream, result=result)
+            in_stream.close()
+
+        elif content_cfg.content_type == "MULTIPART":
+            if not in_stream:
+                in_stream = self._open_input_table(in_table, binary=True)
+            self.send_multipart_data(
+                endpoint_path, request_parameters, in_stream, file_name, user_params, result=result
+            )
+            in_stream.close()
+
+    def _persist_token(self) -> bool:
+        authentication = self._configuration.api.authentication
+        return bool(authentication and authentication.persist_token)
+
+    def _load_state(self):
+        if self._persist_token() or self._configuration.input_tables.resume:
+            self._state = self.get_state_file() or {}
+
+    def _load_token_state(self):
+        if not self._persist_token():
+            return None
+        token_state = self._state.get(KEY_STATE_AUTH_TOKEN)
+        if not token_state:
+            return None
+        try:
+            return json.loads(token_state)
+        except (TypeError, ValueError):
+            logging.warning("The persisted login token is invalid, logging in again.")
+            return None
+
+    def _store_state(self):
+        state = dict(self._state)
+        token_state = self._client.get_token_state() if self._persist_token() else None
+        if token_state:
+            # stored as a string in an encrypted (#) key
+            state[KEY_STATE_AUTH_TOKEN] = json.dumps(token_state)
+        if token_state or self._configuration.input_tables.resume:
+            self.write_state_file(state)
+
+    def _update_checkpoint(self, result: Optional[TableResult], completed: bool):
+        if not result or not result.resumable:
+            return
+        checkpoints = self._state.setdefault(KEY_STATE_ROW_CHECKPOINTS, {})
+        if completed:
+            checkpoints.pop(result.table_name, None)
+        else:
+            checkpoints[result.table_name] = {
+                "row": result.start_row + result.rows_sent,
+                "table": result.table_identity,
+            }
+
+    def _get_checkpoint(self, in_table: TableDefinition, table_identity: dict) -> int:
+        """
+        Returns the row checkpointed by the previous run, 0 if the table changed since (e.g. a new incremental load
+        under the same name) or the checkpoint was stored without the table identity.
+        """
+        checkpoint = self._state.get(KEY_STATE_ROW_CHECKPOINTS, {}).get(in_table.name)
+        if not checkpoint:
+            return 0
+        if not isinstance(checkpoint, dict) or checkpoint.get("table") != table_identity:
+            logging.warning(
+                f'The table "{in_table.name}" is not the one checkpointed by the previous run, sending all rows.'
+            )
+            return 0
+        return checkpoint["row"]
+
+    @staticmethod
+    def _get_table_identity(in_table: TableDefinition, row_count: int) -> dict:
+        """
+        Identifies the content of the input table. The file modification time is not used, the tables are copied
+        to the data folder by each job.
+        """
+        return {
+            "id": in_table.id,
+            "last_import_date": in_table.last_import_date,
+            "size": os.path.getsize(in_table.full_path),
+            "rows": row_count,
+        }
+
+    def _open_input_table(self, in_table: TableDefinition, binary: bool = False, result: TableResult = None):
+        """
+        Opens the input table as a single CSV stream with the header. Compressed files and sliced tables
+        are decompressed and streamed on the fly, only the shard of the table is read if the sharding is configured.
+        The rows of a plain CSV file are indexed if the result is collected (progress and resume).
+        """
+        input_tables_cfg = self._configuration.input_tables
+        sharded = input_tables_cfg.shard_count != 1 or input_tables_cfg.shard_index != 0
+        slice_paths = list_slices(in_table.full_path)
+
+        header = None
+        if not in_table.has_header:
+            if not in_table.column_names:
+                raise UserException(f'The columns of the table "{in_table.name}" are missing in the manifest.')
+            header = build_header(in_table.column_names)
+
+        try:
+            if sharded and in_table.is_sliced:
+                slice_paths = get_shard_slices(
+                    slice_paths, input_tables_cfg.shard_index, input_tables_cfg.shard_count
+                )
+            elif sharded:
+                if is_gzip(in_table.full_path):
+                    raise UserException(
+                        f'The table "{in_table.name}" is compressed, only uncompressed or sliced tables can be sharded.'
+                    )
+                return open_shard(
+                    in_table.full_path, input_tables_cfg.shard_index, input_tables_cfg.shard_count, binary
+                )
+        except ValueError as e:
+            raise UserException(f"Invalid input_tables sharding configuration: {e}") from e
 
-    def _get_iter_data(self, iteration_pars_path):
-        with open(iteration_pars_path, mode="rt", encoding="utf-8") as in_file:
+        if result and not binary and not header and not in_table.is_sliced and not is_gzip(in_table.full_path):
+            return self._open_indexed_table(in_table, result)
+        return open_table_stream(slice_paths, header, input_tables_cfg.slice_workers, binary)
+
+    def _open_indexed_table(self, in_table: TableDefinition, result: TableResult):
+        start = time.perf_counter()
+        with RecordIndex(in_table.full_path) as index:
+            seconds = round(time.perf_counter() - start, 2)
+            logging.info(f'Table "{in_table.name}" has {index.row_count} rows, indexed in {seconds} s.')
+            result.rows_total = index.row_count
+            result.resumable = self._is_resumable()
+            if result.resumable:
+                result.table_identity = self._get_table_identity(in_table, index.row_count)
+                result.start_row = min(self._get_checkpoint(in_table, result.table_identity), index.row_count)
+                if result.start_row:
+                    logging.warning(f'Resuming table "{in_table.name}" from the checkpointed row {result.start_row}.')
+            return index.open_rows(result.start_row)
+
+    def _is_resumable(self) -> bool:
+        """
+        The rows are checkpointed only if they are sent in the order of the table.
+        """
+        json_mapping = self._configuration.request_content.json_mapping
+        return bool(
+            self._configuration.input_tables.resume
+            and not self._dry_run_report
+            and not self._configuration.request_content.iterate_by_columns
+            and not self._configuration.api.retry_config.deferred.enabled
+            and (
+                self._configuration.request_content.content_type == "NDJSON"
+                or json_mapping is None
+                or json_mapping.preserve_order
+                or json_mapping.workers <= 1
+            )
+        )
+
+    def _get_iter_data(self, in_table: TableDefinition):
+        with self._open_input_table(in_table) as in_file:
             reader = csv.DictReader(in_file, lineterminator="\n")
             for r in reader:
                 yield r
 
+    def _get_iteration_groups(self, in_table: TableDefinition):
+        """
+        Groups the consecutive rows with the same iteration parameters values. Yields the parameters and the rest of
+        the columns of the group rows as a binary CSV stream, spooled to a temporary file if the group is large.
+        """
+        group_params = None
+        group_stream = None
+        writer = None
+        for iter_data_row in self._get_iter_data(in_table):
+            iter_params = self._cut_out_iteration_params(iter_data_row)
+            if group_stream is None or iter_params != group_params:
+                if group_stream is not None:
+                    group_stream.seek(0)
+                    yield group_params, group_stream
+                group_params = iter_params
+                group_stream = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_SIZE)
+                writer = csv.DictWriter(
+                    codecs.getwriter("utf-8")(group_stream), fieldnames=iter_data_row.keys(), lineterminator="\n"
+                )
+                writer.writeheader()
+            writer.writerow(iter_data_row)
+        if group_stream is not None:
+            group_stream.seek(0)
+            yield group_params, group_stream
+
     def _cut_out_iteration_params(self, iter_data_row):
         """
         Cuts out iteration columns from data row and returns current iteration parameters values
@@ -267,7 +831,40 @@ class Component(ComponentBase):
             request_parameters[h["key"]] = val
         return request_parameters
 
-    def send_json_data(self, in_stream, url, additional_request_params, log=True):
+    @staticmethod
+    def _get_storage_column_types(in_table: TableDefinition) -> dict:
+        """
+        Builds the column datatypes from the base types of the input table manifest. Columns without a base type
+        are left out, so their type is still detected (unless the autodetect is disabled). The STRING base type is
+        what the untyped tables report for all columns, so it is left out as well.
+        """
+        column_types = {}
+        if not isinstance(in_table.schema, dict):
+            return column_types
+        for name, column in in_table.schema.items():
+            data_types = column.data_types or {}
+            dtype = getattr(data_types.get("base"), "dtype", None)
+            if not dtype or dtype.upper() == SupportedDataTypes.STRING.value:
+                continue
+            column_types[name] = STORAGE_TYPES_MAPPING.get(dtype.upper(), "string")
+        logging.debug(f"Column datatypes from the input table manifest: {column_types}")
+        return column_types
+
+    def _send_request(self, result: Optional[TableResult], **kwargs):
+        try:
+            self._client.send_request(**kwargs)
+        except RetryableRequestError as e:
+            if not result or not result.retry_queue:
+                raise
+            logging.warning(f"{e} The request will be retried later.")
+            result.retry_queue.defer(kwargs, e)
+            return
+        if result:
+            result.add(requests_sent=1)
+
+    def send_json_data(
+        self, in_stream, url, additional_request_params, log=True, storage_column_types=None, result=None
+    ):
         # returns nested JSON schema for input.csv
         request_parameters = self._configuration.request_parameters
         request_content = self._configuration.request_content
@@ -277,37 +874,142 @@ class Component(ComponentBase):
             logging.warning("Running in JSON_URL_ENCODED mode, overriding chunk size to 1")
             json_params.chunk_size = 1
             json_params.request_data_wrapper = None
+            if json_params.engine != "python" or json_params.workers > 1:
+                logging.warning("Running in JSON_URL_ENCODED mode, converting the rows in the main process")
+                json_params.engine = "python"
+                json_params.workers = 0
 
-        converter = JsonConverter(
-            nesting_delimiter=json_params.nesting_delimiter,
-            chunk_size=json_params.chunk_size,
-            infer_data_types=json_params.column_data_types.autodetect,
-            column_data_types=json_params.column_data_types.datatype_override,
-            column_name_override=json_params.column_names_override,
-            data_wrapper=json_params.request_data_wrapper,
-        )
-
-        reader = csv.reader(in_stream, lineterminator="\n")
+        converter = self._build_json_converter(storage_column_types)
+        chunk_counter = 0
 
-        # convert rows
-        i = 1
-        for json_payload in converter.convert_stream(reader):
+        def send_payload(json_payload):
+            nonlocal chunk_counter
+            chunk_counter += 1
             if log:
-                logging.info(f"Sending JSON data chunk {i}")
+                logging.info(
+                    f"Sending JSON data chunk {chunk_counter}"
+                    + (result.get_progress(time.perf_counter() - start) if result else "")
+                )
             logging.debug(f"Sending  Payload: {json_payload} ")
 
-            if request_content.content_type == "JSON":
+            if request_content.content_type == "JSON" and isinstance(json_payload, bytes):
+                # already serialized by the arrow engine or the conversion workers
+                additional_request_params["data"] = json_payload
+                additional_request_params["headers"] = self._with_content_type(
+                    additional_request_params.get("headers"), "application/json"
+                )
+            elif request_content.content_type == "JSON":
                 additional_request_params["json"] = json_payload
             elif request_content.content_type == "JSON_URL_ENCODED":
                 additional_request_params["data"] = json_payload
             else:
                 raise ValueError(f"Invalid JSON content type: {request_content.content_type}")
 
-            self._client.send_request(method=request_parameters.method, endpoint_path=url, **additional_request_params)
-            i += 1
+            self._send_request(result, method=request_parameters.method, endpoint_path=url, **additional_request_params)
+            if result:
+                # only the last chunk may be smaller, all its rows are converted by then (the chunk size of the
+                # converter is never empty, all the rows are sent in a single chunk without the chunk_size)
+                result.rows_sent = min(result.rows_sent + converter.chunk_size, rows_sent + converter.rows_converted)
+
+        # convert rows
+        pipeline_cfg = self._configuration.pipeline
+        start = time.perf_counter()
+        rows_sent = result.rows_sent if result else 0
+        completed = False
+        try:
+            if pipeline_cfg.enabled:
+                pipeline = JsonPipeline(pipeline_cfg.read_buffer, pipeline_cfg.convert_buffer)
+                pipeline.run(in_stream, converter, send_payload)
+            else:
+                for json_payload in converter.convert_file(in_stream):
+                    send_payload(json_payload)
+            completed = True
+        except ValueError as e:
+            raise UserException(f"Failed to convert the input data: {e}") from e
+        finally:
+            self._update_checkpoint(result, completed)
         in_stream.close()
 
-    def send_binary_data(self, url, additional_request_params, in_stream):
+        if result:
+            result.add(rows_converted=converter.rows_converted)
+        if self._dry_run_report:
+            self._dry_run_report.add_conversion(converter.rows_converted, converter.conversion_seconds)
+
+    @staticmethod
+    def _with_content_type(headers: dict, content_type: str) -> dict:
+        headers = headers or {}
+        if any(name.lower() == "content-type" for name in headers):
+            return headers
+        return {**headers, "Content-Type": content_type}
+
+    def _build_json_converter(self, storage_column_types: dict = None, **overrides) -> JsonConverter:
+        json_params = self._configuration.request_content.json_mapping
+        column_data_types = json_params.column_data_types
+        parameters = dict(
+            nesting_delimiter=json_params.nesting_delimiter,
+            chunk_size=json_params.chunk_size,
+            infer_data_types=column_data_types.autodetect,
+            column_data_types=column_data_types.datatype_override,
+            column_name_override=json_params.column_names_override,
+            data_wrapper=json_params.request_data_wrapper,
+            inference_sample_size=column_data_types.autodetect_sample_size,
+            type_fallback=column_data_types.autodetect_fallback,
+            storage_column_types=storage_column_types,
+            engine=json_params.engine,
+            workers=json_params.workers,
+            preserve_order=json_params.preserve_order,
+        )
+        try:
+            return JsonConverter(**{**parameters, **overrides})
+        except ValueError as e:
+            raise UserException(f"Invalid JSON mapping configuration: {e}") from e
+
+    def send_ndjson_data(
+        self, in_stream, url, additional_request_params, log=True, storage_column_types=None, result=None
+    ):
+        """
+        Streams the rows as newline delimited JSON, the rows of each request are converted while it is being sent.
+        """
+        request_parameters = self._configuration.request_parameters
+        ndjson_cfg = self._configuration.request_content.ndjson
+        # the rows are converted one by one in the main process, while the request body is sent
+        converter = self._build_json_converter(
+            storage_column_types, chunk_size=1, data_wrapper=None, engine="python", workers=0
+        )
+        ndjson_converter = NdjsonConverter(converter, ndjson_cfg.max_rows, ndjson_cfg.max_bytes, ndjson_cfg.line_prefix)
+        additional_request_params["headers"] = self._with_content_type(
+            additional_request_params.get("headers"), NDJSON_CONTENT_TYPE
+        )
+
+        start = time.perf_counter()
+        completed = False
+        try:
+            for body_counter, body in enumerate(ndjson_converter.iterate_bodies(in_stream), start=1):
+                if log:
+                    logging.info(
+                        f"Sending NDJSON request {body_counter}"
+                        + (result.get_progress(time.perf_counter() - start) if result else "")
+                    )
+                additional_request_params["data"] = body
+                self._send_request(
+                    result, method=request_parameters.method, endpoint_path=url, **additional_request_params
+                )
+                body.drain()
+                if result:
+                    result.rows_sent += body.rows
+            completed = True
+        except ValueError as e:
+            raise UserException(f"Failed to convert the input data: {e}") from e
+        finally:
+            self._update_checkpoint(result, completed)
+        in_stream.close()
+
+        if result:
+            result.add(rows_converted=converter.rows_converted)
+        if self._dry_run_report:
+            self._dry_run_report.add_conversion(converter.rows_converted, converter.conversion_seconds)
+
+    def send_binary_data(self, url, additional_request_params, in_stream, result=None):
         request_parameters = self._configuration.request_parameters
         request_content = self._configuration.request_content
         file = tempfile.mktemp()
@@ -318,11 +1020,39 @@ class Component(ComponentBase):
             in_stream = open(file, mode="rb")
 
         additional_request_params["data"] = in_stream
-        self._client.send_request(method=request_parameters.method, endpoint_path=url, **additional_request_params)
+        self._send_request(result, method=request_parameters.method, endpoint_path=url, **additional_request_params)
         in_stream.close()
         if os.path.exists(file):
             os.remove(file)
 
+    def send_multipart_data(self, url, additional_request_params, in_stream, file_name, user_params, result=None):
+        request_parameters = self._configuration.request_parameters
+        multipart_cfg = self._configuration.request_content.multipart
+        try:
+            fields = ConfigHelpers().fill_in_user_parameters(multipart_cfg.fields, user_params)
+        except ValueError as e:
+            raise UserException(e) from e
+
+        body = MultipartBody(
+            in_stream,
+            file_name,
+            file_field=multipart_cfg.file_field,
+            file_content_type=multipart_cfg.file_content_type,
+            fields=fields,
+            compress=multipart_cfg.gzip,
+        )
+        try:
+            # the content type with the boundary of the body replaces the configured one
+            headers = additional_request_params.get("headers") or {}
+            headers = {name: value for name, value in headers.items() if name.lower() != "content-type"}
+            additional_request_params["headers"] = {**headers, "Content-Type": body.content_type}
+            additional_request_params["data"] = body
+            self._send_request(
+                result, method=request_parameters.method, endpoint_path=url, **additional_request_params
+            )
+        finally:
+            body.close()
+
     def _perform_custom_function(self, key, function_cfg, user_params):
         if function_cfg.get("attr"):
             return user_params[function_cfg["attr"]]
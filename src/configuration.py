@@ -31,17 +31,61 @@ class ContentType(str, Enum):
     form = "form"
 
 
+@dataclass
+class CircuitBreakerConfig(SubscriptableDataclass):
+    enabled: bool = False
+    consecutive_failures: int = 5  # failed attempts in a row opening the breaker, 0 disables the check
+    error_rate: float = 0  # share of failed attempts in the window opening the breaker (0 - 1), 0 disables the check
+    window_size: int = 20  # number of the last attempts the error rate is computed from
+    open_seconds: float = 30  # pause of all requests before a single probe request is sent
+    max_probes: int = 1  # failed probe requests after which the run fails
+
+
+@dataclass
+class DeferredRetryConfig(SubscriptableDataclass):
+    # the failed requests are retried in the background, out of order, while the next requests are being sent
+    enabled: bool = False
+    max_attempts: int = 5  # retries of each deferred request
+    backoff_factor: float = 1.0  # the n-th retry is sent after backoff_factor * 2 ** (n - 1) seconds
+    max_backoff: float = 60  # maximum seconds between the retries
+    workers: int = 2  # number of threads retrying the requests
+    max_pending: int = 100  # maximum number of the queued requests, the sending waits while the queue is full
+
+
 @dataclass
 class RetryConfig(SubscriptableDataclass):
     max_retries: int = 1
     backoff_factor: float = 0.3
     codes: Tuple[int, ...] = (500, 502, 504)
+    circuit_breaker: CircuitBreakerConfig = field(default_factory=CircuitBreakerConfig)
+    deferred: DeferredRetryConfig = field(default_factory=DeferredRetryConfig)
+
+
+@dataclass
+class ConnectionConfig(SubscriptableDataclass):
+    pool_size: int = 10  # connections kept open per host
+    max_hosts: int = 10  # hosts with a connection pool, the pool of the least recently used host is closed
+    keep_alive_timeout: float = 0  # seconds, idle connections are closed and opened again, 0 keeps them open
+    preconnect: int = 0  # connections opened at once before the first request
+    max_requests_per_host: int = 0  # requests sent to each host at the same time, 0 is unlimited
+
+
+@dataclass
+class HedgingConfig(SubscriptableDataclass):
+    # a slow request is sent once more and the first response is used
+    enabled: bool = False
+    delay: float = 0  # seconds after which the request is sent once more, 0 uses the percentile of the latencies
+    percentile: float = 95  # percentile of the observed latencies after which the request is sent once more
+    min_samples: int = 20  # latencies observed before the requests are hedged by the percentile
+    max_ratio: float = 0.1  # maximum share of the requests sent twice (0 - 1)
+    allow_non_idempotent: bool = False  # hedge the POST and PATCH requests, the API must handle the duplicates
 
 
 @dataclass
 class Authentication(SubscriptableDataclass):
     type: str
     parameters: dict = field(default_factory=dict)
+    persist_token: bool = False  # reuse the login token in the next runs while valid (stored in encrypted state)
 
 
 @dataclass
@@ -55,6 +99,9 @@ class ApiConfig(SubscriptableDataclass):
     ssl_verification: bool = True  # toggles requests.[method](verify=True/False)
     ca_cert: str = ""  # if provided, this value will be written to a temp file and used instead of ssl_verify
     client_cert_key: str = ""  # client certificate bundled with private key (will also be written to a temp file)
+    transport: str = "http1"  # http1 | http2, the http2 transport requires the optional httpx and h2 dependencies
+    connection: ConnectionConfig = field(default_factory=ConnectionConfig)
+    hedging: HedgingConfig = field(default_factory=HedgingConfig)
 
 
 @dataclass
@@ -77,6 +124,12 @@ class DataType(Enum):
 class ColumnDataTypes(SubscriptableDataclass):
     autodetect: bool = False
     datatype_override: List[Dict[str, str]] = field(default_factory=list)
+    # 0 infers each value separately, otherwise the type of each column is inferred from the first N rows
+    autodetect_sample_size: int = 0
+    # string | null | fail, applied to values not matching the type inferred from the sample
+    autodetect_fallback: str = "string"
+    # convert the columns according to their data types from the input table manifest
+    use_storage_types: bool = False
 
 
 @dataclass
@@ -86,17 +139,88 @@ class JsonMapping(SubscriptableDataclass):
     column_data_types: ColumnDataTypes
     request_data_wrapper: str = ""
     column_names_override: dict = field(default_factory=dict)
+    # python | arrow, the arrow engine requires the optional pyarrow dependency
+    engine: str = "python"
+    # number of processes converting the rows with the python engine, 0 converts in the main process
+    workers: int = 0
+    # the rows converted in multiple processes may be sent out of order if disabled
+    preserve_order: bool = True
+
+
+@dataclass
+class NdjsonConfig(SubscriptableDataclass):
+    # limits of a single request, 0 is unlimited
+    max_rows: int = 0
+    max_bytes: int = 0
+    # line added before each row, [[column]] placeholders are replaced by the values of the input columns
+    line_prefix: str = ""
+
+
+@dataclass
+class MultipartConfig(SubscriptableDataclass):
+    # form field of the file part
+    file_field: str = "file"
+    # name of the sent file, the name of the input table by default
+    file_name: str = ""
+    file_content_type: str = "text/csv"
+    # the file is gzipped while being sent
+    gzip: bool = False
+    # additional form fields, may reference the user parameters
+    fields: dict = field(default_factory=dict)
+
+
+@dataclass
+class DeduplicationConfig(SubscriptableDataclass):
+    # the EMPTY_REQUEST iterations with the same method, URL, query parameters and headers are sent only once
+    enabled: bool = False
+    max_entries: int = 100_000  # fingerprints of the last requests kept, about 150 bytes each
 
 
 @dataclass
 class RequestContent(SubscriptableDataclass):
     content_type: str
     json_mapping: JsonMapping = None
+    ndjson: NdjsonConfig = None
+    multipart: MultipartConfig = None
+    deduplication: DeduplicationConfig = field(default_factory=DeduplicationConfig)
     iterate_by_columns: List[str] = None
     query_parameters: dict = field(default_factory=dict)
     body: Optional[dict] = None
 
 
+@dataclass
+class DryRunConfig(SubscriptableDataclass):
+    enabled: bool = False
+    sample_requests: int = 0  # number of first rendered requests included in the plan report
+
+
+@dataclass
+class PipelineConfig(SubscriptableDataclass):
+    enabled: bool = False
+    read_buffer: int = 10  # batches of rows read ahead of the conversion
+    convert_buffer: int = 10  # payloads converted ahead of the sender
+
+
+@dataclass
+class PartitioningConfig(SubscriptableDataclass):
+    # iterations sent at the same time, the iterations of the same key are sent in order, 1 sends them one by one
+    lanes: int = 1
+    key_columns: List[str] = field(default_factory=list)  # columns of the partition key, iterate_by_columns by default
+    queue_size: int = 100  # iterations waiting in each lane
+
+
+@dataclass
+class InputTablesConfig(SubscriptableDataclass):
+    concurrency: int = 1  # number of input tables written at the same time
+    endpoint_paths: Dict[str, str] = field(default_factory=dict)  # endpoint path overrides by table name
+    # the rows of each table are split into shard_count ranges, only the shard_index range is sent
+    shard_index: int = 0
+    shard_count: int = 1
+    slice_workers: int = 2  # number of slices of a sliced table read and decompressed at the same time
+    # continue from the row checkpointed by the previous failed run
+    resume: bool = False
+
+
 # CONFIGURATION OBJECT
 
 
@@ -106,6 +230,10 @@ class WriterConfiguration(SubscriptableDataclass):
     request_parameters: ApiRequest
     request_content: RequestContent
     user_parameters: dict = field(default_factory=dict)
+    dry_run: DryRunConfig = field(default_factory=DryRunConfig)
+    pipeline: PipelineConfig = field(default_factory=PipelineConfig)
+    input_tables: InputTablesConfig = field(default_factory=InputTablesConfig)
+    partitioning: PartitioningConfig = field(default_factory=PartitioningConfig)
 
 
 class ConfigurationKeysV2(Enum):
@@ -276,11 +404,15 @@ def validate_configuration_v2(configuration_parameters: dict):
     # TODO: validate authentication
 
     json_mapping = request_content.get("json_mapping")
-    if request_content["content_type"] in ["JSON", "JSON_URL_ENCODED"] and not json_mapping:
+    if request_content["content_type"] in ["JSON", "JSON_URL_ENCODED", "NDJSON"] and not json_mapping:
         validation_errors.append(
             f"The 'json_mapping' configuration is required in mode {request_content['content_type']}"
         )
 
+    if request_content["content_type"] == "NDJSON" and json_mapping:
+        # the rows are sent as lines, the chunk size is not used
+        json_mapping.setdefault("chunk_size", 1)
+
     if request_content.get("json_mapping"):
         validation_errors.append(
             validate_required_parameters(JsonMapping, "json_mapping", request_content["json_mapping"])
@@ -345,7 +477,17 @@ def build_configuration(configuration_parameters: dict) -> WriterConfiguration:
         api_config.authentication = build_dataclass_from_dict(Authentication, api_config_pars["authentication"])
 
     retry_config = build_dataclass_from_dict(RetryConfig, api_config_pars.get("retry_config", {}))
+    retry_config.circuit_breaker = build_dataclass_from_dict(
+        CircuitBreakerConfig, api_config_pars.get("retry_config", {}).get("circuit_breaker") or {}
+    )
+    if not 0 <= retry_config.circuit_breaker.error_rate <= 1:
+        raise ValidationError("The circuit_breaker.error_rate must be between 0 and 1.")
+    retry_config.deferred = build_dataclass_from_dict(
+        DeferredRetryConfig, api_config_pars.get("retry_config", {}).get("deferred") or {}
+    )
     api_config.retry_config = retry_config
+    api_config.connection = build_dataclass_from_dict(ConnectionConfig, api_config_pars.get("connection") or {})
+    api_config.hedging = build_dataclass_from_dict(HedgingConfig, api_config_pars.get("hedging") or {})
     # Request options
     api_request = build_dataclass_from_dict(ApiRequest, request_parameters)
 
@@ -355,11 +497,34 @@ def build_configuration(configuration_parameters: dict) -> WriterConfiguration:
             ColumnDataTypes, json_mapping_pars["column_data_types"]
         )
         request_content["json_mapping"] = build_dataclass_from_dict(JsonMapping, json_mapping_pars)
+    if request_content["content_type"] == "NDJSON" or request_content.get("ndjson"):
+        request_content["ndjson"] = build_dataclass_from_dict(NdjsonConfig, request_content.get("ndjson") or {})
+    if request_content["content_type"] == "MULTIPART" or request_content.get("multipart"):
+        request_content["multipart"] = build_dataclass_from_dict(
+            MultipartConfig, request_content.get("multipart") or {}
+        )
+
+    if request_content.get("deduplication"):
+        request_content["deduplication"] = build_dataclass_from_dict(
+            DeduplicationConfig, request_content["deduplication"]
+        )
 
     content = build_dataclass_from_dict(RequestContent, request_content)
 
+    dry_run = build_dataclass_from_dict(DryRunConfig, configuration_parameters.get("dry_run") or {})
+    pipeline = build_dataclass_from_dict(PipelineConfig, configuration_parameters.get("pipeline") or {})
+    input_tables = build_dataclass_from_dict(InputTablesConfig, configuration_parameters.get("input_tables") or {})
+    partitioning = build_dataclass_from_dict(PartitioningConfig, configuration_parameters.get("partitioning") or {})
+
     result_config = WriterConfiguration(
-        api=api_config, request_parameters=api_request, request_content=content, user_parameters=user_parameters
+        api=api_config,
+        request_parameters=api_request,
+        request_content=content,
+        user_parameters=user_parameters,
+        dry_run=dry_run,
+        pipeline=pipeline,
+        input_tables=input_tables,
+        partitioning=partitioning,
     )
     _handle_kbc_error_converting_objects(result_config)
 
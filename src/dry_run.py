@@ -0,0 +1,174 @@
+import json
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from http_generic.client import GenericHttpClient
+
+
+class DryRunReport:
+    """
+    Collects statistics of requests that would be sent by the writer, used in the dry run (plan) mode.
+    Header and query parameter values are never stored, only their names, to prevent leaking secrets.
+    """
+
+    def __init__(self, sample_requests: int = 0):
+        self.sample_requests = sample_requests or 0
+        self.endpoints: Dict[str, dict] = {}
+        self.samples: List[dict] = []
+        self.rows_converted = 0
+        self.conversion_seconds = 0.0
+        self.tables: Dict[str, dict] = {}
+        # input tables may be written concurrently
+        self._lock = threading.Lock()
+
+    def add_request(self, method: str, url: str, **kwargs):
+        body, body_size = self._get_body(kwargs)
+        with self._lock:
+            self._add_request(method, url, body, body_size, kwargs)
+
+    def _add_request(self, method: str, url: str, body, body_size: int, kwargs: dict):
+        endpoint_key = f"{method.upper()} {url.split('?')[0]}"
+        stats = self.endpoints.setdefault(
+            endpoint_key, {"request_count": 0, "body_bytes_min": None, "body_bytes_max": 0, "body_bytes_total": 0}
+        )
+        stats["request_count"] += 1
+        stats["body_bytes_total"] += body_size
+        stats["body_bytes_max"] = max(stats["body_bytes_max"], body_size)
+        if stats["body_bytes_min"] is None or body_size < stats["body_bytes_min"]:
+            stats["body_bytes_min"] = body_size
+
+        if len(self.samples) < self.sample_requests:
+            self.samples.append(
+                {
+                    "method": method.upper(),
+                    "url": url,
+                    "query_parameters": sorted((kwargs.get("params") or {}).keys()),
+                    "headers": sorted((kwargs.get("headers") or {}).keys()),
+                    "body_bytes": body_size,
+                    "body": self._get_sample_body(body),
+                }
+            )
+
+    def add_conversion(self, rows: int, seconds: float):
+        with self._lock:
+            self.rows_converted += rows
+            self.conversion_seconds += seconds
+
+    def add_table_result(self, table_name: str, result: dict):
+        self.tables[table_name] = result
+
+    @property
+    def request_count(self) -> int:
+        return sum(e["request_count"] for e in self.endpoints.values())
+
+    def to_dict(self) -> dict:
+        endpoints = {}
+        for key, stats in self.endpoints.items():
+            endpoints[key] = {
+                "request_count": stats["request_count"],
+                "body_bytes_min": stats["body_bytes_min"] or 0,
+                "body_bytes_avg": round(stats["body_bytes_total"] / stats["request_count"], 2),
+                "body_bytes_max": stats["body_bytes_max"],
+                "body_bytes_total": stats["body_bytes_total"],
+            }
+        rows_per_second = None
+        if self.conversion_seconds > 0:
+            rows_per_second = round(self.rows_converted / self.conversion_seconds, 2)
+
+        return {
+            "request_count": self.request_count,
+            "endpoints": endpoints,
+            "conversion": {
+                "rows": self.rows_converted,
+                "seconds": round(self.conversion_seconds, 4),
+                "rows_per_second": rows_per_second,
+            },
+            "tables": self.tables,
+            "sample_requests": self.samples,
+        }
+
+    def write(self, folder_path: str, file_name: str = "dry_run_report.json") -> str:
+        report_path = os.path.join(folder_path, file_name)
+        os.makedirs(folder_path, exist_ok=True)
+        with open(report_path, "w") as out:
+            json.dump(self.to_dict(), out, indent=2)
+        return report_path
+
+    def log_summary(self):
+        report = self.to_dict()
+        logging.info(f"Dry run finished, {report['request_count']} requests would be sent.")
+        for key, stats in report["endpoints"].items():
+            logging.info(
+                f'"{key}": {stats["request_count"]} requests, body size min/avg/max: '
+                f'{stats["body_bytes_min"]}/{stats["body_bytes_avg"]}/{stats["body_bytes_max"]} B'
+            )
+        if report["conversion"]["rows"]:
+            logging.info(
+                f"Converted {report['conversion']['rows']} rows in {report['conversion']['seconds']} s "
+                f"({report['conversion']['rows_per_second']} rows/s)"
+            )
+
+    @staticmethod
+    def _get_sample_body(body):
+        if not isinstance(body, bytes):
+            return body
+        try:
+            # JSON payloads serialized by the arrow conversion engine
+            return json.loads(body)
+        except ValueError:
+            return f"<binary {len(body)} B>"
+
+    @staticmethod
+    def _get_body(request_kwargs: dict) -> Tuple[Optional[object], int]:
+        """
+        Returns the body representation stored in samples and the body size in bytes.
+        """
+        if request_kwargs.get("json") is not None:
+            body = request_kwargs["json"]
+            return body, len(json.dumps(body).encode("utf-8"))
+
+        data = request_kwargs.get("data")
+        if data is None:
+            return None, 0
+        if isinstance(data, dict):
+            encoded = urlencode(data)
+            return encoded, len(encoded.encode("utf-8"))
+        if isinstance(data, str):
+            return data, len(data.encode("utf-8"))
+        if isinstance(data, bytes):
+            # decoded only for the samples
+            return data, len(data)
+        if hasattr(data, "seekable") and data.seekable():
+            position = data.tell()
+            data.seek(0, os.SEEK_END)
+            size = data.tell() - position
+            data.seek(position)
+            return f"<binary {size} B>", size
+        if hasattr(data, "__iter__"):
+            # streamed body (e.g. NDJSON or a sliced table), consumed to measure it
+            size = sum(len(block) for block in data)
+            return f"<stream {size} B>", size
+        return "<stream>", 0
+
+
+class DryRunHttpClient(GenericHttpClient):
+    """
+    Client used in the dry run mode. Requests are not sent, they are only recorded in the DryRunReport.
+    """
+
+    def __init__(self, base_url: str, report: DryRunReport, **kwargs):
+        super().__init__(base_url=base_url, **kwargs)
+        self.report = report
+
+    def login(self, token_state: dict = None):
+        logging.info("Running in dry run mode, skipping login.")
+
+    def get_token_state(self) -> Optional[dict]:
+        return None
+
+    def send_request(self, method, endpoint_path, **kwargs):
+        url = self._build_url(endpoint_path, base_url=kwargs.pop("base_url", None))
+        self.report.add_request(method, url, **kwargs)
@@ -1,8 +1,12 @@
+import hashlib
 import inspect
+import logging
+import threading
+import time
 from abc import ABC, abstractmethod
 
 from requests.auth import AuthBase, HTTPBasicAuth
-from typing import Callable, Union, Dict, Literal
+from typing import Callable, Union, Dict, Literal, Optional
 from urllib.parse import urlencode
 import requests
 import json
@@ -12,6 +16,9 @@ import base64
 
 from configuration import ContentType, ConfigHelpers, AuthMethodConverter, WriterConfiguration, build_configuration
 
+# refresh the token this many seconds before it expires (at most 10 % of the token lifetime)
+TOKEN_REFRESH_MARGIN = 60
+
 
 class AuthBuilderError(Exception):
     pass
@@ -23,6 +30,9 @@ class AuthMethodBase(ABC):
     e.g. __init__(self, username, __password)
     """
 
+    # incremented on each login, used to prevent redundant concurrent refreshes
+    token_version = 0
+
     @abstractmethod
     def login(self):
         """
@@ -31,6 +41,37 @@ class AuthMethodBase(ABC):
         """
         pass
 
+    def refresh(self, token_version: int = None) -> Optional[Union[AuthBase, Callable]]:
+        """
+        Perform login again when the credentials are rejected (HTTP 401) and return the new auth callable.
+        Methods with static credentials return None, the request is not replayed then.
+
+        Args:
+            token_version: version of the token the rejected request was sent with
+
+        """
+        return None
+
+    def refresh_if_expiring(self):
+        """
+        Refresh the credentials proactively if they are about to expire. No-op for methods with static credentials.
+        """
+        pass
+
+    def get_token_state(self) -> Optional[dict]:
+        """
+        Returns the obtained token and its expiration so it can be persisted and reused in the next run.
+        Methods without a login round-trip return None.
+        """
+        return None
+
+    def restore_token_state(self, token_state: dict) -> Optional[Union[AuthBase, Callable]]:
+        """
+        Restores the token persisted by a previous run and returns the auth callable.
+        Returns None if the token cannot be reused (e.g. it is expired or the login configuration changed).
+        """
+        return None
+
 
 class AuthMethodBuilder:
     @classmethod
@@ -199,6 +240,12 @@ class Login(AuthMethodBase, AuthBase):
         self.login_headers = login_headers or {}
         self.api_request_headers = api_request_headers or {}
         self.api_request_query_parameters = api_request_query_parameters or {}
+        # keep the templates with response placeholders so the login can be repeated
+        self._api_request_headers_template = self.api_request_headers
+        self._api_request_query_parameters_template = self.api_request_query_parameters
+        self.token_expires_at: Optional[float] = None
+        self._refresh_margin = TOKEN_REFRESH_MARGIN
+        self._lock = threading.RLock()
 
     @classmethod
     def _retrieve_response_placeholders(
@@ -254,18 +301,92 @@ class Login(AuthMethodBase, AuthBase):
         )
 
         response.raise_for_status()
+        response_data = response.json()
 
-        self.api_request_headers = self._replace_placeholders_with_response(response.json(), self.api_request_headers)
-        self.api_request_query_parameters = self._replace_placeholders_with_response(
-            response.json(), self.api_request_query_parameters
+        api_request_headers = self._replace_placeholders_with_response(
+            response_data, self._api_request_headers_template
         )
-        cfg_helpers = ConfigHelpers()
-        self.api_request_headers = cfg_helpers.fill_in_user_parameters(self.api_request_headers, {}, True)
-        self.api_request_query_parameters = cfg_helpers.fill_in_user_parameters(
-            self.api_request_query_parameters, {}, True
+        api_request_query_parameters = self._replace_placeholders_with_response(
+            response_data, self._api_request_query_parameters_template
         )
+        cfg_helpers = ConfigHelpers()
+        self.api_request_headers = cfg_helpers.fill_in_user_parameters(api_request_headers, {}, True)
+        self.api_request_query_parameters = cfg_helpers.fill_in_user_parameters(api_request_query_parameters, {}, True)
+        self._set_token_expiration(response_data)
+        self.token_version += 1
+        return self
+
+    def _set_token_expiration(self, response_data: dict):
+        expires_in = response_data.get("expires_in") if isinstance(response_data, dict) else None
+        try:
+            expires_in = float(expires_in)
+        except (TypeError, ValueError):
+            self.token_expires_at = None
+            return
+        self._refresh_margin = min(TOKEN_REFRESH_MARGIN, expires_in / 10)
+        self.token_expires_at = time.monotonic() + expires_in
+
+    def _get_login_fingerprint(self) -> str:
+        """
+        Hash of the login configuration, the persisted token is invalidated when the configuration changes.
+        """
+        login_config = [
+            self.login_endpoint,
+            self.method,
+            self.login_query_parameters,
+            self.login_query_body,
+            self.login_headers,
+            self._api_request_headers_template,
+            self._api_request_query_parameters_template,
+        ]
+        return hashlib.sha256(json.dumps(login_config, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def get_token_state(self) -> Optional[dict]:
+        expires_at = self.token_expires_at
+        if expires_at is None:
+            # tokens without known expiration are not persisted
+            return None
+        return {
+            "fingerprint": self._get_login_fingerprint(),
+            "expires_at": time.time() + (expires_at - time.monotonic()),
+            "refresh_margin": self._refresh_margin,
+            "api_request_headers": self.api_request_headers,
+            "api_request_query_parameters": self.api_request_query_parameters,
+        }
+
+    def restore_token_state(self, token_state: dict) -> Optional[Union[AuthBase, Callable]]:
+        if not token_state or token_state.get("fingerprint") != self._get_login_fingerprint():
+            return None
+        refresh_margin = token_state.get("refresh_margin", TOKEN_REFRESH_MARGIN)
+        remaining = token_state.get("expires_at", 0) - time.time()
+        if remaining <= refresh_margin:
+            return None
+
+        with self._lock:
+            self.api_request_headers = token_state.get("api_request_headers", {})
+            self.api_request_query_parameters = token_state.get("api_request_query_parameters", {})
+            self._refresh_margin = refresh_margin
+            self.token_expires_at = time.monotonic() + remaining
+            self.token_version += 1
         return self
 
+    def refresh(self, token_version: int = None) -> Union[AuthBase, Callable]:
+        with self._lock:
+            # the token might have been refreshed by another thread in the meantime
+            if token_version is None or token_version == self.token_version:
+                logging.info("Refreshing the access token.")
+                self.login()
+        return self
+
+    def refresh_if_expiring(self):
+        expires_at = self.token_expires_at
+        if expires_at is None or time.monotonic() < expires_at - self._refresh_margin:
+            return
+        with self._lock:
+            if self.token_expires_at == expires_at:
+                logging.info("The access token is about to expire, refreshing.")
+                self.login()
+
     def get_secrets(self) -> list[str]:
         secrets = []
         for key, value in self.api_request_query_parameters.items():
@@ -277,10 +398,14 @@ class Login(AuthMethodBase, AuthBase):
         return secrets
 
     def __call__(self, r):
+        self.refresh_if_expiring()
+        # take references first, the attributes may be replaced by a concurrent refresh
+        query_parameters = self.api_request_query_parameters
+        headers = self.api_request_headers
         r.url = f"{r.url}"
-        if self.api_request_query_parameters:
-            r.url = f"{r.url}?{urlencode(self.api_request_query_parameters)}"
-        r.headers.update(self.api_request_headers)
+        if query_parameters:
+            r.url = f"{r.url}?{urlencode(query_parameters)}"
+        r.headers.update(headers)
         return r
 
 
@@ -0,0 +1,187 @@
+import base64
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Dict, List, Optional
+
+from requests import PreparedRequest, Response
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3 import HTTPResponse
+
+ENV_CASSETTE_MODE = "HTTP_CASSETTE_MODE"
+ENV_CASSETTE_PATH = "HTTP_CASSETTE_PATH"
+ENV_CASSETTE_LATENCY_SCALE = "HTTP_CASSETTE_LATENCY_SCALE"
+
+CASSETTE_VERSION = 1
+
+
+class CassetteError(Exception):
+    pass
+
+
+class Cassette:
+    """
+    Stores recorded HTTP interactions (status, headers, body and latency) so they can be replayed later
+    without network access.
+
+    The mode and the cassette file are controlled by environment variables so the configuration format stays intact:
+        HTTP_CASSETTE_MODE: "record" or "replay"
+        HTTP_CASSETTE_PATH: path to the cassette file
+        HTTP_CASSETTE_LATENCY_SCALE: multiplier of the replayed latency, e.g. 0 to replay without delays (default 1)
+    """
+
+    RECORD = "record"
+    REPLAY = "replay"
+
+    def __init__(self, mode: str, path: str, latency_scale: float = 1.0):
+        if mode not in (self.RECORD, self.REPLAY):
+            raise CassetteError(f"Unsupported cassette mode '{mode}', supported values are: [record, replay]")
+        self.mode = mode
+        self.path = path
+        self.latency_scale = latency_scale
+        self.interactions: List[dict] = []
+        self._lock = threading.Lock()
+        self._replay_queues: Dict[str, deque] = defaultdict(deque)
+
+        if self.mode == self.REPLAY:
+            self._load()
+
+    @classmethod
+    def from_environment(cls, data_dir: str) -> Optional["Cassette"]:
+        """
+        Builds the cassette from environment variables. Returns None if the cassette mode is not set.
+        By default, the cassette is recorded into out/files and replayed from in/files of the data folder.
+        """
+        mode = (os.environ.get(ENV_CASSETTE_MODE) or "").lower()
+        if not mode:
+            return None
+        default_path = os.path.join(data_dir, "in" if mode == cls.REPLAY else "out", "files", "http_cassette.json")
+        path = os.environ.get(ENV_CASSETTE_PATH) or default_path
+        try:
+            latency_scale = float(os.environ.get(ENV_CASSETTE_LATENCY_SCALE, 1.0))
+        except ValueError:
+            latency_scale = -1
+        if latency_scale < 0:
+            raise CassetteError(
+                f"Invalid {ENV_CASSETTE_LATENCY_SCALE} '{os.environ[ENV_CASSETTE_LATENCY_SCALE]}', "
+                f"it must be a non-negative number."
+            )
+        return cls(mode, path, latency_scale)
+
+    @property
+    def is_replay(self) -> bool:
+        return self.mode == self.REPLAY
+
+    @staticmethod
+    def _interaction_key(method: str, url: str) -> str:
+        # query parameters are ignored, they often contain timestamps or secrets
+        return f"{method.upper()} {url.split('?')[0]}"
+
+    def record(self, request: PreparedRequest, response: Response, latency: float):
+        content = response.content or b""
+        try:
+            body = {"text": content.decode("utf-8")}
+        except UnicodeDecodeError:
+            body = {"base64": base64.b64encode(content).decode("ascii")}
+
+        interaction = {
+            "method": request.method,
+            "url": request.url.split("?")[0],
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": dict(response.headers),
+            "body": body,
+            "latency": latency,
+        }
+        with self._lock:
+            self.interactions.append(interaction)
+
+    def next_interaction(self, request: PreparedRequest) -> dict:
+        key = self._interaction_key(request.method, request.url)
+        with self._lock:
+            queue = self._replay_queues.get(key)
+            if not queue:
+                raise CassetteError(f'No recorded interaction found for request "{key}" in cassette {self.path}')
+            interaction = queue.popleft()
+            # cycle the interactions so the cassette can serve more requests than recorded
+            queue.append(interaction)
+        return interaction
+
+    def save(self):
+        if self.mode != self.RECORD:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._lock, open(self.path, "w") as out:
+            json.dump({"version": CASSETTE_VERSION, "interactions": self.interactions}, out)
+        logging.info(f"Recorded {len(self.interactions)} HTTP interactions into cassette {self.path}")
+
+    def _load(self):
+        if not os.path.isfile(self.path):
+            raise CassetteError(f"Cassette file {self.path} does not exist, record it first.")
+        with open(self.path) as inp:
+            self.interactions = json.load(inp).get("interactions", [])
+        for interaction in self.interactions:
+            self._replay_queues[self._interaction_key(interaction["method"], interaction["url"])].append(interaction)
+        logging.info(f"Replaying {len(self.interactions)} HTTP interactions from cassette {self.path}")
+
+
+class RecordingAdapter(BaseAdapter):
+    """
+    Transport adapter sending the requests with the wrapped transport adapter and recording the final responses
+    into a cassette.
+    """
+
+    def __init__(self, cassette: Cassette, adapter: BaseAdapter):
+        super().__init__()
+        self.cassette = cassette
+        self.adapter = adapter
+
+    def send(self, request, **kwargs):
+        start = time.perf_counter()
+        response = self.adapter.send(request, **kwargs)
+        latency = time.perf_counter() - start
+        self.cassette.record(request, response, latency)
+        return response
+
+    def close(self):
+        self.adapter.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Transport adapter serving the responses from a cassette, simulating the recorded latency.
+    """
+
+    def __init__(self, cassette: Cassette):
+        super().__init__()
+        self.cassette = cassette
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        interaction = self.cassette.next_interaction(request)
+        time.sleep(interaction.get("latency", 0) * self.cassette.latency_scale)
+
+        body = interaction.get("body", {})
+        if "base64" in body:
+            content = base64.b64decode(body["base64"])
+        else:
+            content = body.get("text", "").encode("utf-8")
+
+        response = Response()
+        response.status_code = interaction["status"]
+        response.reason = interaction.get("reason")
+        response.headers = CaseInsensitiveDict(interaction.get("headers", {}))
+        # the recorded body is already decoded
+        response.headers.pop("Content-Encoding", None)
+        response.raw = HTTPResponse(body=content, status=response.status_code, preload_content=False)
+        response._content = content
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
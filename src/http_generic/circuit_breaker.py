@@ -0,0 +1,199 @@
+"""
+Circuit breaker of the GenericHttpClient stopping the requests to an endpoint that keeps failing.
+
+The breaker opens after a number of consecutive failed attempts or when the failed attempts reach an error rate in
+a sliding window of the last attempts. Every failed attempt counts, including the ones retried by the retry policy,
+so the breaker opens even within the retries of a single request. While it is open, all requests (and their retries)
+wait. After the pause, a single request is sent as a probe: if it succeeds, the breaker closes and the requests
+continue, otherwise it opens again until the number of failed probes is reached and all requests are aborted.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from urllib3 import Retry
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half-open"
+STATE_ABORTED = "aborted"
+
+
+class CircuitBreakerError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        consecutive_failures: int = 5,
+        error_rate: float = 0,
+        window_size: int = 20,
+        open_seconds: float = 30,
+        max_probes: int = 1,
+        probe_timeout: float = 300,
+    ):
+        """
+        Args:
+            consecutive_failures: failed attempts in a row opening the breaker, 0 disables the check
+            error_rate: share of the failed attempts of the window opening the breaker (0 - 1), 0 disables the check
+            window_size: number of the last attempts of the error rate, evaluated once the window is full
+            open_seconds: pause before the probe request
+            max_probes: failed probes after which all requests are aborted
+            probe_timeout: seconds the other requests wait for the result of the probe before sending another one
+        """
+        self.consecutive_failures = consecutive_failures
+        self.error_rate = error_rate
+        self.window_size = window_size
+        self.open_seconds = open_seconds
+        self.max_probes = max(max_probes, 1)
+        self.probe_timeout = probe_timeout
+
+        self.state = STATE_CLOSED
+        self.attempts = 0
+        self.failures = 0
+        self.opened = 0
+        self.last_error = ""
+        self._consecutive = 0
+        self._window = deque(maxlen=max(window_size, 1))
+        self._failed_probes = 0
+        self._open_until = 0.0
+        self._probe_until = 0.0
+        self._probe_thread: Optional[int] = None
+        self._condition = threading.Condition()
+
+    def before_request(self):
+        """
+        Waits while the breaker is open, the first request after the pause is sent as the probe.
+        Raises CircuitBreakerError if the breaker aborted the requests.
+        """
+        with self._condition:
+            while True:
+                if self.state == STATE_CLOSED:
+                    return
+                if self.state == STATE_ABORTED:
+                    raise CircuitBreakerError(self.get_summary())
+                if self.state == STATE_OPEN:
+                    remaining = self._open_until - time.monotonic()
+                    if remaining <= 0:
+                        self.state = STATE_HALF_OPEN
+                        self._probe_thread = threading.get_ident()
+                        self._probe_until = time.monotonic() + self.probe_timeout
+                        logging.info("Circuit breaker: sending a probe request.")
+                        return
+                    self._condition.wait(remaining)
+                else:
+                    # waiting for the result of the probe, a probe without a result in time is replaced
+                    remaining = self._probe_until - time.monotonic()
+                    if remaining <= 0:
+                        logging.warning("Circuit breaker: no result of the probe request in time, sending another one.")
+                        self._release_probe()
+                        continue
+                    self._condition.wait(remaining)
+
+    def release_probe(self):
+        """
+        Releases the probe of the current thread that ended without a recorded result (e.g. failed without a response),
+        so another request is sent as the probe. Does nothing if the result of the probe was recorded.
+        """
+        with self._condition:
+            if self._is_probe():
+                logging.info("Circuit breaker: the probe request ended without a result, sending another one.")
+                self._release_probe()
+
+    def _release_probe(self):
+        self.state = STATE_OPEN
+        self._open_until = time.monotonic()
+        self._probe_thread = None
+        self._condition.notify_all()
+
+    def record_success(self):
+        with self._condition:
+            self.attempts += 1
+            self._consecutive = 0
+            self._window.append(False)
+            if self._is_probe():
+                logging.info("Circuit breaker: the probe request succeeded, resuming the requests.")
+                self.state = STATE_CLOSED
+                self._failed_probes = 0
+                self._window.clear()
+                self._condition.notify_all()
+
+    def record_failure(self, error: str):
+        """
+        Records a failed attempt. Raises CircuitBreakerError if the failed attempt was the last allowed probe.
+        """
+        with self._condition:
+            self.attempts += 1
+            self.failures += 1
+            self.last_error = error
+            self._consecutive += 1
+            self._window.append(True)
+            if self._is_probe():
+                self._failed_probes += 1
+                if self._failed_probes >= self.max_probes:
+                    self.state = STATE_ABORTED
+                    self._condition.notify_all()
+                    raise CircuitBreakerError(self.get_summary())
+                self._open(f"the probe request failed ({error})")
+            elif self.state == STATE_CLOSED:
+                reason = self._get_open_reason()
+                if reason:
+                    self._open(reason)
+
+    def _is_probe(self) -> bool:
+        return self.state == STATE_HALF_OPEN and self._probe_thread == threading.get_ident()
+
+    def _get_open_reason(self) -> Optional[str]:
+        if self.consecutive_failures and self._consecutive >= self.consecutive_failures:
+            return f"{self._consecutive} consecutive failures"
+        if self.error_rate and len(self._window) >= self.window_size:
+            rate = sum(self._window) / len(self._window)
+            if rate >= self.error_rate:
+                return f"{rate:.0%} of the last {len(self._window)} attempts failed"
+        return None
+
+    def _open(self, reason: str):
+        self.state = STATE_OPEN
+        self.opened += 1
+        self._open_until = time.monotonic() + self.open_seconds
+        self._condition.notify_all()
+        logging.warning(
+            f"Circuit breaker opened, {reason}. Last error: {self.last_error}. "
+            f"Pausing all requests for {self.open_seconds} seconds."
+        )
+
+    def get_summary(self) -> str:
+        return (
+            f"The requests were stopped by the circuit breaker, the endpoint kept failing: "
+            f"{self.failures} of {self.attempts} attempts failed, the breaker opened {self.opened} times and "
+            f"{self._failed_probes} probe requests failed. Last error: {self.last_error}"
+        )
+
+
+class CircuitBreakerRetry(Retry):
+    """
+    Retry policy recording each failed attempt in the circuit breaker and waiting before the next attempt
+    while the breaker is open.
+    """
+
+    circuit_breaker: CircuitBreaker = None
+
+    def new(self, **kw) -> "CircuitBreakerRetry":
+        retry = super().new(**kw)
+        retry.circuit_breaker = self.circuit_breaker
+        return retry
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if error is not None:
+            self.circuit_breaker.record_failure(f"{type(error).__name__}: {error}")
+        elif response is not None and not response.get_redirect_location():
+            self.circuit_breaker.record_failure(f"HTTP {response.status}")
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+    def sleep(self, response=None):
+        super().sleep(response)
+        self.circuit_breaker.before_request()
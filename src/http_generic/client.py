@@ -1,13 +1,41 @@
-from typing import Tuple, Dict
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from http.cookiejar import DefaultCookiePolicy
+from typing import Callable, ContextManager, Tuple, Dict, Optional
+from urllib.parse import quote, urljoin, urlparse
 
 import requests
 from keboola.component import UserException
 from keboola.http_client import HttpClient
-from requests.adapters import HTTPAdapter
 from requests.exceptions import HTTPError, InvalidJSONError, ConnectionError
 from urllib3 import Retry
 
 from http_generic.auth import AuthMethodBase
+from http_generic.cassette import Cassette, CassetteError, RecordingAdapter, ReplayAdapter
+from http_generic.circuit_breaker import CircuitBreaker, CircuitBreakerError, CircuitBreakerRetry
+from http_generic.hedging import HedgingPolicy
+from http_generic.transport import (
+    DEFAULT_MAX_HOSTS,
+    DEFAULT_POOL_SIZE,
+    TRANSPORT_HTTP1,
+    build_adapter,
+    validate_transport,
+)
+
+# arguments of requests.Session.send, the rest of the arguments is applied when building the prepared request
+SEND_ARGUMENTS = ("timeout", "verify", "cert", "proxies", "stream", "allow_redirects")
+BODY_ARGUMENTS = ("data", "json", "files")
+
+
+class RetryableRequestError(UserException):
+    """
+    The request failed with a retryable status code or a connection error after all retries.
+    """
 
 
 class GenericHttpClient(HttpClient):
@@ -20,6 +48,16 @@ class GenericHttpClient(HttpClient):
         max_retries: int = 10,
         backoff_factor: float = 0.3,
         status_forcelist: Tuple[int, ...] = (500, 502, 504),
+        cassette: Cassette = None,
+        request_template_cache_size: int = 256,
+        transport: str = TRANSPORT_HTTP1,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        max_hosts: int = DEFAULT_MAX_HOSTS,
+        keep_alive_timeout: float = 0,
+        preconnect: int = 0,
+        max_requests_per_host: int = 0,
+        circuit_breaker: CircuitBreaker = None,
+        hedging: HedgingPolicy = None,
     ):
         super().__init__(
             base_url=base_url,
@@ -31,19 +69,66 @@ class GenericHttpClient(HttpClient):
         )
 
         self._auth_method = auth_method
+        self._cassette = cassette
+        validate_transport(transport)
+        if pool_size < 1 or max_hosts < 1:
+            raise ValueError("The connection pool_size and max_hosts must be at least 1.")
+        self._transport = transport
+        self._pool_settings = dict(pool_size=pool_size, max_hosts=max_hosts, keep_alive_timeout=keep_alive_timeout)
+        # connections opened before the first request
+        self._preconnect = preconnect
+        self._preconnected = False
+        self._transport_adapter = None
+        # requests sent to each host at the same time, 0 is unlimited
+        self._max_requests_per_host = max_requests_per_host
+        self._host_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        # pauses all requests while the endpoint keeps failing, see _request_raw
+        self._circuit_breaker = circuit_breaker
+        # slow requests are sent once more, see _send_hedged
+        self._hedging = hedging
+        self._hedging_executor: Optional[ThreadPoolExecutor] = None
 
-    def login(self):
+        # single session reused for all requests, see _request_raw
+        self._session: Optional[requests.Session] = None
+        self._session_lock = threading.Lock()
+        self._request_templates: OrderedDict = OrderedDict()
+        self._request_template_cache_size = request_template_cache_size
+        self._environment_settings: Dict[str, dict] = {}
+
+    def login(self, token_state: dict = None):
         """
         Perform login based on auth method
 
+        Args:
+            token_state: token persisted by a previous run, reused instead of the login if still valid
+
         """
+        if self._cassette and self._cassette.is_replay:
+            logging.info("Replaying responses from cassette, skipping login.")
+            return
+        if not self._auth_method:
+            return
+
+        if token_state:
+            auth = self._auth_method.restore_token_state(token_state)
+            if auth:
+                logging.info("Reusing the access token obtained in the previous run.")
+                self._auth = auth
+                return
         # perform login
-        if self._auth_method:
-            self._auth = self._auth_method.login()
+        self._auth = self._auth_method.login()
+
+    def get_token_state(self) -> Optional[dict]:
+        """
+        Returns the current token of the auth method so it can be persisted, None if not supported.
+        """
+        if not self._auth_method:
+            return None
+        return self._auth_method.get_token_state()
 
     def send_request(self, method, endpoint_path, **kwargs):
         try:
-            resp = self._request_raw(method=method, endpoint_path=endpoint_path, is_absolute_path=False, **kwargs)
+            resp = self._send_with_auth_refresh(method, endpoint_path, **kwargs)
             resp.raise_for_status()
         except HTTPError as e:
             if e.response.status_code in self.status_forcelist:
@@ -51,11 +136,11 @@ class GenericHttpClient(HttpClient):
                     f'Request "{method}: {endpoint_path}" failed, too many retries. '
                     f"Status Code: {e.response.status_code}. Response: {e.response.text}"
                 )
-            else:
-                message = (
-                    f'Request "{method}: {endpoint_path}" failed with non-retryable error. '
-                    f"Status Code: {e.response.status_code}. Response: {e.response.text}"
-                )
+                raise RetryableRequestError(message) from e
+            message = (
+                f'Request "{method}: {endpoint_path}" failed with non-retryable error. '
+                f"Status Code: {e.response.status_code}. Response: {e.response.text}"
+            )
             raise UserException(message) from e
         except InvalidJSONError:
             message = (
@@ -66,16 +151,314 @@ class GenericHttpClient(HttpClient):
             raise UserException(message, data)
         except ConnectionError as e:
             message = f'Request "{method}: {endpoint_path}" failed with the following error: {e}'
-            raise UserException(message) from e
+            raise RetryableRequestError(message) from e
+        except CassetteError as e:
+            raise UserException(f'Request "{method}: {endpoint_path}" cannot be replayed: {e}') from e
+        except CircuitBreakerError as e:
+            raise UserException(f'Request "{method}: {endpoint_path}" was not sent. {e}') from e
+
+    def _send_with_auth_refresh(self, method, endpoint_path, **kwargs):
+        """
+        Sends the request. If it is rejected with HTTP 401 and the auth method supports refreshing,
+        performs the login again and replays the request once.
+        """
+        token_version = self._auth_method.token_version if self._auth_method else None
+        resp = self._request_raw(method=method, endpoint_path=endpoint_path, is_absolute_path=False, **kwargs)
+        if resp.status_code != 401 or not self._auth_method:
+            return resp
+
+        new_auth = self._auth_method.refresh(token_version)
+        if new_auth is None:
+            return resp
+        self._auth = new_auth
+        data = kwargs.get("data")
+        if hasattr(data, "seek") and not data.seekable():
+            # e.g. a sliced or compressed input table streamed as the body, the sent part cannot be read again
+            raise UserException(
+                f'Request "{method}: {endpoint_path}" was rejected with 401 and cannot be replayed with a new token, '
+                f"the streamed request body cannot be read again."
+            )
+        logging.warning(f'Request "{method}: {endpoint_path}" was rejected with 401, replaying with a new token.')
+        if hasattr(data, "seek"):
+            data.seek(0)
+        return self._request_raw(method=method, endpoint_path=endpoint_path, is_absolute_path=False, **kwargs)
+
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._requests_retry_session()
+        return self._session
+
+    def _request_raw(self, method: str, endpoint_path: str = None, **kwargs) -> requests.Response:
+        """
+        Fast path of the HttpClient._request_raw. Instead of building a new session and request for each call,
+        the prepared request (URL, query, merged headers and auth) is built once per endpoint, method,
+        query parameters and headers and only cloned with a new body for each call. The environment lookups
+        (proxies, CA bundle) are done once per host.
+
+        Note that the auth callables are applied on the template only, they must not depend on the request body.
+        """
+        is_absolute_path = kwargs.pop("is_absolute_path", False)
+        ignore_auth = kwargs.pop("ignore_auth", False)
+        url = self._build_url(endpoint_path, is_absolute_path, kwargs.pop("base_url", None))
+
+        headers = kwargs.pop("headers", None) or {}
+        headers = {**headers, **self._default_header}
+        if not ignore_auth:
+            headers.update(self._auth_header)
+
+        params = kwargs.pop("params", None) or {}
+        if self._default_params and type(self._default_params) is dict:
+            params = {**self._default_params, **params}
+
+        send_kwargs = {key: kwargs.pop(key) for key in SEND_ARGUMENTS if key in kwargs}
+        body_kwargs = {key: kwargs.pop(key) for key in BODY_ARGUMENTS if key in kwargs}
+        if kwargs:
+            # arguments not supported by the fast path (e.g. cookies)
+            return self._send(
+                url,
+                self.session.request,
+                method,
+                url,
+                params=params,
+                headers=headers,
+                **body_kwargs,
+                **send_kwargs,
+                **kwargs,
+            )
+
+        prepared = self._get_request_template(method, url, params, headers, ignore_auth).copy()
+        # the template is prepared without body, let requests compute the body headers
+        prepared.headers.pop("Content-Length", None)
+        prepared.prepare_body(
+            data=body_kwargs.get("data"), files=body_kwargs.get("files"), json=body_kwargs.get("json")
+        )
+        send_settings = self._get_send_settings(prepared.url, send_kwargs)
+        if self._preconnect and not self._preconnected:
+            self._open_connections(prepared, send_settings)
+        if self._is_hedged(prepared):
+            return self._send_hedged(url, prepared, send_settings)
+        return self._send(url, self.session.send, prepared, **send_settings)
+
+    def _send(self, url: str, send: Callable[..., requests.Response], *args, **kwargs) -> requests.Response:
+        """
+        Sends the request within the limit of the host, guarded by the circuit breaker. The successful response
+        is recorded in the breaker, the failed attempts are recorded by the retry policy. The probe of the breaker
+        is released if it ended without a result, so the other requests do not wait for it.
+        """
+        with self._limit_host_requests(url):
+            if not self._circuit_breaker:
+                return send(*args, **kwargs)
+            self._circuit_breaker.before_request()
+            try:
+                response = send(*args, **kwargs)
+                if response.status_code not in self.status_forcelist:
+                    self._circuit_breaker.record_success()
+                return response
+            finally:
+                self._circuit_breaker.release_probe()
+
+    def _is_hedged(self, request: requests.PreparedRequest) -> bool:
+        """
+        Only the requests with the body in memory can be sent twice, the streamed bodies are read by the first request.
+        """
+        return bool(
+            self._hedging
+            and not self._cassette
+            and self._hedging.applies_to(request.method)
+            and isinstance(request.body, (bytes, str, type(None)))
+        )
+
+    def _send_hedged(self, url: str, request: requests.PreparedRequest, send_settings: dict) -> requests.Response:
+        """
+        Sends the request and, if it takes longer than the hedging delay, the same request once more. Returns the first
+        successfully received response, the other one is closed once received.
+
+        Each request is sent by _send on its own thread, so it counts against the limit of the host and the circuit
+        breaker records its attempts (retried on the same thread) as a single request.
+        """
+        self._hedging.start_request()
+        start = time.perf_counter()
+        executor = self._get_hedging_executor()
+        primary = executor.submit(self._send, url, self.session.send, request, **send_settings)
+        delay = self._hedging.get_delay()
+        if delay is None or wait([primary], timeout=delay).done or not self._hedging.try_hedge():
+            response = primary.result()
+            self._hedging.record_latency(time.perf_counter() - start)
+            return response
+
+        hedge = executor.submit(self._send, url, self.session.send, request.copy(), **send_settings)
+        pending = [primary, hedge]
+        winner = None
+        while winner is None and pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((future for future in (primary, hedge) if future in done and not future.exception()), None)
+        for future in (primary, hedge):
+            if future is not winner:
+                future.add_done_callback(_close_response)
+        if winner is None:
+            # both requests failed, raises the error of the first one
+            return primary.result()
+        self._hedging.record_latency(time.perf_counter() - start, hedge_won=winner is hedge)
+        return winner.result()
+
+    def _get_hedging_executor(self) -> ThreadPoolExecutor:
+        if self._hedging_executor is None:
+            with self._session_lock:
+                if self._hedging_executor is None:
+                    self._hedging_executor = ThreadPoolExecutor(
+                        max_workers=2 * self._pool_settings["pool_size"], thread_name_prefix="hedging"
+                    )
+        return self._hedging_executor
+
+    def _build_url(self, endpoint_path: str = None, is_absolute_path=False, base_url: str = None) -> str:
+        """
+        Builds the URL of the endpoint relative to the base URL of the request, the base URL of the client
+        by default. The client is never changed, so the requests of different base URLs can be sent at the same time.
+        """
+        if is_absolute_path:
+            return super()._build_url(endpoint_path, is_absolute_path)
+        # same as the HttpClient, the trailing slash is required by the urljoin
+        base_url = base_url or self.base_url
+        base_url = base_url if base_url.endswith("/") else base_url + "/"
+        url_path = str(endpoint_path).strip() if endpoint_path is not None else ""
+        if not url_path:
+            return base_url
+
+        parsed = urlparse(urljoin(base_url, url_path))
+        query = f"?{parsed.query}" if parsed.query else ""
+        return f"{parsed.scheme}://{parsed.netloc}{quote(parsed.path, safe='/()=-')}{query}"
+
+    def _limit_host_requests(self, url: str) -> ContextManager:
+        """
+        Waits until less than `max_requests_per_host` requests are being sent to the host of the URL, so a slow host
+        does not take all the connections and threads.
+        """
+        if not self._max_requests_per_host:
+            return nullcontext()
+        host = urlparse(url).netloc
+        with self._session_lock:
+            semaphore = self._host_semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self._max_requests_per_host)
+                self._host_semaphores[host] = semaphore
+        return semaphore
+
+    def _open_connections(self, request: requests.PreparedRequest, send_settings: dict):
+        """
+        Opens the connections of the pool used by the first request at once, with the same TLS and proxy settings.
+        """
+        with self._session_lock:
+            if self._preconnected:
+                return
+            self._preconnected = True
+        if self._transport_adapter is None:
+            # replayed from a cassette
+            return
+        if not hasattr(self._transport_adapter, "preconnect"):
+            logging.warning(f'Opening the connections upfront is not supported by the "{self._transport}" transport.')
+            return
+        opened = self._transport_adapter.preconnect(
+            request,
+            self._preconnect,
+            verify=send_settings.get("verify"),
+            cert=send_settings.get("cert"),
+            proxies=send_settings.get("proxies"),
+        )
+        logging.info(f"Opened {opened} connections to {urlparse(request.url).netloc}.")
+
+    def get_pool_stats(self) -> Optional[Dict[str, int]]:
+        """
+        Returns the counters of the connection pools, None if not supported by the transport.
+        """
+        stats = getattr(self._transport_adapter, "stats", None)
+        return stats.to_dict() if stats else None
+
+    def _get_request_template(
+        self, method: str, url: str, params: dict, headers: dict, ignore_auth: bool
+    ) -> requests.PreparedRequest:
+        auth = None
+        token_version = None
+        if not ignore_auth and self._auth:
+            if self._auth_method:
+                self._auth_method.refresh_if_expiring()
+                token_version = self._auth_method.token_version
+            auth = self._auth
+
+        key = (
+            method.upper(),
+            url,
+            json.dumps(params, sort_keys=True, default=str),
+            json.dumps(headers, sort_keys=True, default=str),
+            id(auth),
+            token_version,
+        )
+        with self._session_lock:
+            template = self._request_templates.get(key)
+            if template is not None:
+                self._request_templates.move_to_end(key)
+                return template
+
+        request = requests.Request(method=method.upper(), url=url, headers=headers, params=params, auth=auth)
+        template = self.session.prepare_request(request)
+        with self._session_lock:
+            self._request_templates[key] = template
+            if len(self._request_templates) > self._request_template_cache_size:
+                self._request_templates.popitem(last=False)
+        return template
+
+    def _get_send_settings(self, url: str, send_kwargs: dict) -> dict:
+        """
+        Merges the request settings with the environment settings (proxies, CA bundle), resolved once per host.
+        """
+        host = urlparse(url).netloc
+        environment_settings = self._environment_settings.get(host)
+        if environment_settings is None:
+            environment_settings = self.session.merge_environment_settings(url, {}, None, None, None)
+            self._environment_settings[host] = environment_settings
+
+        settings = {**environment_settings, "allow_redirects": True}
+        settings["proxies"] = {**environment_settings["proxies"], **(send_kwargs.get("proxies") or {})}
+        for key in ("timeout", "stream", "cert", "allow_redirects"):
+            if send_kwargs.get(key) is not None:
+                settings[key] = send_kwargs[key]
+        # same as in requests, explicit True is replaced by the CA bundle from the environment
+        verify = send_kwargs.get("verify")
+        if verify is not None and verify is not True:
+            settings["verify"] = verify
+        return settings
+
+    def close(self):
+        """
+        Close the session and persist the recorded cassette if any.
+        """
+        stats = self.get_pool_stats()
+        if stats and (stats["hits"] or stats["misses"]):
+            logging.info(
+                f"Connection pool: {stats['hits']} requests sent over a reused connection, {stats['misses']} over "
+                f"a new connection ({stats['preconnected']} opened upfront, {stats['expired']} closed when idle, "
+                f"{stats['discarded']} discarded by a full pool)."
+            )
+        if self._hedging and self._hedging.requests:
+            logging.info(self._hedging.get_summary())
+        if self._hedging_executor is not None:
+            self._hedging_executor.shutdown(wait=False, cancel_futures=True)
+        if self._session is not None:
+            self._session.close()
+        if self._cassette:
+            self._cassette.save()
 
     def build_url(self, base_url, endpoint_path):
-        self.base_url = base_url
-        return self._build_url(endpoint_path)
+        return self._build_url(endpoint_path, base_url=base_url)
 
     # override to continue on retry error
     def _requests_retry_session(self, session=None):
         session = session or requests.Session()
-        retry = Retry(
+        # the session is shared by all requests of the run, the cookies set by a response must not leak to the others
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        retry = (CircuitBreakerRetry if self._circuit_breaker else Retry)(
             total=self.max_retries,
             read=self.max_retries,
             connect=self.max_retries,
@@ -84,7 +467,20 @@ class GenericHttpClient(HttpClient):
             allowed_methods=self.allowed_methods,
             raise_on_status=False,
         )
-        adapter = HTTPAdapter(max_retries=retry)
+        if self._circuit_breaker:
+            retry.circuit_breaker = self._circuit_breaker
+        if self._cassette and self._cassette.is_replay:
+            adapter = ReplayAdapter(self._cassette)
+        else:
+            self._transport_adapter = build_adapter(self._transport, retry, **self._pool_settings)
+            adapter = self._transport_adapter
+            if self._cassette:
+                adapter = RecordingAdapter(self._cassette, self._transport_adapter)
         session.mount("http://", adapter)
         session.mount("https://", adapter)
         return session
+
+
+def _close_response(future: Future):
+    if not future.cancelled() and not future.exception():
+        future.result().close()
@@ -0,0 +1,99 @@
+"""
+Hedged requests cutting the tail latency. When a response takes longer than the usual latency (a percentile of the
+observed latencies or a configured delay), the same request is sent once more and the first response is used.
+The other one is discarded once received.
+
+A hedged request is sent twice, so only the idempotent methods are hedged by default. The share of the hedged
+requests is limited by the hedge budget, so a slow API is not flooded with the duplicates.
+"""
+
+import threading
+from collections import deque
+from typing import Optional
+
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+NON_IDEMPOTENT_METHODS = ("POST", "PATCH")
+# the percentile is recomputed after this number of new latencies
+RECOMPUTE_INTERVAL = 20
+
+
+class HedgingPolicy:
+    def __init__(
+        self,
+        delay: float = 0,
+        percentile: float = 95,
+        min_samples: int = 20,
+        window_size: int = 1000,
+        max_ratio: float = 0.1,
+        allow_non_idempotent: bool = False,
+    ):
+        """
+        Args:
+            delay: seconds after which the request is hedged, 0 uses the percentile of the observed latencies
+            percentile: percentile of the observed latencies after which the request is hedged
+            min_samples: latencies observed before the requests are hedged by the percentile
+            window_size: number of the last latencies the percentile is computed from
+            max_ratio: maximum share of the hedged requests (0 - 1)
+            allow_non_idempotent: hedge the POST and PATCH requests as well, the API must handle duplicates
+        """
+        if delay < 0 or not 0 < percentile < 100:
+            raise ValueError("The hedging delay must not be negative and the percentile must be between 0 and 100.")
+        if not 0 <= max_ratio <= 1:
+            raise ValueError("The hedging max_ratio must be between 0 and 1.")
+        self.delay = delay
+        self.percentile = percentile
+        self.min_samples = max(min_samples, 1)
+        self.max_ratio = max_ratio
+        self.allow_non_idempotent = allow_non_idempotent
+
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._latencies = deque(maxlen=max(window_size, self.min_samples))
+        self._new_latencies = 0
+        self._percentile_delay: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def applies_to(self, method: str) -> bool:
+        method = method.upper()
+        return method in IDEMPOTENT_METHODS or (self.allow_non_idempotent and method in NON_IDEMPOTENT_METHODS)
+
+    def get_delay(self) -> Optional[float]:
+        """
+        Seconds after which the request is hedged, None until enough latencies are observed.
+        """
+        return self.delay or self._percentile_delay
+
+    def start_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def try_hedge(self) -> bool:
+        """
+        Reserves a hedged request, returns False if the hedge budget is exhausted.
+        """
+        with self._lock:
+            if self.hedged + 1 > self.max_ratio * self.requests:
+                return False
+            self.hedged += 1
+            return True
+
+    def record_latency(self, seconds: float, hedge_won: bool = False):
+        with self._lock:
+            if hedge_won:
+                self.hedge_wins += 1
+            self._latencies.append(seconds)
+            self._new_latencies += 1
+            if len(self._latencies) >= self.min_samples and (
+                self._percentile_delay is None or self._new_latencies >= RECOMPUTE_INTERVAL
+            ):
+                latencies = sorted(self._latencies)
+                index = min(int(len(latencies) * self.percentile / 100), len(latencies) - 1)
+                self._percentile_delay = latencies[index]
+                self._new_latencies = 0
+
+    def get_summary(self) -> str:
+        return (
+            f"Hedging: {self.hedged} of {self.requests} requests hedged, the duplicate request was faster "
+            f"in {self.hedge_wins} cases."
+        )
@@ -0,0 +1,445 @@
+"""
+Transports of the GenericHttpClient, implemented as the transport adapters of the requests session. The requests are
+prepared by the client (URL, headers, auth, body) and the responses are returned as requests responses the same way
+for all transports, so the auth refresh and the error messages do not depend on the transport. The retries follow
+the same urllib3 retry policy.
+
+- `http1`: the requests HTTPAdapter (urllib3), each connection sends one request at a time. The adapter counts
+  the requests sent over a reused and a new connection, closes the connections idle for longer than the keep-alive
+  timeout and may open the connections of a host upfront.
+- `http2`: the httpx client multiplexing the concurrent requests as streams of a single connection per host. The HTTP/2
+  is negotiated for the https URLs (falling back to HTTP/1.1), the http URLs are sent as HTTP/2 without TLS (prior
+  knowledge). The httpx package with the h2 package is an optional dependency installed with the "http2" extra.
+"""
+
+import importlib.util
+import io
+import logging
+import ssl
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Generator, Optional
+from urllib.parse import urlparse
+
+import certifi
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers, select_proxy
+from urllib3 import HTTPConnectionPool, HTTPResponse, HTTPSConnectionPool, PoolManager, Retry
+from urllib3.exceptions import (
+    ConnectTimeoutError,
+    HTTPError,
+    MaxRetryError,
+    NewConnectionError,
+    ProtocolError,
+    ReadTimeoutError,
+    ResponseError,
+)
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+TRANSPORT_HTTP1 = "http1"
+TRANSPORT_HTTP2 = "http2"
+TRANSPORTS = (TRANSPORT_HTTP1, TRANSPORT_HTTP2)
+
+# headers of the HTTP/1.1 connection, not allowed in HTTP/2
+CONNECTION_HEADERS = ("connection", "keep-alive", "proxy-connection", "transfer-encoding", "upgrade")
+READ_BLOCK_SIZE = 64 * 1024
+# clients by the TLS and proxy settings (e.g. the proxy of the iteration), the least recently used one is evicted
+MAX_CLIENTS = 8
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_HOSTS = 10
+
+
+def is_http2_available() -> bool:
+    return httpx is not None and importlib.util.find_spec("h2") is not None
+
+
+def validate_transport(transport: str):
+    if transport not in TRANSPORTS:
+        raise ValueError(f'Unsupported transport "{transport}", supported values are: {list(TRANSPORTS)}')
+    if transport == TRANSPORT_HTTP2 and not is_http2_available():
+        raise ValueError('The "http2" transport requires the httpx and h2 packages to be installed.')
+
+
+def build_adapter(
+    transport: str,
+    max_retries: Retry,
+    pool_size: int = DEFAULT_POOL_SIZE,
+    max_hosts: int = DEFAULT_MAX_HOSTS,
+    keep_alive_timeout: float = 0,
+) -> BaseAdapter:
+    """
+    Builds the transport adapter with `pool_size` connections kept open per host for `max_hosts` hosts,
+    a `keep_alive_timeout` of 0 keeps the idle connections open.
+    """
+    validate_transport(transport)
+    if transport == TRANSPORT_HTTP2:
+        return Http2Adapter(
+            max_retries=max_retries,
+            pool_size=pool_size,
+            max_hosts=max_hosts,
+            keep_alive_timeout=keep_alive_timeout,
+        )
+    return PooledHTTPAdapter(
+        keep_alive_timeout=keep_alive_timeout,
+        pool_connections=max_hosts,
+        pool_maxsize=pool_size,
+        max_retries=max_retries,
+    )
+
+
+def _build_ssl_context(verify, cert) -> ssl.SSLContext:
+    if verify is False:
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    elif isinstance(verify, str):
+        context = ssl.create_default_context(cafile=verify)
+    else:
+        context = ssl.create_default_context(cafile=certifi.where())
+    if isinstance(cert, str) and cert:
+        context.load_cert_chain(cert)
+    elif cert:
+        context.load_cert_chain(*cert)
+    return context
+
+
+def _build_timeout(timeout) -> "httpx.Timeout":
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return httpx.Timeout(read, connect=connect)
+    return httpx.Timeout(timeout)
+
+
+def _to_urllib3_error(error: Exception, url: str) -> Exception:
+    """
+    Converts the httpx error, so it is retried the same way as by the urllib3.
+    """
+    if isinstance(error, httpx.ConnectTimeout):
+        return ConnectTimeoutError(str(error))
+    if isinstance(error, httpx.ConnectError):
+        return NewConnectionError(None, str(error))
+    if isinstance(error, httpx.TimeoutException):
+        return ReadTimeoutError(None, url, str(error))
+    return ProtocolError(str(error), error)
+
+
+def _to_requests_error(error: Exception, request: requests.PreparedRequest) -> requests.RequestException:
+    """
+    Converts the urllib3 error the same way as the requests HTTPAdapter.
+    """
+    reason = error.reason if isinstance(error, MaxRetryError) else error
+    if isinstance(reason, ConnectTimeoutError) and not isinstance(reason, NewConnectionError):
+        return requests.exceptions.ConnectTimeout(error, request=request)
+    if isinstance(error, ReadTimeoutError):
+        return requests.exceptions.ReadTimeout(error, request=request)
+    if isinstance(reason, ResponseError):
+        return requests.exceptions.RetryError(error, request=request)
+    return requests.exceptions.ConnectionError(error, request=request)
+
+
+class PoolStats:
+    """
+    Counters of the connection pools shared by all hosts.
+    """
+
+    COUNTERS = ("hits", "misses", "preconnected", "expired", "discarded")
+
+    def __init__(self):
+        self._counters = dict.fromkeys(self.COUNTERS, 0)
+        self._lock = threading.Lock()
+
+    def increment(self, counter: str, count: int = 1):
+        with self._lock:
+            self._counters[counter] += count
+
+    def to_dict(self) -> Dict[str, int]:
+        """
+        Returns the number of requests sent over a reused connection (`hits`) and over a new connection (`misses`),
+        the connections opened upfront, closed after the keep-alive timeout and closed because the pool was full.
+        """
+        with self._lock:
+            return dict(self._counters)
+
+
+class _CountingPoolMixin:
+    stats: PoolStats = None
+    keep_alive_timeout: float = 0
+
+    def _get_conn(self, timeout=None):
+        connection = super()._get_conn(timeout)
+        last_used = getattr(connection, "last_used", None)
+        if (
+            self.keep_alive_timeout
+            and last_used is not None
+            and not connection.is_closed
+            and time.monotonic() - last_used > self.keep_alive_timeout
+        ):
+            # the server may have closed the idle connection already
+            connection.close()
+            self.stats.increment("expired")
+        self.stats.increment("misses" if connection.is_closed else "hits")
+        return connection
+
+    def _put_conn(self, connection):
+        if connection is not None:
+            connection.last_used = time.monotonic()
+            if self.pool is not None and self.pool.full():
+                self.stats.increment("discarded")
+        super()._put_conn(connection)
+
+    def preconnect(self, count: int) -> int:
+        """
+        Opens up to `count` connections of the pool at once, returns the number of opened connections.
+        """
+        connections = []
+        for _ in range(min(count, self.pool.maxsize)):
+            connections.append(super()._get_conn())
+
+        def connect(connection) -> int:
+            if not connection.is_closed:
+                return 0
+            try:
+                connection.connect()
+            except (OSError, HTTPError) as e:
+                logging.warning(f"Opening a connection to {self.host} failed: {e}")
+                return 0
+            return 1
+
+        try:
+            with ThreadPoolExecutor(max_workers=len(connections) or 1) as executor:
+                opened = sum(executor.map(connect, connections))
+        finally:
+            for connection in connections:
+                self._put_conn(connection)
+        self.stats.increment("preconnected", opened)
+        return opened
+
+
+class CountingHTTPConnectionPool(_CountingPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class CountingHTTPSConnectionPool(_CountingPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class _CountingPoolManager(PoolManager):
+    def __init__(self, stats: PoolStats, keep_alive_timeout: float, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+        self.keep_alive_timeout = keep_alive_timeout
+        self.pool_classes_by_scheme = {"http": CountingHTTPConnectionPool, "https": CountingHTTPSConnectionPool}
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super()._new_pool(scheme, host, port, request_context)
+        pool.stats = self.stats
+        pool.keep_alive_timeout = self.keep_alive_timeout
+        return pool
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter counting the reused and new connections of its pools. The connections through a proxy are not counted.
+    """
+
+    def __init__(self, keep_alive_timeout: float = 0, **kwargs):
+        self.stats = PoolStats()
+        self.keep_alive_timeout = keep_alive_timeout
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = _CountingPoolManager(
+            self.stats, self.keep_alive_timeout, num_pools=connections, maxsize=maxsize, block=block, **pool_kwargs
+        )
+
+    def preconnect(self, request: requests.PreparedRequest, count: int, verify=True, cert=None, proxies=None) -> int:
+        """
+        Opens up to `count` connections of the pool used by the request, returns the number of opened connections.
+        """
+        pool = self.get_connection_with_tls_context(request, verify, proxies=proxies, cert=cert)
+        if not isinstance(pool, _CountingPoolMixin):
+            return 0
+        return pool.preconnect(count)
+
+
+class Http2Adapter(BaseAdapter):
+    """
+    Transport adapter sending the requests over HTTP/2 using the httpx client.
+    """
+
+    def __init__(
+        self,
+        max_retries: Optional[Retry] = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        max_hosts: int = DEFAULT_MAX_HOSTS,
+        keep_alive_timeout: float = 0,
+    ):
+        super().__init__()
+        if not is_http2_available():
+            raise ValueError('The "http2" transport requires the httpx and h2 packages to be installed.')
+        self.max_retries = max_retries or Retry(0, read=False)
+        self.limits = httpx.Limits(
+            max_connections=pool_size * max_hosts,
+            max_keepalive_connections=pool_size * max_hosts,
+            keepalive_expiry=keep_alive_timeout or None,
+        )
+        self._clients: OrderedDict = OrderedDict()
+        # number of the requests being sent by each client, an evicted client is closed once it is not used
+        self._clients_in_use: Dict["httpx.Client", int] = {}
+        self._evicted_clients = set()
+        self._clients_lock = threading.Lock()
+
+    def _acquire_client(self, url: str, verify, cert, proxies: dict) -> "httpx.Client":
+        """
+        Returns the client of the connection settings, it must be released by `_release_client` once the request
+        is sent.
+        """
+        prior_knowledge = urlparse(url).scheme == "http"
+        proxy = select_proxy(url, proxies)
+        key = (prior_knowledge, verify, cert if isinstance(cert, (str, type(None))) else tuple(cert), proxy)
+        with self._clients_lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._create_client(prior_knowledge, verify, cert, proxy)
+                self._clients[key] = client
+                if len(self._clients) > MAX_CLIENTS:
+                    self._evict_client(self._clients.popitem(last=False)[1])
+            else:
+                self._clients.move_to_end(key)
+            self._clients_in_use[client] = self._clients_in_use.get(client, 0) + 1
+            return client
+
+    def _release_client(self, client: "httpx.Client"):
+        with self._clients_lock:
+            in_use = self._clients_in_use.pop(client) - 1
+            if in_use:
+                self._clients_in_use[client] = in_use
+            elif client in self._evicted_clients:
+                self._evicted_clients.remove(client)
+                client.close()
+
+    def _evict_client(self, client: "httpx.Client"):
+        # other threads may still be sending requests by the client
+        if client in self._clients_in_use:
+            self._evicted_clients.add(client)
+        else:
+            client.close()
+
+    def _create_client(self, prior_knowledge: bool, verify, cert, proxy) -> "httpx.Client":
+        return httpx.Client(
+            http1=not prior_knowledge,
+            http2=True,
+            verify=_build_ssl_context(verify, cert),
+            proxy=proxy,
+            follow_redirects=False,
+            limits=self.limits,
+            # the environment settings are already merged by the requests session
+            trust_env=False,
+        )
+
+    @staticmethod
+    def _get_body_position(body) -> Optional[int]:
+        if not hasattr(body, "read"):
+            return None
+        try:
+            return body.tell()
+        except (OSError, AttributeError):
+            # not seekable, can be sent only once
+            return None
+
+    @staticmethod
+    def _iterate_file(body: io.IOBase, position: Optional[int]) -> Generator[bytes, None, None]:
+        if position is not None:
+            body.seek(position)
+        while True:
+            block = body.read(READ_BLOCK_SIZE)
+            if not block:
+                break
+            yield block.encode("utf-8") if isinstance(block, str) else block
+
+    def _build_request(
+        self, client: "httpx.Client", request: requests.PreparedRequest, body_position: Optional[int], timeout
+    ) -> "httpx.Request":
+        headers = [(name, value) for name, value in request.headers.items() if name.lower() not in CONNECTION_HEADERS]
+        content = request.body
+        if hasattr(content, "read"):
+            # each attempt reads the file from the same position
+            content = self._iterate_file(content, body_position)
+        return client.build_request(
+            request.method, request.url, headers=headers, content=content, timeout=_build_timeout(timeout)
+        )
+
+    def send(
+        self, request: requests.PreparedRequest, stream=False, timeout=None, verify=True, cert=None, proxies=None
+    ) -> requests.Response:
+        client = self._acquire_client(request.url, verify, cert, proxies or {})
+        try:
+            return self._send(client, request, timeout)
+        finally:
+            self._release_client(client)
+
+    def _send(self, client: "httpx.Client", request: requests.PreparedRequest, timeout) -> requests.Response:
+        body_position = self._get_body_position(request.body)
+        retries = self.max_retries
+        while True:
+            try:
+                response = client.send(self._build_request(client, request, body_position, timeout))
+            except httpx.TransportError as e:
+                try:
+                    retries = retries.increment(request.method, request.url, error=_to_urllib3_error(e, request.url))
+                except (MaxRetryError, ConnectTimeoutError, ReadTimeoutError, ProtocolError) as error:
+                    raise _to_requests_error(error, request) from e
+                retries.sleep()
+                continue
+
+            raw = HTTPResponse(
+                body=response.content,
+                headers=list(response.headers.multi_items()),
+                status=response.status_code,
+                preload_content=False,
+            )
+            if retries.is_retry(request.method, response.status_code, "Retry-After" in response.headers):
+                try:
+                    retries = retries.increment(request.method, request.url, response=raw)
+                except MaxRetryError as error:
+                    if retries.raise_on_status:
+                        raise _to_requests_error(error, request) from error
+                    return self.build_response(request, response, raw)
+                retries.sleep(raw)
+                continue
+            return self.build_response(request, response, raw)
+
+    def build_response(
+        self, request: requests.PreparedRequest, response: "httpx.Response", raw: HTTPResponse
+    ) -> requests.Response:
+        result = requests.Response()
+        result.status_code = response.status_code
+        result.reason = response.reason_phrase
+        result.headers = CaseInsensitiveDict(response.headers.multi_items())
+        # the content is already decoded by the httpx
+        result.headers.pop("Content-Encoding", None)
+        result.raw = raw
+        result._content = response.content
+        result.encoding = get_encoding_from_headers(result.headers)
+        result.url = request.url
+        result.request = request
+        result.connection = self
+        return result
+
+    def close(self):
+        with self._clients_lock:
+            for client in list(self._clients.values()) + list(self._evicted_clients):
+                client.close()
+            self._clients.clear()
+            self._evicted_clients.clear()
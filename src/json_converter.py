@@ -1,9 +1,288 @@
+import csv
 import json
 import logging
+import math
+import re
 import sys
-from typing import List, Dict, Optional, Generator
+import time
+from itertools import chain
+from typing import List, Dict, Optional, Generator, Callable, Tuple
 
-from csv2json.hone_csv2json import Csv2JsonConverter
+TRUE_VALUES = {"t", "true", "yes", "1"}
+FALSE_VALUES = {"f", "false", "no"}
+INTEGER_PATTERN = re.compile(r"^-?(0|[1-9][0-9]*)$")
+FLOAT_PATTERN = re.compile(r"^-?(0|[1-9][0-9]*)(\.[0-9]+)?([eE][-+]?[0-9]+)?$")
+
+# what to do with values not matching the type inferred from the sample
+TYPE_FALLBACKS = ("string", "null", "fail")
+# python converts the CSV row by row, arrow in column batches (requires pyarrow)
+ENGINES = ("python", "arrow")
+
+
+# ########### CAST FUNCTIONS
+
+
+def cast_string(value: str):
+    return value
+
+
+def _parse_number(value: str):
+    """
+    Returns the integer or the finite float of the value, None if the value is not a number (e.g. nan, inf or 1e999).
+    """
+    if INTEGER_PATTERN.match(value):
+        return int(value)
+    if FLOAT_PATTERN.match(value):
+        number = float(value)
+        if math.isfinite(number):
+            return number
+    return None
+
+
+def cast_number(value: str):
+    """
+    Casts the value of a column typed as a number. Any value Python parses as a number is accepted (e.g. +1, .5
+    or a number with surrounding spaces), except the non-finite ones, which are not valid in JSON.
+    """
+    if value == "":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f'Value "{value}" is not a number') from None
+    if not math.isfinite(number):
+        raise ValueError(f'Value "{value}" is not a finite number')
+    return number
+
+
+def cast_bool(value: str):
+    lowered = value.lower()
+    if lowered in TRUE_VALUES:
+        return True
+    if lowered in FALSE_VALUES:
+        return False
+    if value == "":
+        return None
+    return value
+
+
+def cast_object(value: str):
+    if value == "":
+        return None
+    return json.loads(value)
+
+
+def cast_inferred(value: str):
+    """
+    Infers the type of a single value. Only values in the JSON number format are converted to numbers, so e.g. IDs
+    with leading zeros stay strings. The decimal numbers are converted to floats (1.50 is sent as 1.5).
+    """
+    number = _parse_number(value)
+    if number is not None:
+        return number
+    lowered = value.lower()
+    if lowered == "true":
+        return True
+    if lowered == "false":
+        return False
+    return value
+
+
+def _cast_number_strict(value: str):
+    number = _parse_number(value)
+    if number is not None:
+        return number
+    raise ValueError(f'Value "{value}" is not a number')
+
+
+def _cast_bool_strict(value: str):
+    lowered = value.lower()
+    if lowered == "true":
+        return True
+    if lowered == "false":
+        return False
+    raise ValueError(f'Value "{value}" is not a boolean')
+
+
+STRICT_CAST_FUNCTIONS: Dict[str, Callable] = {
+    "number": _cast_number_strict,
+    "bool": _cast_bool_strict,
+}
+
+
+def _infer_value_type(value: str) -> Optional[str]:
+    if value == "":
+        return None
+    if FLOAT_PATTERN.match(value):
+        return "number"
+    if value.lower() in ("true", "false"):
+        return "bool"
+    return "string"
+
+
+def infer_column_types(header: List[str], rows: List[List[str]], columns: List[str]) -> Dict[str, str]:
+    """
+    Infers a single type of each of the specified columns from the sample rows. Empty values are ignored,
+    columns with mixed or no values are typed as strings.
+    """
+    column_types = {}
+    for index, column in enumerate(header):
+        if column not in columns:
+            continue
+        types = {_infer_value_type(row[index]) for row in rows if index < len(row)}
+        types.discard(None)
+        column_types[column] = types.pop() if len(types) == 1 else "string"
+    return column_types
+
+
+def with_fallback(cast: Callable, fallback: str) -> Callable:
+    """
+    Wraps the strict cast function of a type inferred from the sample, empty values are converted to null.
+    Values that do not fit the type are kept as strings, converted to null or fail based on the fallback.
+    """
+
+    def cast_with_fallback(value: str):
+        if value == "":
+            return None
+        try:
+            return cast(value)
+        except ValueError:
+            if fallback == "fail":
+                raise ValueError(f'Value "{value}" does not match the type inferred from the sample.')
+            return value if fallback == "string" else None
+
+    cast_with_fallback.__name__ = f"{cast.__name__}_with_fallback"
+    return cast_with_fallback
+
+
+CAST_FUNCTIONS: Dict[str, Callable] = {
+    "string": cast_string,
+    "number": cast_number,
+    "bool": cast_bool,
+    "object": cast_object,
+}
+
+
+class ColumnPlan:
+    """
+    Conversion plan of a single column: position in the row, nested key path and cast function.
+    """
+
+    __slots__ = ("index", "name", "parents", "key", "cast")
+
+    def __init__(self, index: int, name: str, parents: Tuple[str, ...], key: str, cast: Callable):
+        self.index = index
+        self.name = name
+        self.parents = parents
+        self.key = key
+        self.cast = cast
+
+    def __repr__(self):
+        return f"ColumnPlan({self.name} -> {'.'.join(self.parents + (self.key,))}: {self.cast.__name__})"
+
+
+class RowConversionPlan:
+    """
+    Compiles the CSV header once into a per-column plan (nested key path, final name and a single cast function),
+    so converting a row is a single pass applying the plan.
+    """
+
+    def __init__(
+        self,
+        header: List[str],
+        nesting_delimiter: str = "__",
+        column_types: Optional[Dict[str, str]] = None,
+        column_name_override: Optional[dict] = None,
+        infer_undefined: bool = True,
+        inferred_column_types: Optional[Dict[str, str]] = None,
+        type_fallback: str = "string",
+    ):
+        self.header = header
+        self.width = len(header)
+        self.nesting_delimiter = nesting_delimiter
+        self.column_types = column_types or {}
+        self.column_name_override = column_name_override or {}
+        self.infer_undefined = infer_undefined
+        self.inferred_column_types = inferred_column_types or {}
+        self.type_fallback = type_fallback
+        self.columns: List[ColumnPlan] = self._compile()
+
+    def _get_cast_function(self, column: str) -> Callable:
+        column_type = self.column_types.get(column)
+        if column_type is None and column in self.inferred_column_types:
+            inferred_type = self.inferred_column_types[column]
+            if inferred_type == "string":
+                return cast_string
+            return with_fallback(STRICT_CAST_FUNCTIONS[inferred_type], self.type_fallback)
+        if column_type is None:
+            return cast_inferred if self.infer_undefined else cast_string
+        try:
+            return CAST_FUNCTIONS[column_type]
+        except KeyError:
+            raise ValueError(
+                f'Unsupported datatype "{column_type}" of column "{column}", '
+                f"supported types are: {list(CAST_FUNCTIONS.keys())}"
+            )
+
+    def _compile(self) -> List[ColumnPlan]:
+        # build the skeleton of the resulting object to resolve the final order of the keys
+        skeleton = {}
+        for index, column in enumerate(self.header):
+            path = column.split(self.nesting_delimiter) if self.nesting_delimiter else [column]
+            node = skeleton
+            for part in path[:-1]:
+                node = node.setdefault(part, {})
+                if not isinstance(node, dict):
+                    raise ValueError(f'Column "{column}" conflicts with the column "{part}" in the nested structure')
+            if isinstance(node.get(path[-1]), dict):
+                raise ValueError(f'Column "{column}" conflicts with other nested columns')
+            node[path[-1]] = index
+
+        # renamed keys are moved to the end of their parent object
+        for index, column in enumerate(self.header):
+            new_name = self.column_name_override.get(column)
+            if new_name is None:
+                continue
+            path = column.split(self.nesting_delimiter) if self.nesting_delimiter else [column]
+            node = skeleton
+            for part in path[:-1]:
+                node = node[part]
+            node[new_name] = node.pop(path[-1])
+
+        # nested structure of the resulting object, leaves hold the column index
+        self.structure = skeleton
+        columns = []
+        self._flatten_skeleton(skeleton, (), columns)
+        return columns
+
+    def _flatten_skeleton(self, node: dict, parents: Tuple[str, ...], columns: List[ColumnPlan]):
+        for key, value in node.items():
+            if isinstance(value, dict):
+                self._flatten_skeleton(value, parents + (key,), columns)
+            else:
+                column = self.header[value]
+                columns.append(ColumnPlan(value, column, parents, key, self._get_cast_function(column)))
+
+    def convert_row(self, row: List[str]) -> dict:
+        if len(row) != self.width:
+            row = (row + [""] * self.width)[: self.width]
+        result = {}
+        try:
+            for column in self.columns:
+                node = result
+                for parent in column.parents:
+                    child = node.get(parent)
+                    if child is None:
+                        child = node[parent] = {}
+                    node = child
+                node[column.key] = column.cast(row[column.index])
+        except ValueError as e:
+            raise ValueError(f'Invalid value of the column "{column.name}": {e}') from e
+        return result
 
 
 class JsonConverter:
@@ -15,17 +294,140 @@ class JsonConverter:
         column_data_types: Optional[List[Dict[str, str]]] = None,
         column_name_override: Optional[dict] = None,
         data_wrapper: Optional[str] = None,
+        inference_sample_size: int = 0,
+        type_fallback: str = "string",
+        storage_column_types: Optional[Dict[str, str]] = None,
+        engine: str = "python",
+        workers: int = 0,
+        preserve_order: bool = True,
     ):
+        """
+
+        Args:
+            nesting_delimiter: delimiter of nested objects in column names
+            chunk_size: number of rows sent in a single request
+            infer_data_types: infer types of columns without datatype override
+            column_data_types: datatype overrides
+            column_name_override: column names overrides
+            data_wrapper: template wrapping the resulting payload
+            inference_sample_size: if set, the type of each column is inferred once from the first N rows
+                instead of inferring each value separately
+            type_fallback: what to do with values not matching the inferred type: string, null or fail
+            storage_column_types: column types from the input table manifest, overridden by column_data_types
+            engine: conversion engine, python (row by row) or arrow (column batches, requires pyarrow)
+            workers: number of processes converting the rows with the python engine, 0 or 1 converts in-process
+            preserve_order: keep the order of the rows when converting in multiple processes
+        """
+        if type_fallback not in TYPE_FALLBACKS:
+            raise ValueError(f'Unsupported type fallback "{type_fallback}", supported values are: {TYPE_FALLBACKS}')
+        if engine not in ENGINES:
+            raise ValueError(f'Unsupported conversion engine "{engine}", supported values are: {ENGINES}')
+        if engine == "arrow":
+            # optional dependency
+            import arrow_engine
+
+            if not arrow_engine.is_available():
+                raise ValueError('The "arrow" conversion engine requires the pyarrow package to be installed.')
         self.nesting_delimiter = nesting_delimiter
         self.chunk_size = chunk_size or sys.maxsize
         self.infer_data_types = infer_data_types
         self.column_data_types = column_data_types or []
         self.data_wrapper = data_wrapper
         self.column_name_override = column_name_override or {}
+        self.inference_sample_size = inference_sample_size or 0
+        self.type_fallback = type_fallback
+        self.storage_column_types = storage_column_types or {}
+        self.engine = engine
+        self.workers = workers or 0
+        self.preserve_order = preserve_order
+        # conversion statistics
+        self.rows_converted = 0
+        self.conversion_seconds = 0.0
+
+    @staticmethod
+    def _get_column_types(column_data_types: List[Dict[str, str]]) -> Dict[str, str]:
+        """
+        Supports both {"column": "col", "type": "number"} and {"col": "number"} formats of the type overrides.
+        """
+        column_types = {}
+        for override in column_data_types:
+            if "column" in override and "type" in override:
+                column_types[override["column"]] = override["type"]
+            else:
+                column_types.update(override)
+        return column_types
+
+    def get_plan_parameters(self, header: List[str], sample_rows: Optional[List[List[str]]] = None) -> dict:
+        """
+        Returns the picklable parameters of the row conversion plan, so the plan can be rebuilt in other processes.
+        """
+        column_types = {**self.storage_column_types, **self._get_column_types(self.column_data_types)}
+        inferred_column_types = None
+        if self.infer_data_types and sample_rows is not None:
+            undefined_columns = [c for c in header if c not in column_types]
+            inferred_column_types = infer_column_types(header, sample_rows, undefined_columns)
+            logging.debug(f"Column types inferred from {len(sample_rows)} rows: {inferred_column_types}")
+
+        return dict(
+            header=header,
+            nesting_delimiter=self.nesting_delimiter,
+            column_types=column_types,
+            column_name_override=self.column_name_override,
+            infer_undefined=self.infer_data_types,
+            inferred_column_types=inferred_column_types,
+            type_fallback=self.type_fallback,
+        )
+
+    def build_plan(self, header: List[str], sample_rows: Optional[List[List[str]]] = None) -> RowConversionPlan:
+        return RowConversionPlan(**self.get_plan_parameters(header, sample_rows))
+
+    def serialize_chunk(self, rows: List[str]) -> bytes:
+        """
+        Builds the payload of already serialized JSON rows.
+        """
+        data = f"[{','.join(rows)}]" if self.chunk_size > 1 else rows[0]
+        if self.data_wrapper:
+            # backward compatibility
+            data = self.data_wrapper.replace("{{data}}", data).replace("[[data]]", data)
+        return data.encode("utf-8")
+
+    def read_sample(self, reader) -> List[List[str]]:
+        sample_rows = []
+        while len(sample_rows) < self.inference_sample_size:
+            row = next(reader, None)
+            if not row:
+                break
+            sample_rows.append(row)
+        return sample_rows
+
+    def convert_file(self, in_stream) -> Generator[dict, None, None]:
+        """
+        Converts the CSV text stream using the configured engine.
+        """
+        if self.engine == "arrow":
+            from arrow_engine import ArrowBatchConverter
+
+            return ArrowBatchConverter(self).convert_stream(in_stream)
+        reader = csv.reader(in_stream, lineterminator="\n")
+        if self.workers > 1:
+            from parallel_converter import ParallelConverter
+
+            return ParallelConverter(self, self.workers, self.preserve_order).convert_stream(reader)
+        return self.convert_stream(reader)
 
     def convert_stream(self, reader) -> Generator[dict, None, None]:
+        start = time.perf_counter()
         header = next(reader, None)
-        converter = Csv2JsonConverter(header, delimiter=self.nesting_delimiter)
+        if not header:
+            logging.warning("The file is empty!")
+            return
+        sample_rows = None
+        if self.infer_data_types and self.inference_sample_size:
+            sample_rows = self.read_sample(reader)
+            # the sampled rows are converted first
+            reader = chain(sample_rows, reader)
+        plan = self.build_plan(header, sample_rows)
+        convert_row = plan.convert_row
         # fetch first row
         row = next(reader, None)
 
@@ -33,33 +435,23 @@ class JsonConverter:
             logging.warning("The file is empty!")
 
         while row:  # outer loop, create chunks
-            continue_it = True
-            i = 0
-            json_string = "[" if self.chunk_size > 1 else ""
-            while continue_it:
-                i += 1
-                result = converter.convert_row(
-                    row=row,
-                    coltypes=self.column_data_types,
-                    delimit=self.nesting_delimiter,
-                    colname_override=self.column_name_override,
-                    infer_undefined=self.infer_data_types,
-                )
-
-                json_string += json.dumps(result[0])
+            if start is None:
+                start = time.perf_counter()
+            rows = []
+            while row and len(rows) < self.chunk_size:
+                rows.append(convert_row(row))
                 row = next(reader, None)
 
-                if not row or (self.chunk_size and i >= self.chunk_size):
-                    continue_it = False
-
-                if continue_it:
-                    json_string += ","
-
-            json_string += "]" if self.chunk_size > 1 else ""
-            data = json.loads(json_string)
+            data = rows if self.chunk_size > 1 else rows[0]
             data = self._wrap_json_payload(data)
+            self.rows_converted += len(rows)
+            self.conversion_seconds += time.perf_counter() - start
+            start = None
             yield data
 
+        if start is not None:
+            self.conversion_seconds += time.perf_counter() - start
+
     def _wrap_json_payload(self, data: dict):
         if not self.data_wrapper:
             return data
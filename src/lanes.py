@@ -0,0 +1,114 @@
+"""
+Partitioned sending with per-key ordering. The requests are hashed by their partition key (e.g. the ID of the entity)
+into a fixed number of lanes. The requests of each lane are sent one by one in the order they were submitted, while
+all the lanes are sent at the same time. The requests of the same key are therefore always sent in order.
+"""
+
+import json
+import logging
+import queue
+import threading
+import zlib
+from typing import Callable, List, Optional
+
+QUEUE_POLL_SECONDS = 0.1
+
+
+class LanesStopped(Exception):
+    pass
+
+
+class _EndOfLane:
+    pass
+
+
+END_OF_LANE = _EndOfLane()
+
+
+class OrderedLanes:
+    def __init__(self, lanes: int, queue_size: int = 100):
+        """
+        Args:
+            lanes: number of the lanes sent at the same time
+            queue_size: requests waiting in each lane, submitting waits while the lane is full
+        """
+        self.lanes = max(lanes, 1)
+        self.tasks = [0] * self.lanes
+        self._queues = [queue.Queue(maxsize=max(queue_size, 1)) for _ in range(self.lanes)]
+        self._stop_event = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._threads: List[threading.Thread] = [
+            threading.Thread(target=self._run_lane, args=(lane_queue,), name=f"lane-{index}", daemon=True)
+            for index, lane_queue in enumerate(self._queues)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def get_lane(self, key: tuple) -> int:
+        """
+        Stable lane of the key, the same in each run.
+        """
+        return zlib.crc32(json.dumps(key, default=str).encode("utf-8")) % self.lanes
+
+    def submit(self, key: tuple, task: Callable[[], None]):
+        """
+        Queues the task to the lane of the key. Raises LanesStopped if a task of any lane failed.
+        """
+        lane = self.get_lane(key)
+        self._put(self._queues[lane], task)
+        self.tasks[lane] += 1
+
+    def _put(self, lane_queue: queue.Queue, item):
+        while True:
+            if self._stop_event.is_set():
+                raise LanesStopped()
+            try:
+                lane_queue.put(item, timeout=QUEUE_POLL_SECONDS)
+                return
+            except queue.Full:
+                continue
+
+    def _run_lane(self, lane_queue: queue.Queue):
+        while not self._stop_event.is_set():
+            try:
+                task = lane_queue.get(timeout=QUEUE_POLL_SECONDS)
+            except queue.Empty:
+                continue
+            if task is END_OF_LANE:
+                return
+            try:
+                task()
+            except BaseException as e:
+                # the first failure stops all the lanes
+                if self._error is None:
+                    self._error = e
+                self._stop_event.set()
+                return
+
+    def close(self):
+        """
+        Waits until all the queued tasks are done. Raises the first error of the failed task if any.
+        """
+        for lane_queue in self._queues:
+            try:
+                self._put(lane_queue, END_OF_LANE)
+            except LanesStopped:
+                break
+        for thread in self._threads:
+            thread.join()
+        if self._error is not None:
+            raise self._error
+        busiest = max(self.tasks)
+        if busiest:
+            logging.info(
+                f"Sent {sum(self.tasks)} iterations in {self.lanes} ordered lanes, "
+                f"the busiest lane sent {busiest} iterations."
+            )
+
+    def cancel(self):
+        """
+        Stops all the lanes, the queued tasks are dropped.
+        """
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join()
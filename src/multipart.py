@@ -0,0 +1,103 @@
+"""
+MULTIPART content type. The input table is sent as the file part of a multipart/form-data request with additional
+form fields.
+
+The request body is a lazy iterable reading the file in blocks while it is being sent, so the file is never loaded into
+memory. The Content-Length is sent if the size of the body is known upfront (an uncompressed file), otherwise the body
+is sent with the chunked transfer encoding. Each iteration of the body reads the file from the start again, so a
+retried request sends the same content.
+"""
+
+import io
+import json
+import shutil
+import tempfile
+import zlib
+from typing import Dict, Generator, Optional
+
+from urllib3.fields import RequestField
+from urllib3.filepost import choose_boundary
+
+READ_BLOCK_SIZE = 64 * 1024
+SPOOL_MEMORY_SIZE = 8 * 1024 * 1024
+# gzip container of the deflate stream
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def _render_part(boundary: str, name: str, data: bytes = b"", file_name: str = None, content_type: str = None) -> bytes:
+    field = RequestField(name, data, filename=file_name)
+    field.make_multipart(content_type=content_type)
+    return f"--{boundary}\r\n{field.render_headers()}".encode("utf-8") + data
+
+
+def _encode_value(value) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    if not isinstance(value, str):
+        value = json.dumps(value)
+    return value.encode("utf-8")
+
+
+class MultipartBody:
+    """
+    Multipart request body with the form fields followed by the file part. A stream that is not seekable is spooled
+    first (in memory up to a limit, then to a temporary file), so the request can be retried.
+    """
+
+    def __init__(
+        self,
+        file_stream: io.IOBase,
+        file_name: str,
+        file_field: str = "file",
+        file_content_type: str = "text/csv",
+        fields: Optional[Dict[str, object]] = None,
+        compress: bool = False,
+    ):
+        self.boundary = choose_boundary()
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        self.compress = compress
+        self._spool = None
+        if not file_stream.seekable():
+            self._spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_SIZE)
+            shutil.copyfileobj(file_stream, self._spool, READ_BLOCK_SIZE)
+            self._spool.seek(0)
+            file_stream = self._spool
+        self._file_stream = file_stream
+        self._file_start = file_stream.tell()
+
+        if compress:
+            file_name = f"{file_name}.gz"
+            file_content_type = "application/gzip"
+        fields_data = [
+            _render_part(self.boundary, name, _encode_value(value)) + b"\r\n" for name, value in (fields or {}).items()
+        ]
+        self._head = b"".join(fields_data) + _render_part(self.boundary, file_field, b"", file_name, file_content_type)
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode("utf-8")
+        if not compress:
+            # the requests library sends the Content-Length instead of the chunked encoding
+            self.len = len(self._head) + self._get_file_size() + len(self._tail)
+
+    def _get_file_size(self) -> int:
+        end = self._file_stream.seek(0, io.SEEK_END)
+        self._file_stream.seek(self._file_start)
+        return end - self._file_start
+
+    def __iter__(self) -> Generator[bytes, None, None]:
+        self._file_stream.seek(self._file_start)
+        yield self._head
+        compressor = zlib.compressobj(wbits=GZIP_WBITS) if self.compress else None
+        while True:
+            block = self._file_stream.read(READ_BLOCK_SIZE)
+            if not block:
+                break
+            if compressor:
+                block = compressor.compress(block)
+            if block:
+                yield block
+        if compressor:
+            yield compressor.flush()
+        yield self._tail
+
+    def close(self):
+        if self._spool is not None:
+            self._spool.close()
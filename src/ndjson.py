@@ -0,0 +1,183 @@
+"""
+NDJSON (newline delimited JSON) content type. The rows are converted by the row conversion plan of the JsonConverter
+and streamed as one JSON object per line into the request bodies, so no JSON array of the rows is built in memory.
+
+A request body is a lazy iterable sent with the chunked transfer encoding. The lines are pulled from the input while
+the body is being sent and stop once the row or byte limit of the request is reached. The sent content is spooled
+(in memory up to a limit, then to a temporary file), so a retried request sends the same lines again.
+"""
+
+import csv
+import json
+import logging
+import re
+import tempfile
+import time
+from itertools import chain
+from typing import Callable, Generator, Iterator, List, Optional
+
+from json_converter import JsonConverter
+
+CONTENT_TYPE = "application/x-ndjson"
+SEND_BLOCK_SIZE = 64 * 1024
+SPOOL_MEMORY_SIZE = 8 * 1024 * 1024
+PLACEHOLDER_PATTERN = re.compile(r"\[\[([^\]]+)\]\]")
+
+
+class _LineSource:
+    def __init__(self, lines: Iterator[bytes]):
+        self._lines = lines
+        self._next: Optional[bytes] = None
+
+    def peek(self) -> Optional[bytes]:
+        if self._next is None:
+            self._next = next(self._lines, None)
+        return self._next
+
+    def pop(self) -> bytes:
+        line = self.peek()
+        self._next = None
+        return line
+
+
+class NdjsonBody:
+    """
+    Request body of at most `max_rows` lines and `max_bytes` bytes (0 is unlimited), a single line exceeding
+    the byte limit is sent in a request on its own.
+    """
+
+    def __init__(self, source: _LineSource, max_rows: int = 0, max_bytes: int = 0):
+        self._source = source
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.rows = 0
+        self.size = 0
+        self._complete = False
+        self._spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_SIZE)
+
+    def __iter__(self) -> Generator[bytes, None, None]:
+        if self.size:
+            # replayed (e.g. a retry), the content pulled by the previous attempt is sent first
+            self._spool.seek(0)
+            remaining = self.size
+            while remaining:
+                block = self._spool.read(min(SEND_BLOCK_SIZE, remaining))
+                remaining -= len(block)
+                yield block
+        yield from self._pull()
+
+    def _is_full(self, line: bytes) -> bool:
+        if not self.rows:
+            return False
+        if self.max_rows and self.rows >= self.max_rows:
+            return True
+        return bool(self.max_bytes and self.size + len(line) > self.max_bytes)
+
+    def _pull(self) -> Generator[bytes, None, None]:
+        block: List[bytes] = []
+        block_size = 0
+        while not self._complete:
+            line = self._source.peek()
+            if line is None or self._is_full(line):
+                self._complete = True
+                break
+            self._source.pop()
+            self._spool.seek(self.size)
+            self._spool.write(line)
+            self.rows += 1
+            self.size += len(line)
+            block.append(line)
+            block_size += len(line)
+            if block_size >= SEND_BLOCK_SIZE:
+                yield b"".join(block)
+                block = []
+                block_size = 0
+        if block:
+            yield b"".join(block)
+
+    def drain(self):
+        """
+        Pulls the rest of the lines of the request, e.g. if the body was not sent by the client.
+        """
+        for _ in self._pull():
+            pass
+
+    def close(self):
+        self._spool.close()
+
+
+class NdjsonConverter:
+    """
+    Converts the CSV into NDJSON request bodies. The optional `line_prefix` template is added as a separate line
+    before each row (e.g. the action line of a bulk API), the `[[column]]` placeholders are replaced by the values
+    of the input columns.
+    """
+
+    def __init__(self, converter: JsonConverter, max_rows: int = 0, max_bytes: int = 0, line_prefix: str = ""):
+        self.converter = converter
+        self.max_rows = max_rows or 0
+        self.max_bytes = max_bytes or 0
+        self.line_prefix = line_prefix or ""
+
+    def _build_prefix(self, header: List[str]) -> Optional[Callable[[List[str]], bytes]]:
+        if not self.line_prefix:
+            return None
+        parts = PLACEHOLDER_PATTERN.split(self.line_prefix)
+        if len(parts) == 1:
+            static_prefix = f"{self.line_prefix}\n".encode("utf-8")
+            return lambda row: static_prefix
+
+        # odd parts are the column names
+        column_indexes = {}
+        for column in parts[1::2]:
+            if column not in header:
+                raise ValueError(f'The column "{column}" of the NDJSON line prefix is not in the input table.')
+            column_indexes[column] = header.index(column)
+
+        def render(row: List[str]) -> bytes:
+            rendered = [
+                part if position % 2 == 0 else json.dumps(row[column_indexes[part]])[1:-1]
+                for position, part in enumerate(parts)
+            ]
+            return f"{''.join(rendered)}\n".encode("utf-8")
+
+        return render
+
+    def iterate_lines(self, in_stream) -> Generator[bytes, None, None]:
+        converter = self.converter
+        reader = csv.reader(in_stream, lineterminator="\n")
+        header = next(reader, None)
+        if not header:
+            logging.warning("The file is empty!")
+            return
+        sample_rows = None
+        if converter.infer_data_types and converter.inference_sample_size:
+            sample_rows = converter.read_sample(reader)
+            reader = chain(sample_rows, reader)
+        convert_row = converter.build_plan(header, sample_rows).convert_row
+        render_prefix = self._build_prefix(header)
+        dumps = json.dumps
+
+        for row in reader:
+            if not row:
+                break
+            start = time.perf_counter()
+            line = f"{dumps(convert_row(row))}\n".encode("utf-8")
+            if render_prefix:
+                line = render_prefix(row) + line
+            converter.rows_converted += 1
+            converter.conversion_seconds += time.perf_counter() - start
+            yield line
+
+    def iterate_bodies(self, in_stream) -> Generator[NdjsonBody, None, None]:
+        """
+        Yields the request bodies, each body must be sent before the next one is requested.
+        """
+        source = _LineSource(self.iterate_lines(in_stream))
+        while source.peek() is not None:
+            body = NdjsonBody(source, self.max_rows, self.max_bytes)
+            try:
+                yield body
+                body.drain()
+            finally:
+                body.close()
@@ -0,0 +1,141 @@
+"""
+Multi-process conversion of the JsonConverter. The main process reads the CSV and splits it into row ranges,
+the worker processes convert and serialize the rows and the main process joins them into the chunk payloads.
+"""
+
+import json
+import logging
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from itertools import chain
+from typing import Deque, Generator, List, Optional, Tuple
+
+from json_converter import RowConversionPlan
+
+DEFAULT_TASK_ROWS = 2000
+# the workers are not forked from the main process, which runs the threads of the HTTP client and the input readers
+# (a fork copies their locks in whatever state they are), the forkserver starts them from a clean process
+MP_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# conversion plan of the worker process, built once by the pool initializer
+_worker_plan: Optional[RowConversionPlan] = None
+
+
+def _init_worker(plan_parameters: dict):
+    global _worker_plan
+    _worker_plan = RowConversionPlan(**plan_parameters)
+
+
+def _convert_rows(rows: List[List[str]]) -> Tuple[List[str], float]:
+    start = time.perf_counter()
+    convert_row = _worker_plan.convert_row
+    dumps = json.dumps
+    serialized = [dumps(convert_row(row)) for row in rows]
+    return serialized, time.perf_counter() - start
+
+
+class ParallelConverter:
+    """
+    Converts the CSV rows into serialized JSON payloads in a pool of worker processes.
+
+    At most `max_pending_tasks` row ranges are read ahead of the sender, which keeps the memory bounded.
+    The payloads keep the order of the input rows unless `preserve_order` is disabled, in that case the row ranges
+    are sent as soon as they are converted.
+    """
+
+    def __init__(
+        self,
+        converter,
+        workers: int,
+        preserve_order: bool = True,
+        task_rows: int = DEFAULT_TASK_ROWS,
+        max_pending_tasks: Optional[int] = None,
+    ):
+        self.converter = converter
+        self.workers = workers
+        self.preserve_order = preserve_order
+        self.task_rows = task_rows
+        self.max_pending_tasks = max_pending_tasks or workers * 2
+
+    def _read_tasks(self, reader) -> Generator[List[List[str]], None, None]:
+        rows = []
+        for row in reader:
+            if not row:
+                break
+            rows.append(row)
+            if len(rows) >= self.task_rows:
+                yield rows
+                rows = []
+        if rows:
+            yield rows
+
+    def convert_stream(self, reader) -> Generator[bytes, None, None]:
+        converter = self.converter
+        header = next(reader, None)
+        if not header:
+            logging.warning("The file is empty!")
+            return
+
+        sample_rows = None
+        if converter.infer_data_types and converter.inference_sample_size:
+            sample_rows = converter.read_sample(reader)
+            reader = chain(sample_rows, reader)
+        plan_parameters = converter.get_plan_parameters(header, sample_rows)
+        # validate the plan in the main process, so the configuration errors are raised right away
+        RowConversionPlan(**plan_parameters)
+
+        chunk_size = converter.chunk_size
+        pending: List[str] = []
+        total_rows = 0
+        with ProcessPoolExecutor(
+            self.workers,
+            mp_context=multiprocessing.get_context(MP_START_METHOD),
+            initializer=_init_worker,
+            initargs=(plan_parameters,),
+        ) as executor:
+            try:
+                for serialized_rows in self._convert_tasks(executor, self._read_tasks(reader)):
+                    pending.extend(serialized_rows)
+                    total_rows += len(serialized_rows)
+                    full_chunks_end = len(pending) - len(pending) % chunk_size
+                    for offset in range(0, full_chunks_end, chunk_size):
+                        chunk_end = offset + chunk_size
+                        yield self._finish_chunk(pending[offset:chunk_end])
+                    del pending[:full_chunks_end]
+                if pending:
+                    yield self._finish_chunk(pending)
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+        if total_rows == 0:
+            logging.warning("The file is empty!")
+
+    def _convert_tasks(self, executor, tasks) -> Generator[List[str], None, None]:
+        in_flight: Deque[Future] = deque()
+
+        def collect(future: Future) -> List[str]:
+            serialized_rows, seconds = future.result()
+            self.converter.conversion_seconds += seconds
+            return serialized_rows
+
+        def collect_next() -> Generator[List[str], None, None]:
+            if self.preserve_order:
+                yield collect(in_flight.popleft())
+                return
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                in_flight.remove(future)
+                yield collect(future)
+
+        for task in tasks:
+            in_flight.append(executor.submit(_convert_rows, task))
+            while len(in_flight) >= self.max_pending_tasks:
+                yield from collect_next()
+        while in_flight:
+            yield from collect_next()
+
+    def _finish_chunk(self, rows: List[str]) -> bytes:
+        self.converter.rows_converted += len(rows)
+        return self.converter.serialize_chunk(rows)
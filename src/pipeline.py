@@ -0,0 +1,187 @@
+"""
+Pipelined execution of the JSON content types. Reading the input CSV, converting the rows and sending the requests run
+in separate stages connected by bounded queues, so reading and conversion overlap with the network latency.
+"""
+
+import csv
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Generator, Iterable, List
+
+DEFAULT_READ_BATCH_ROWS = 500
+QUEUE_POLL_SECONDS = 0.1
+
+
+class _EndOfStream:
+    pass
+
+
+END_OF_STREAM = _EndOfStream()
+
+
+class PipelineStopped(Exception):
+    pass
+
+
+class _StageFailure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class StageQueue:
+    """
+    Bounded queue between two stages collecting the queue depth and the time the stages spent blocked on it.
+    A producer blocked on a full queue waits for the consumer (the consumer is the bottleneck), a consumer blocked
+    on an empty queue waits for the producer.
+    """
+
+    def __init__(self, name: str, maxsize: int, stop_event: threading.Event):
+        self.name = name
+        self.maxsize = maxsize
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._stop_event = stop_event
+        self.items = 0
+        self.depth_total = 0
+        self.depth_max = 0
+        self.put_blocked_seconds = 0.0
+        self.get_blocked_seconds = 0.0
+
+    def put(self, item):
+        start = time.perf_counter()
+        while True:
+            if self._stop_event.is_set():
+                raise PipelineStopped()
+            try:
+                self._queue.put(item, timeout=QUEUE_POLL_SECONDS)
+                break
+            except queue.Full:
+                continue
+        self.put_blocked_seconds += time.perf_counter() - start
+
+    def get(self):
+        start = time.perf_counter()
+        while True:
+            if self._stop_event.is_set():
+                raise PipelineStopped()
+            try:
+                depth = self._queue.qsize()
+                item = self._queue.get(timeout=QUEUE_POLL_SECONDS)
+                break
+            except queue.Empty:
+                continue
+        self.get_blocked_seconds += time.perf_counter() - start
+        if isinstance(item, _StageFailure):
+            raise item.error
+        if item is not END_OF_STREAM:
+            self.items += 1
+            self.depth_total += depth
+            self.depth_max = max(self.depth_max, depth)
+        return item
+
+    def iterate(self) -> Generator[object, None, None]:
+        while True:
+            item = self.get()
+            if item is END_OF_STREAM:
+                return
+            yield item
+
+    def get_metrics(self) -> dict:
+        return {
+            "items": self.items,
+            "capacity": self.maxsize,
+            "depth_avg": round(self.depth_total / self.items, 2) if self.items else 0,
+            "depth_max": self.depth_max,
+            "producer_blocked_seconds": round(self.put_blocked_seconds, 3),
+            "consumer_blocked_seconds": round(self.get_blocked_seconds, 3),
+        }
+
+
+class JsonPipeline:
+    """
+    Runs the reader, converter and sender stages of the JSON content types.
+
+    The reader stage reads batches of CSV rows into the row queue (at most `read_buffer` batches ahead),
+    the converter stage converts them into payloads (at most `convert_buffer` payloads ahead) and the sender stage
+    sends them from the calling thread. The arrow engine and the conversion workers read the CSV on their own,
+    so the reader and converter stages are merged in that case.
+    """
+
+    def __init__(self, read_buffer: int, convert_buffer: int, read_batch_rows: int = DEFAULT_READ_BATCH_ROWS):
+        self.read_buffer = max(read_buffer, 1)
+        self.convert_buffer = max(convert_buffer, 1)
+        self.read_batch_rows = read_batch_rows
+        self._stop_event = threading.Event()
+        self.row_queue = StageQueue("rows", self.read_buffer, self._stop_event)
+        self.payload_queue = StageQueue("payloads", self.convert_buffer, self._stop_event)
+
+    def run(self, in_stream, converter, send: Callable[[object], None]):
+        if converter.engine == "python" and converter.workers <= 1:
+            reader_thread = self._start_stage("reader", self._read, in_stream)
+            payloads = converter.convert_stream(self._iterate_rows())
+        else:
+            reader_thread = None
+            payloads = converter.convert_file(in_stream)
+        converter_thread = self._start_stage("converter", self._convert, payloads)
+
+        try:
+            for payload in self.payload_queue.iterate():
+                send(payload)
+        finally:
+            self._stop_event.set()
+            for thread in (reader_thread, converter_thread):
+                if thread:
+                    thread.join()
+        self.log_metrics()
+
+    def _start_stage(self, name: str, target: Callable, *args) -> threading.Thread:
+        thread = threading.Thread(target=target, args=args, name=f"pipeline-{name}", daemon=True)
+        thread.start()
+        return thread
+
+    def _run_stage(self, output: StageQueue, items: Iterable):
+        try:
+            for item in items:
+                output.put(item)
+            output.put(END_OF_STREAM)
+        except PipelineStopped:
+            return
+        except BaseException as e:
+            # handed over to the consumer, which raises it
+            try:
+                output.put(_StageFailure(e))
+            except PipelineStopped:
+                return
+
+    def _read(self, in_stream):
+        self._run_stage(self.row_queue, self._read_batches(in_stream))
+
+    def _read_batches(self, in_stream) -> Generator[List[List[str]], None, None]:
+        batch = []
+        for row in csv.reader(in_stream, lineterminator="\n"):
+            batch.append(row)
+            if len(batch) >= self.read_batch_rows:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _iterate_rows(self) -> Generator[List[str], None, None]:
+        for batch in self.row_queue.iterate():
+            yield from batch
+
+    def _convert(self, payloads: Iterable):
+        self._run_stage(self.payload_queue, payloads)
+
+    def get_metrics(self) -> dict:
+        return {queue.name: queue.get_metrics() for queue in (self.row_queue, self.payload_queue) if queue.items}
+
+    def log_metrics(self):
+        for name, metrics in self.get_metrics().items():
+            logging.info(
+                f'Pipeline queue "{name}": {metrics["items"]} items, depth avg/max/capacity: '
+                f'{metrics["depth_avg"]}/{metrics["depth_max"]}/{metrics["capacity"]}, '
+                f'producer blocked {metrics["producer_blocked_seconds"]} s, '
+                f'consumer blocked {metrics["consumer_blocked_seconds"]} s'
+            )
@@ -0,0 +1,142 @@
+"""
+Record-offset index of a CSV file. The file is memory-mapped and scanned once for the record boundaries, so the exact
+row count is known up front and any row range can be read without parsing the rows before it.
+
+Like in the sharding, a newline ends a record only if it is preceded by an even number of quote characters.
+The file is scanned in blocks ending at record boundaries and the index keeps the byte offset and the row number of
+each block start, so it stays small even for huge files. The records of a block are counted without looping over
+its rows: all bytes except the quotes and newlines are deleted, the adjacent quotes (quoted values without a newline
+and escaped quotes) are dropped and only the newlines outside of the remaining quotes are counted.
+"""
+
+import io
+import mmap
+from array import array
+from bisect import bisect_right
+from itertools import repeat
+from typing import List, Optional, Tuple
+
+from sharding import NEWLINE, QUOTE, ShardStream
+
+INDEX_BLOCK_SIZE = 1024 * 1024
+# all bytes except the quote and the newline
+_OTHER_BYTES = bytes(byte for byte in range(256) if byte not in QUOTE + NEWLINE)
+
+
+def count_records(block: bytes, parity: int) -> Tuple[int, int]:
+    """
+    Returns the number of newlines outside of quotes in the block and the quote parity at the end of the block.
+    """
+    reduced = block.translate(None, _OTHER_BYTES).replace(QUOTE + QUOTE, b"")
+    if reduced.find(QUOTE) == -1:
+        return (0 if parity else reduced.count(NEWLINE)), parity
+    segments = reduced.split(QUOTE)
+    return sum(map(bytes.count, segments[parity::2], repeat(NEWLINE))), (parity + len(segments) - 1) & 1
+
+
+class RecordIndex:
+    """
+    Index of the rows of a memory-mapped CSV file with a header.
+    """
+
+    def __init__(self, path: str, block_size: int = INDEX_BLOCK_SIZE):
+        self.path = path
+        self.row_count = 0
+        self.header = b""
+        # byte offsets of the indexed rows and their row numbers
+        self._offsets = array("q")
+        self._rows = array("q")
+        self._mmap: Optional[mmap.mmap] = None
+        self._size = 0
+        self._build(block_size)
+
+    def _build(self, block_size: int):
+        with open(self.path, mode="rb") as in_file:
+            in_file.seek(0, io.SEEK_END)
+            self._size = in_file.tell()
+            if not self._size:
+                return
+            self._mmap = mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header_end = self._next_records(0, 1)
+        self.header = self._mmap[:header_end]
+        parity = 0
+        block_start = header_end
+        while block_start < self._size:
+            self._offsets.append(block_start)
+            self._rows.append(self.row_count)
+            block_end = self._mmap.find(NEWLINE, block_start + block_size)
+            block_end = self._size if block_end == -1 else block_end + 1
+            records, parity = count_records(self._mmap[block_start:block_end], 0)
+            while parity and block_end < self._size:
+                # the block ended inside of a quoted value, extend it to the end of the record
+                newline = self._mmap.find(NEWLINE, block_end)
+                line_end = self._size if newline == -1 else newline + 1
+                parity ^= self._mmap[block_end:line_end].count(QUOTE) & 1
+                if not parity and newline != -1:
+                    records += 1
+                block_end = line_end
+            self.row_count += records
+            block_start = block_end
+
+        if header_end < self._size and (parity or self._mmap[-1:] != NEWLINE):
+            # the last row without the trailing newline
+            self.row_count += 1
+
+    def _next_records(self, offset: int, count: int) -> int:
+        """
+        Returns the offset of the record `count` records after the record starting at the offset.
+        """
+        quotes = 0
+        position = offset
+        while count and position < self._size:
+            newline = self._mmap.find(NEWLINE, position)
+            if newline == -1:
+                return self._size
+            quotes += self._mmap[position:newline].count(QUOTE)
+            position = newline + 1
+            if quotes % 2 == 0:
+                count -= 1
+        return position
+
+    def get_row_offset(self, row: int) -> int:
+        """
+        Returns the byte offset of the data row (0-based), the end of the file for rows after the last one.
+        """
+        if row >= self.row_count:
+            return self._size
+        entry = max(bisect_right(self._rows, row) - 1, 0)
+        return self._next_records(self._offsets[entry], max(row, 0) - self._rows[entry])
+
+    def split(self, parts: int) -> List[Tuple[int, int]]:
+        """
+        Splits the rows into contiguous row ranges of the same size.
+        """
+        return [(self.row_count * part // parts, self.row_count * (part + 1) // parts) for part in range(parts)]
+
+    def open_rows(self, start_row: int = 0, end_row: Optional[int] = None, binary: bool = False):
+        """
+        Opens the row range as a CSV file with the header, reading directly from the row offsets.
+        """
+        start = self.get_row_offset(start_row)
+        end = self.get_row_offset(self.row_count if end_row is None else end_row)
+        if self._mmap is None:
+            raw = io.BytesIO()
+        else:
+            with open(self.path, mode="rb") as in_file:
+                raw = mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ)
+        stream = io.BufferedReader(ShardStream(raw, self.header, start, end))
+        if binary:
+            return stream
+        return io.TextIOWrapper(stream, encoding="utf-8")
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
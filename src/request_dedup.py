@@ -0,0 +1,53 @@
+"""
+Deduplication of identical requests. Each request is identified by the fingerprint of its method, URL, query
+parameters and headers, a request with the fingerprint already sent in the run is skipped.
+
+Only the fingerprints (16 byte digests) of the last sent requests are kept, so the memory is bounded (about 150 bytes
+per entry including the ordered dictionary overhead). A duplicate of a request older than the kept fingerprints is
+sent again.
+
+The fingerprint is recorded before the request is sent, not after it succeeded, so the duplicates of a failed request
+are skipped as well.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+FINGERPRINT_SIZE = 16
+
+
+class RequestDeduplicator:
+    def __init__(self, max_entries: int = 100_000):
+        """
+        Args:
+            max_entries: number of the last fingerprints kept
+        """
+        if max_entries < 1:
+            raise ValueError("The deduplication max_entries must be at least 1.")
+        self.max_entries = max_entries
+        self.skipped = 0
+        self._seen: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_fingerprint(method: str, url: str, params: dict = None, headers: dict = None) -> bytes:
+        request = [method.upper(), url, params or {}, {name.lower(): value for name, value in (headers or {}).items()}]
+        serialized = json.dumps(request, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.blake2b(serialized, digest_size=FINGERPRINT_SIZE).digest()
+
+    def is_duplicate(self, method: str, url: str, params: dict = None, headers: dict = None) -> bool:
+        """
+        Returns True if the same request was already seen, otherwise remembers it.
+        """
+        fingerprint = self.get_fingerprint(method, url, params, headers)
+        with self._lock:
+            if fingerprint in self._seen:
+                self._seen.move_to_end(fingerprint)
+                self.skipped += 1
+                return True
+            self._seen[fingerprint] = None
+            if len(self._seen) > self.max_entries:
+                self._seen.popitem(last=False)
+            return False
@@ -0,0 +1,169 @@
+"""
+Deferred retries. A request failing with a retryable error is not retried inline (sleeping through the backoff while
+all the following requests wait), it is put into a queue and retried by background workers with its own backoff
+schedule, while the following requests keep being sent. The retried requests are therefore sent out of order.
+
+The number of the queued requests is bounded, a new failed request waits until there is space in the queue.
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, List, Optional
+
+from keboola.component import UserException
+
+from http_generic.client import RetryableRequestError
+
+# failed requests listed in the error message
+MAX_REPORTED_ERRORS = 5
+
+
+class _DeferredRequest:
+    def __init__(self, request: dict, error: str):
+        self.request = request
+        self.error = error
+        self.attempts = 0
+
+
+class DeferredRetryQueue:
+    def __init__(
+        self,
+        send: Callable[..., object],
+        max_attempts: int = 5,
+        backoff_factor: float = 1.0,
+        max_backoff: float = 60,
+        workers: int = 2,
+        max_pending: int = 100,
+    ):
+        """
+        Args:
+            send: sends the request, called with the keyword arguments of the deferred request
+            max_attempts: retries of each deferred request before it fails
+            backoff_factor: the n-th retry is sent after backoff_factor * 2 ** (n - 1) seconds
+            max_backoff: maximum seconds between the retries
+            workers: number of threads retrying the requests
+            max_pending: maximum number of the queued requests
+        """
+        self._send = send
+        self.max_attempts = max(max_attempts, 1)
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.max_pending = max(max_pending, 1)
+
+        self.deferred = 0
+        self.succeeded = 0
+        self.failed: List[str] = []
+        self._pending = 0
+        self._schedule = []
+        self._sequence = itertools.count()
+        self._closed = False
+        self._cancelled = False
+        self._condition = threading.Condition()
+        self._workers = [
+            threading.Thread(target=self._retry_requests, name=f"deferred-retry-{index}", daemon=True)
+            for index in range(max(workers, 1))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def defer(self, request: dict, error: Exception):
+        """
+        Queues the failed request, waits while the queue is full.
+        """
+        with self._condition:
+            while self._pending >= self.max_pending:
+                self._condition.wait()
+            self.deferred += 1
+            self._pending += 1
+            self._schedule_retry(_DeferredRequest(request, str(error)))
+
+    def _get_backoff(self, attempt: int) -> float:
+        return min(self.backoff_factor * 2 ** (attempt - 1), self.max_backoff)
+
+    def _schedule_retry(self, item: _DeferredRequest):
+        due = time.monotonic() + self._get_backoff(item.attempts + 1)
+        heapq.heappush(self._schedule, (due, next(self._sequence), item))
+        self._condition.notify_all()
+
+    def _next_due(self) -> Optional[_DeferredRequest]:
+        """
+        Waits until the earliest scheduled retry is due, returns None once the queue is closed and empty.
+        """
+        with self._condition:
+            while True:
+                if self._schedule:
+                    remaining = self._schedule[0][0] - time.monotonic()
+                    if remaining <= 0:
+                        return heapq.heappop(self._schedule)[2]
+                    self._condition.wait(remaining)
+                elif self._closed and not self._pending:
+                    return None
+                else:
+                    self._condition.wait()
+
+    def _retry_requests(self):
+        while True:
+            item = self._next_due()
+            if item is None:
+                return
+            item.attempts += 1
+            try:
+                self._send(**item.request)
+            except RetryableRequestError as e:
+                item.error = str(e)
+                with self._condition:
+                    if item.attempts < self.max_attempts and not self._cancelled:
+                        self._schedule_retry(item)
+                        continue
+                self._finish(item, failed=True)
+            except Exception as e:
+                item.error = str(e)
+                self._finish(item, failed=True)
+            else:
+                self._finish(item, failed=False)
+
+    def _finish(self, item: _DeferredRequest, failed: bool):
+        with self._condition:
+            if failed:
+                self.failed.append(item.error)
+            else:
+                self.succeeded += 1
+            self._pending -= 1
+            self._condition.notify_all()
+
+    def cancel(self):
+        """
+        Drops the scheduled retries and stops the workers once the retries being sent finish.
+        """
+        with self._condition:
+            self._pending -= len(self._schedule)
+            self._schedule.clear()
+            self._cancelled = True
+            self._closed = True
+            self._condition.notify_all()
+
+    def drain(self):
+        """
+        Waits until all the deferred requests are retried and stops the workers.
+        Raises UserException if any of the deferred requests failed.
+        """
+        with self._condition:
+            if self._pending:
+                logging.info(f"Waiting for {self._pending} deferred retries.")
+            self._closed = True
+            self._condition.notify_all()
+        for worker in self._workers:
+            worker.join()
+        if self.deferred:
+            logging.info(
+                f"Deferred retries: {self.deferred} requests deferred, {self.succeeded} succeeded, "
+                f"{len(self.failed)} failed."
+            )
+        if self.failed:
+            raise UserException(
+                f"{len(self.failed)} of {self.deferred} deferred requests failed after {self.max_attempts} retries: "
+                + "; ".join(self.failed[:MAX_REPORTED_ERRORS])
+            )
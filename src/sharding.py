@@ -0,0 +1,174 @@
+"""
+Row-range sharding of the input tables. A table is split into `shard_count` ranges of roughly the same size in bytes
+and each run of the writer sends only the rows of its `shard_index`.
+
+The range boundaries are found by a byte-level scan of the file: a newline ends a record only if it is preceded by
+an even number of quote characters (escaped quotes are doubled in CSV, so quoted newlines are always preceded by an odd
+number of them). Counting the quotes runs on whole blocks of bytes, so no row before the shard is parsed and each shard
+seeks directly to its first record.
+"""
+
+import io
+import logging
+import os
+from typing import List, Tuple
+
+SCAN_BLOCK_SIZE = 4 * 1024 * 1024
+QUOTE = b'"'
+NEWLINE = b"\n"
+
+
+def find_record_boundaries(binary_stream, targets: List[int], block_size: int = SCAN_BLOCK_SIZE) -> List[int]:
+    """
+    Returns the offset of the first record starting at or after each of the ascending byte offsets.
+    An offset past the last record is returned as the size of the file.
+    """
+    boundaries = []
+    binary_stream.seek(0)
+    position = 0
+    quotes = 0
+    block = b""
+    block_start = 0
+
+    for target in targets:
+        if target <= 0:
+            boundaries.append(0)
+            continue
+        # a record starts at the target if the preceding byte is a newline outside of quotes
+        scan_from = target - 1
+        if boundaries and scan_from < boundaries[-1]:
+            boundaries.append(boundaries[-1])
+            continue
+        boundary = None
+        while boundary is None:
+            block_end = block_start + len(block)
+            if position >= block_end:
+                block_start = position
+                block = binary_stream.read(block_size)
+                if not block:
+                    boundary = position
+                    break
+                continue
+            if position < scan_from:
+                # only count the quotes before the target
+                count_end = min(scan_from, block_end)
+                quotes += block.count(QUOTE, position - block_start, count_end - block_start)
+                position = count_end
+                continue
+            newline = block.find(NEWLINE, position - block_start)
+            if newline == -1:
+                quotes += block.count(QUOTE, position - block_start)
+                position = block_end
+                continue
+            quotes += block.count(QUOTE, position - block_start, newline)
+            position = block_start + newline + 1
+            if quotes % 2 == 0:
+                boundary = position
+        boundaries.append(boundary)
+    return boundaries
+
+
+def validate_shard(shard_index: int, shard_count: int):
+    if shard_count < 1:
+        raise ValueError(f"The shard_count must be a positive number, got {shard_count}.")
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(f"The shard_index must be between 0 and {shard_count - 1}, got {shard_index}.")
+
+
+def get_shard_slices(slice_paths: List[str], shard_index: int, shard_count: int) -> List[str]:
+    """
+    Returns the slices of a sliced table sent by the shard, each shard gets a contiguous range of the slices.
+    """
+    validate_shard(shard_index, shard_count)
+    start = len(slice_paths) * shard_index // shard_count
+    end = len(slice_paths) * (shard_index + 1) // shard_count
+    return slice_paths[start:end]
+
+
+def get_shard_range(binary_stream, shard_index: int, shard_count: int) -> Tuple[int, int, int]:
+    """
+    Returns the end of the header and the start and end byte offsets of the shard.
+    """
+    validate_shard(shard_index, shard_count)
+    binary_stream.seek(0, os.SEEK_END)
+    file_size = binary_stream.tell()
+    header_end = find_record_boundaries(binary_stream, [1])[0] if file_size else 0
+    data_size = file_size - header_end
+
+    targets = [header_end + data_size * index // shard_count for index in (shard_index, shard_index + 1)]
+    start, end = find_record_boundaries(binary_stream, targets)
+    if shard_index == 0:
+        start = header_end
+    if shard_index == shard_count - 1:
+        end = file_size
+    return header_end, start, end
+
+
+class ShardStream(io.RawIOBase):
+    """
+    Seekable binary stream of the header followed by the byte range of the shard.
+    """
+
+    def __init__(self, raw, header: bytes, start: int, end: int):
+        super().__init__()
+        self._raw = raw
+        self._header = header
+        self._start = start
+        self._end = end
+        self._size = len(header) + end - start
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._size
+        self._position = max(offset, 0)
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        if self._position >= self._size:
+            return 0
+        header_size = len(self._header)
+        if self._position < header_size:
+            header_end = min(self._position + len(buffer), header_size)
+            data = self._header[self._position:header_end]
+        else:
+            file_position = self._start + self._position - header_size
+            self._raw.seek(file_position)
+            data = self._raw.read(min(len(buffer), self._end - file_position))
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def close(self):
+        self._raw.close()
+        super().close()
+
+
+def open_shard(path: str, shard_index: int, shard_count: int, binary: bool = False):
+    """
+    Opens the shard of the CSV file as a file with the header of the table.
+    """
+    raw = open(path, mode="rb")
+    try:
+        header_end, start, end = get_shard_range(raw, shard_index, shard_count)
+        raw.seek(0)
+        header = raw.read(header_end)
+    except BaseException:
+        raw.close()
+        raise
+    logging.info(f'Sending shard {shard_index + 1}/{shard_count} of "{os.path.basename(path)}", bytes {start}-{end}.')
+    stream = io.BufferedReader(ShardStream(raw, header, start, end))
+    if binary:
+        return stream
+    return io.TextIOWrapper(stream, encoding="utf-8")
@@ -0,0 +1,162 @@
+"""
+Reading of the input tables. Besides a single CSV file, the writer accepts gzip compressed files and sliced tables
+(a folder of CSV slices without a header, possibly compressed) with the header taken from the table manifest.
+
+The slices are read and decompressed by background threads, a few slices ahead of the reader, and streamed one after
+another behind the header, so the table is never merged or decompressed to the disk.
+"""
+
+import csv
+import gzip
+import io
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, List, Optional
+
+GZIP_MAGIC = b"\x1f\x8b"
+READ_BLOCK_SIZE = 1024 * 1024
+SLICE_BUFFER_BLOCKS = 16
+QUEUE_POLL_SECONDS = 0.1
+
+
+class _EndOfSlice:
+    pass
+
+
+END_OF_SLICE = _EndOfSlice()
+
+
+class _SliceFailure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def is_gzip(path: str) -> bool:
+    with open(path, mode="rb") as in_file:
+        return in_file.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+
+
+def list_slices(path: str) -> List[str]:
+    """
+    Returns the slices of the table in the order of their names, a single file is a table with one slice.
+    """
+    if not os.path.isdir(path):
+        return [path]
+    names = sorted(name for name in os.listdir(path) if not name.startswith("."))
+    return [os.path.join(path, name) for name in names if os.path.isfile(os.path.join(path, name))]
+
+
+def build_header(column_names: List[str]) -> bytes:
+    out_stream = io.StringIO()
+    csv.writer(out_stream, lineterminator="\n").writerow(column_names)
+    return out_stream.getvalue().encode("utf-8")
+
+
+def _open_slice(path: str):
+    if is_gzip(path):
+        return gzip.open(path, mode="rb")
+    return open(path, mode="rb")
+
+
+class SlicedTableStream(io.RawIOBase):
+    """
+    Binary stream of the header followed by the content of all slices, a newline is added after a slice not ending
+    with one.
+
+    Each slice is read (and decompressed) by a worker thread into a buffer of at most `SLICE_BUFFER_BLOCKS` blocks,
+    at most `workers` slices are read at the same time. The stream is not seekable.
+    """
+
+    def __init__(self, header: bytes, slice_paths: List[str], workers: int = 2):
+        super().__init__()
+        self._block = memoryview(header)
+        self._slice_paths: Deque[str] = deque(slice_paths)
+        self._stop_event = threading.Event()
+        self._executor = ThreadPoolExecutor(max(workers, 1), thread_name_prefix="slice")
+        self._slice_queues: Deque[queue.Queue] = deque()
+        for _ in range(max(workers, 1)):
+            self._submit_next_slice()
+
+    def readable(self) -> bool:
+        return True
+
+    def _submit_next_slice(self):
+        if not self._slice_paths:
+            return
+        slice_queue = queue.Queue(maxsize=SLICE_BUFFER_BLOCKS)
+        self._slice_queues.append(slice_queue)
+        self._executor.submit(self._read_slice, self._slice_paths.popleft(), slice_queue)
+
+    def _read_slice(self, path: str, slice_queue: queue.Queue):
+        try:
+            last_block = b""
+            with _open_slice(path) as in_file:
+                for block in iter(lambda: in_file.read(READ_BLOCK_SIZE), b""):
+                    if not self._put(slice_queue, block):
+                        return
+                    last_block = block
+            # the last row of the slice must not be joined with the first row of the next one
+            if last_block and not last_block.endswith(b"\n") and not self._put(slice_queue, b"\n"):
+                return
+            self._put(slice_queue, END_OF_SLICE)
+        except Exception as e:
+            # raised by the reader of the stream
+            self._put(slice_queue, _SliceFailure(e))
+
+    def _put(self, slice_queue: queue.Queue, item) -> bool:
+        while not self._stop_event.is_set():
+            try:
+                slice_queue.put(item, timeout=QUEUE_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _next_block(self) -> Optional[bytes]:
+        while self._slice_queues:
+            item = self._slice_queues[0].get()
+            if isinstance(item, _SliceFailure):
+                raise item.error
+            if item is not END_OF_SLICE:
+                return item
+            self._slice_queues.popleft()
+            self._submit_next_slice()
+        return None
+
+    def readinto(self, buffer) -> int:
+        while not self._block:
+            block = self._next_block()
+            if block is None:
+                return 0
+            self._block = memoryview(block)
+        size = min(len(buffer), len(self._block))
+        buffer[:size] = self._block[:size]
+        self._block = self._block[size:]
+        return size
+
+    def close(self):
+        if not self.closed:
+            self._stop_event.set()
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        super().close()
+
+
+def open_table_stream(
+    slice_paths: List[str], header: Optional[bytes] = None, slice_workers: int = 2, binary: bool = False
+):
+    """
+    Opens the table stored as a single CSV file, a gzip compressed file or slices (see `list_slices`).
+    The header is prepended if the files do not contain it.
+    """
+    if not header and len(slice_paths) == 1 and not is_gzip(slice_paths[0]):
+        if binary:
+            return open(slice_paths[0], mode="rb")
+        return open(slice_paths[0], mode="rt", encoding="utf-8")
+
+    stream = io.BufferedReader(SlicedTableStream(header or b"", slice_paths, slice_workers), READ_BLOCK_SIZE)
+    if binary:
+        return stream
+    return io.TextIOWrapper(stream, encoding="utf-8")
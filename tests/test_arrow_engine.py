@@ -0,0 +1,108 @@
+import io
+import json
+import unittest
+
+import arrow_engine
+from json_converter import JsonConverter
+
+CSV_DATA = (
+    "id,zip,price,active,flag,address___city,address___country,note,json\n"
+    '1,007,1.5,true,yes,London,UK,"multi\nline",{"a": 1}\n'
+    "2,12345,2,FALSE,no,Paris,FR,,[1]\n"
+    "3,1234A,,True,,Berlin,DE,text,\n"
+    "99999999999999999999,00,1e5,false,maybe,Prague,CZ,1,{}\n"
+)
+
+
+def _serialize(engine: str, csv_string: str, **kwargs) -> list:
+    converter = JsonConverter(nesting_delimiter="___", engine=engine, **kwargs)
+    payloads = list(converter.convert_file(io.StringIO(csv_string)))
+    # the arrow engine produces serialized payloads
+    return [payload if isinstance(payload, bytes) else json.dumps(payload) for payload in payloads]
+
+
+def _convert(engine: str, csv_string: str, **kwargs) -> list:
+    return [json.loads(payload) for payload in _serialize(engine, csv_string, **kwargs)]
+
+
+def _convert_numbers_as_sent(engine: str, csv_string: str, **kwargs) -> list:
+    # the numbers are kept as serialized, e.g. 100000 and 100000.0 are equal once parsed
+    return [
+        json.loads(payload, parse_int=lambda value: ("int", value), parse_float=lambda value: ("float", value))
+        for payload in _serialize(engine, csv_string, **kwargs)
+    ]
+
+
+@unittest.skipUnless(arrow_engine.is_available(), "pyarrow is not installed")
+class TestArrowEngine(unittest.TestCase):
+    def assert_same_as_python(self, csv_string: str = CSV_DATA, **kwargs):
+        self.assertEqual(
+            _convert_numbers_as_sent("arrow", csv_string, **kwargs),
+            _convert_numbers_as_sent("python", csv_string, **kwargs),
+        )
+        return _convert("python", csv_string, **kwargs)
+
+    def test_inferred_types(self):
+        result = self.assert_same_as_python(chunk_size=10)
+
+        self.assertEqual(result[0][0]["address"], {"city": "London", "country": "UK"})
+
+    def test_datatype_override(self):
+        self.assert_same_as_python(
+            chunk_size=10,
+            column_data_types=[{"price": "number"}, {"flag": "bool"}, {"json": "object"}, {"zip": "string"}],
+        )
+
+    def test_floats_serialized_as_python(self):
+        csv_string = "id,price\n1,1e5\n2,1e-7\n3,1000000000000000.0\n4,-0.0\n5,\n"
+
+        self.assert_same_as_python(csv_string, chunk_size=10, column_data_types=[{"price": "number"}])
+        self.assertIn(b'"price":100000.0', _serialize("arrow", csv_string, chunk_size=10)[0])
+
+    def test_numbers_out_of_range(self):
+        csv_string = "id,price\n1,1e999\n2,1.5\n"
+        result = self.assert_same_as_python(csv_string, chunk_size=10)
+        self.assertEqual(result[0][0]["price"], "1e999")
+
+        for engine in ("python", "arrow"):
+            with self.assertRaisesRegex(ValueError, 'column "price"'):
+                _convert(engine, csv_string, chunk_size=10, column_data_types=[{"price": "number"}])
+
+    def test_sampled_types(self):
+        self.assert_same_as_python(chunk_size=10, inference_sample_size=2)
+
+    def test_chunks_and_renamed_columns(self):
+        result = self.assert_same_as_python(
+            chunk_size=3, column_name_override={"address___city": "town"}, data_wrapper='{"data": [[data]]}'
+        )
+
+        self.assertEqual([len(chunk["data"]) for chunk in result], [3, 1])
+        self.assertEqual(list(result[0]["data"][0]["address"].keys()), ["country", "town"])
+
+    def test_single_row_chunks_from_small_batches(self):
+        converter = JsonConverter(nesting_delimiter="___", engine="arrow", chunk_size=1)
+        batch_converter = arrow_engine.ArrowBatchConverter(converter, block_size=64)
+
+        payloads = list(batch_converter.convert_stream(io.StringIO(CSV_DATA)))
+
+        self.assertEqual([json.loads(payload) for payload in payloads], _convert("python", CSV_DATA, chunk_size=1))
+        self.assertEqual(converter.rows_converted, 4)
+
+    def test_escaped_strings(self):
+        csv_string = 'quoted,control,unicode\n"a ""quoted"" \\ value","tab\tand\nnewline",žluťoučký\n'
+
+        self.assert_same_as_python(csv_string, chunk_size=5)
+
+    def test_empty_file(self):
+        self.assertEqual(_convert("arrow", "", chunk_size=2), [])
+        self.assertEqual(_convert("arrow", "id\n", chunk_size=2), [])
+
+
+class TestEngineConfiguration(unittest.TestCase):
+    def test_unsupported_engine_fails(self):
+        with self.assertRaises(ValueError):
+            JsonConverter(engine="numpy")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,14 @@
+import time
 import unittest
 from pathlib import Path
 
-from http_generic.auth import AuthMethodBuilder, AuthBuilderError, BasicHttp, OAuth20ClientCredentials
+import responses
+from keboola.component import UserException
+
+from http_generic.auth import AuthMethodBuilder, AuthBuilderError, BasicHttp, OAuth20ClientCredentials, Login
+from http_generic.client import GenericHttpClient
 from configuration import WriterConfiguration, ApiConfig, Authentication, ApiRequest, RequestContent
+from table_reader import open_table_stream
 
 
 class TestConfiguration(unittest.TestCase):
@@ -82,3 +88,122 @@ class TestConfiguration(unittest.TestCase):
         )
         auth.login()
         self.assertEqual(auth.api_request_headers, {"X-ApiToken": "mkoijn098uhbygv"})
+
+
+class TestTokenRefresh(unittest.TestCase):
+    login_url = "http://test.com/login"
+
+    def _add_login_responses(self, *tokens, expires_in=3600):
+        for token in tokens:
+            responses.add(
+                responses.POST, self.login_url, json={"access_token": token, "expires_in": expires_in}, status=200
+            )
+
+    def _build_login(self):
+        return Login(
+            login_endpoint=self.login_url,
+            method="POST",
+            api_request_headers={"Authorization": {"response": "access_token"}},
+        )
+
+    @responses.activate
+    def test_login_tracks_expiration(self):
+        self._add_login_responses("token1")
+        auth = self._build_login()
+        auth.login()
+
+        self.assertEqual(auth.api_request_headers, {"Authorization": "token1"})
+        self.assertAlmostEqual(auth.token_expires_at, time.monotonic() + 3600, delta=5)
+        self.assertEqual(auth.token_version, 1)
+
+    @responses.activate
+    def test_token_refreshed_before_expiration(self):
+        self._add_login_responses("token1", "token2")
+        responses.add(responses.GET, "http://test.com/api/orders", status=200)
+        auth = self._build_login()
+        client = GenericHttpClient("http://test.com/api/", auth_method=auth, max_retries=0)
+        client.login()
+        # pretend the token expires in a second
+        auth.token_expires_at = time.monotonic() + 1
+
+        client.send_request("GET", "orders")
+
+        self.assertEqual(responses.calls[-1].request.headers["Authorization"], "token2")
+        self.assertEqual(auth.token_version, 2)
+
+    @responses.activate
+    def test_request_replayed_after_401(self):
+        self._add_login_responses("token1", "token2")
+        responses.add(responses.GET, "http://test.com/api/orders", status=401)
+        responses.add(responses.GET, "http://test.com/api/orders", status=200)
+        auth = self._build_login()
+        client = GenericHttpClient("http://test.com/api/", auth_method=auth, max_retries=0)
+        client.login()
+
+        client.send_request("GET", "orders")
+
+        self.assertEqual(len(responses.calls), 4)
+        self.assertEqual(responses.calls[-1].request.headers["Authorization"], "token2")
+
+    @responses.activate
+    def test_streamed_body_not_replayed_after_401(self):
+        self._add_login_responses("token1", "token2")
+        responses.add(responses.POST, "http://test.com/api/orders", status=401)
+        auth = self._build_login()
+        client = GenericHttpClient("http://test.com/api/", auth_method=auth, max_retries=0)
+        client.login()
+
+        with open_table_stream([], b"id\n1\n", binary=True) as body:
+            with self.assertRaisesRegex(UserException, "cannot be replayed"):
+                client.send_request("POST", "orders", data=body)
+
+        self.assertEqual(auth.token_version, 2)
+
+    @responses.activate
+    def test_stale_refresh_does_not_login_again(self):
+        self._add_login_responses("token1", "token2")
+        auth = self._build_login()
+        auth.login()
+        auth.refresh(token_version=1)
+        # the request was sent with the first token, but the token was already refreshed
+        auth.refresh(token_version=1)
+
+        self.assertEqual(auth.token_version, 2)
+        self.assertEqual(len(responses.calls), 2)
+
+    @responses.activate
+    def test_token_state_reused(self):
+        self._add_login_responses("token1")
+        auth = self._build_login()
+        auth.login()
+        token_state = auth.get_token_state()
+
+        new_auth = self._build_login()
+        client = GenericHttpClient("http://test.com/api/", auth_method=new_auth, max_retries=0)
+        client.login(token_state)
+
+        self.assertEqual(len(responses.calls), 1)
+        self.assertEqual(new_auth.api_request_headers, {"Authorization": "token1"})
+        self.assertAlmostEqual(new_auth.token_expires_at, time.monotonic() + 3600, delta=5)
+
+    @responses.activate
+    def test_token_state_not_reused_when_expired_or_changed(self):
+        self._add_login_responses("token1")
+        auth = self._build_login()
+        auth.login()
+        token_state = auth.get_token_state()
+
+        changed_auth = self._build_login()
+        changed_auth.login_endpoint = "http://test.com/other-login"
+        self.assertIsNone(changed_auth.restore_token_state(token_state))
+
+        expired_state = {**token_state, "expires_at": time.time() + 10}
+        self.assertIsNone(self._build_login().restore_token_state(expired_state))
+
+    @responses.activate
+    def test_token_without_expiration_not_persisted(self):
+        responses.add(responses.POST, self.login_url, json={"access_token": "token1"}, status=200)
+        auth = self._build_login()
+        auth.login()
+
+        self.assertIsNone(auth.get_token_state())
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import responses
+from keboola.component import UserException
+
+from http_generic.cassette import Cassette, CassetteError
+from http_generic.client import GenericHttpClient
+
+
+class TestCassette(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cassette_path = os.path.join(tempfile.mkdtemp(), "cassette.json")
+
+    @responses.activate
+    def _record(self):
+        responses.add(responses.POST, "http://test.com/api/orders", json={"status": "ok"}, status=201)
+        responses.add(responses.DELETE, "http://test.com/api/orders/1", body="gone", status=200)
+
+        cassette = Cassette(Cassette.RECORD, self.cassette_path)
+        client = GenericHttpClient("http://test.com/api/", cassette=cassette, max_retries=0)
+        client.send_request("POST", "orders", json=[{"id": 1}], params={"token": "secret"})
+        client.send_request("DELETE", "orders/1")
+        client.close()
+        return cassette
+
+    def test_record_interactions(self):
+        cassette = self._record()
+
+        self.assertEqual(len(cassette.interactions), 2)
+        self.assertEqual(cassette.interactions[0]["url"], "http://test.com/api/orders")
+        self.assertEqual(cassette.interactions[0]["status"], 201)
+        self.assertEqual(cassette.interactions[1]["body"], {"text": "gone"})
+        self.assertTrue(os.path.isfile(self.cassette_path))
+
+    def test_replay_without_network(self):
+        self._record()
+        cassette = Cassette(Cassette.REPLAY, self.cassette_path, latency_scale=0)
+        client = GenericHttpClient("http://test.com/api/", cassette=cassette, max_retries=0)
+
+        response = client._request_raw("POST", "orders", json=[{"id": 2}])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {"status": "ok"})
+        # interactions are cycled when the cassette is exhausted
+        self.assertEqual(client._request_raw("DELETE", "orders/1").text, "gone")
+        self.assertEqual(client._request_raw("DELETE", "orders/1").text, "gone")
+
+    def test_replay_unknown_request_fails(self):
+        self._record()
+        cassette = Cassette(Cassette.REPLAY, self.cassette_path, latency_scale=0)
+        client = GenericHttpClient("http://test.com/api/", cassette=cassette, max_retries=0)
+
+        with self.assertRaises(UserException):
+            client.send_request("GET", "customers")
+
+    def test_invalid_mode_fails(self):
+        with self.assertRaises(CassetteError):
+            Cassette("play", self.cassette_path)
+
+    def test_invalid_latency_scale_fails(self):
+        for latency_scale in ("fast", "-1"):
+            environment = {"HTTP_CASSETTE_MODE": "record", "HTTP_CASSETTE_LATENCY_SCALE": latency_scale}
+            with patch.dict(os.environ, environment):
+                with self.assertRaisesRegex(CassetteError, "HTTP_CASSETTE_LATENCY_SCALE"):
+                    Cassette.from_environment(tempfile.mkdtemp())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,192 @@
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from keboola.component import UserException
+
+from http_generic.circuit_breaker import (
+    STATE_CLOSED,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    CircuitBreaker,
+    CircuitBreakerError,
+)
+from http_generic.client import GenericHttpClient
+from http_generic.hedging import HedgingPolicy
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(consecutive_failures=3, open_seconds=10)
+        breaker.record_failure("HTTP 503")
+        breaker.record_failure("HTTP 503")
+        breaker.record_success()
+        breaker.record_failure("HTTP 503")
+        breaker.record_failure("HTTP 503")
+        self.assertEqual(breaker.state, STATE_CLOSED)
+
+        breaker.record_failure("HTTP 503")
+
+        self.assertEqual(breaker.state, STATE_OPEN)
+
+    def test_opens_on_error_rate(self):
+        breaker = CircuitBreaker(consecutive_failures=0, error_rate=0.6, window_size=4, open_seconds=10)
+        for _ in range(3):
+            breaker.record_failure("HTTP 503")
+            breaker.record_success()
+        self.assertEqual(breaker.state, STATE_CLOSED)
+
+        breaker.record_failure("HTTP 503")
+        breaker.record_failure("HTTP 503")
+
+        self.assertEqual(breaker.state, STATE_OPEN)
+
+    def test_probe_success_resumes_requests(self):
+        breaker = CircuitBreaker(consecutive_failures=1, open_seconds=0.05)
+        breaker.record_failure("HTTP 503")
+        waiting_finished = threading.Event()
+
+        breaker.before_request()
+        self.assertEqual(breaker.state, STATE_HALF_OPEN)
+        # the other requests wait for the result of the probe
+        waiting = threading.Thread(target=lambda: (breaker.before_request(), waiting_finished.set()))
+        waiting.start()
+        time.sleep(0.05)
+        self.assertFalse(waiting_finished.is_set())
+
+        breaker.record_success()
+        waiting.join(1)
+
+        self.assertTrue(waiting_finished.is_set())
+        self.assertEqual(breaker.state, STATE_CLOSED)
+
+    def test_failed_probes_abort_requests(self):
+        breaker = CircuitBreaker(consecutive_failures=1, open_seconds=0, max_probes=2)
+        breaker.record_failure("HTTP 503")
+        breaker.before_request()
+        breaker.record_failure("HTTP 502")
+        self.assertEqual(breaker.state, STATE_OPEN)
+        breaker.before_request()
+
+        with self.assertRaisesRegex(CircuitBreakerError, "3 of 3 attempts failed.*Last error: HTTP 504"):
+            breaker.record_failure("HTTP 504")
+        with self.assertRaises(CircuitBreakerError):
+            breaker.before_request()
+
+    def test_probe_without_result_replaced(self):
+        breaker = CircuitBreaker(consecutive_failures=1, open_seconds=0, probe_timeout=0.05)
+        breaker.record_failure("HTTP 503")
+        breaker.before_request()
+        states = []
+
+        # the probe never records a result, another request is sent as the probe after the timeout
+        def replace_probe():
+            breaker.before_request()
+            states.append(breaker.state)
+            breaker.release_probe()
+            states.append(breaker.state)
+
+        waiting = threading.Thread(target=replace_probe)
+        waiting.start()
+        waiting.join(1)
+        self.assertEqual(states, [STATE_HALF_OPEN, STATE_OPEN])
+
+        # the released probe is replaced right away
+        breaker.probe_timeout = 10
+        start = time.perf_counter()
+        breaker.before_request()
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertEqual(breaker.state, STATE_HALF_OPEN)
+
+
+class _StatusHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.requests += 1
+        self.send_response(self.server.statuses.pop(0) if len(self.server.statuses) > 1 else self.server.statuses[0])
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestClientCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _StatusHandler)
+        self.server.requests = 0
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, args=(0.01,), daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def _get_client(self, statuses: list, breaker: CircuitBreaker, max_retries: int) -> GenericHttpClient:
+        self.server.statuses = statuses
+        client = GenericHttpClient(
+            f"http://127.0.0.1:{self.server.server_address[1]}/api/",
+            max_retries=max_retries,
+            backoff_factor=0,
+            status_forcelist=(503,),
+            circuit_breaker=breaker,
+        )
+        self.addCleanup(client.close)
+        return client
+
+    def test_run_aborted_when_endpoint_keeps_failing(self):
+        client = self._get_client([503], CircuitBreaker(consecutive_failures=3, open_seconds=0), max_retries=5)
+
+        with self.assertRaisesRegex(UserException, "was not sent. The requests were stopped by the circuit breaker"):
+            client.send_request("POST", "orders", data="1")
+
+        # 3 failures opening the breaker and the failed probe
+        self.assertEqual(self.server.requests, 4)
+
+    def test_successful_probe_closes_breaker(self):
+        breaker = CircuitBreaker(consecutive_failures=1, open_seconds=0)
+        client = self._get_client([503, 200], breaker, max_retries=2)
+
+        client.send_request("POST", "orders", data="1")
+
+        self.assertEqual((breaker.state, breaker.opened, breaker.failures, breaker.attempts), (STATE_CLOSED, 1, 1, 2))
+
+    def test_probe_released_on_error_without_response(self):
+        breaker = CircuitBreaker(consecutive_failures=1, open_seconds=0)
+        client = self._get_client([200], breaker, max_retries=0)
+        breaker.record_failure("HTTP 503")
+
+        with patch.object(client.session, "send", side_effect=RuntimeError("not sent")):
+            with self.assertRaises(RuntimeError):
+                client.send_request("POST", "orders", data="1")
+        self.assertEqual(breaker.state, STATE_OPEN)
+
+        client.send_request("POST", "orders", data="1")
+        self.assertEqual(breaker.state, STATE_CLOSED)
+
+
+    def test_probe_sent_by_hedged_request(self):
+        breaker = CircuitBreaker(consecutive_failures=2, open_seconds=0)
+        client = self._get_client([503], breaker, max_retries=1)
+        client._hedging = HedgingPolicy(delay=5, allow_non_idempotent=True)
+        errors = []
+
+        def send_requests():
+            for _ in range(2):
+                try:
+                    client.send_request("POST", "orders", data="1")
+                except UserException as e:
+                    errors.append(str(e))
+
+        sending = threading.Thread(target=send_requests, daemon=True)
+        sending.start()
+        sending.join(5)
+
+        self.assertFalse(sending.is_alive())
+        self.assertIn("too many retries", errors[0])
+        self.assertIn("stopped by the circuit breaker", errors[1])
+
+if __name__ == "__main__":
+    unittest.main()
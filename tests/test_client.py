@@ -0,0 +1,146 @@
+import json
+import threading
+import time
+import unittest
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import requests
+import responses
+
+from http_generic.auth import ApiKey
+from http_generic.client import GenericHttpClient
+
+
+class TestRequestTemplates(unittest.TestCase):
+    def setUp(self) -> None:
+        self.client = GenericHttpClient("http://test.com/api/", max_retries=0)
+
+    @responses.activate
+    def test_template_reused_with_new_body(self):
+        responses.add(responses.POST, "http://test.com/api/orders", status=200)
+
+        self.client._request_raw("POST", "orders", headers={"X-Test": "1"}, params={"a": "b"}, json=[{"id": 1}])
+        self.client._request_raw("POST", "orders", headers={"X-Test": "1"}, params={"a": "b"}, json=[{"id": 2}])
+
+        self.assertEqual(len(self.client._request_templates), 1)
+        self.assertEqual(json.loads(responses.calls[0].request.body), [{"id": 1}])
+        self.assertEqual(json.loads(responses.calls[1].request.body), [{"id": 2}])
+        self.assertEqual(responses.calls[1].request.headers["X-Test"], "1")
+        self.assertEqual(responses.calls[1].request.headers["Content-Type"], "application/json")
+        self.assertEqual(responses.calls[1].request.url, "http://test.com/api/orders?a=b")
+
+    @responses.activate
+    def test_different_parameters_build_new_template(self):
+        responses.add(responses.DELETE, "http://test.com/api/orders", status=200)
+
+        self.client._request_raw("DELETE", "orders", params={"id": "1"})
+        self.client._request_raw("DELETE", "orders", params={"id": "2"})
+
+        self.assertEqual(len(self.client._request_templates), 2)
+        self.assertEqual(responses.calls[1].request.url, "http://test.com/api/orders?id=2")
+        self.assertIsNone(responses.calls[1].request.body)
+
+    @responses.activate
+    def test_template_cache_bounded(self):
+        client = GenericHttpClient("http://test.com/api/", max_retries=0, request_template_cache_size=2)
+        responses.add(responses.GET, "http://test.com/api/orders", status=200)
+        for i in range(5):
+            client._request_raw("GET", "orders", params={"id": str(i)})
+
+        self.assertEqual(len(client._request_templates), 2)
+
+    @responses.activate
+    def test_auth_applied_once_per_template(self):
+        responses.add(responses.GET, "http://test.com/api/orders", status=200)
+        auth = ApiKey(key="token", _ApiKey__token="secret", position="query")
+        self.client._auth = auth
+
+        with patch.object(ApiKey, "__call__", autospec=True, side_effect=lambda s, r: r) as auth_call:
+            self.client._request_raw("GET", "orders")
+            self.client._request_raw("GET", "orders")
+        self.assertEqual(auth_call.call_count, 1)
+
+    @responses.activate
+    def test_environment_resolved_once_per_host(self):
+        responses.add(responses.GET, "http://test.com/api/orders", status=200)
+        responses.add(responses.GET, "http://other.com/orders", status=200)
+
+        with patch.object(
+            requests.Session,
+            "merge_environment_settings",
+            autospec=True,
+            wraps=requests.Session.merge_environment_settings,
+        ) as merge_settings:
+            for i in range(3):
+                self.client._request_raw("GET", "orders", params={"id": str(i)}, verify=False)
+            self.client._request_raw("GET", "http://other.com/orders", is_absolute_path=True)
+        self.assertEqual(merge_settings.call_count, 2)
+
+    @responses.activate
+    def test_binary_stream_body(self):
+        responses.add(responses.POST, "http://test.com/api/upload", status=200)
+        with open(__file__, "rb") as inp:
+            self.client._request_raw("POST", "upload", data=inp)
+
+        self.assertNotIn("Transfer-Encoding", responses.calls[0].request.headers)
+        self.assertTrue(int(responses.calls[0].request.headers["Content-Length"]) > 0)
+
+
+class TestRequestHosts(unittest.TestCase):
+    @responses.activate
+    def test_base_url_per_request(self):
+        client = GenericHttpClient("http://test.com/api/", max_retries=0)
+        responses.add(responses.GET, "http://tenant.test.com/v2/orders", status=200)
+
+        client.send_request("GET", "orders", base_url="http://tenant.test.com/v2")
+
+        self.assertEqual(responses.calls[0].request.url, "http://tenant.test.com/v2/orders")
+        self.assertEqual(client.base_url, "http://test.com/api/")
+
+    def test_requests_limited_per_host(self):
+        client = GenericHttpClient("http://test.com/api/", max_retries=0, max_requests_per_host=2)
+        running = Counter()
+        max_running = Counter()
+        max_total = 0
+        lock = threading.Lock()
+
+        def send(request, **kwargs):
+            nonlocal max_total
+            host = request.url.split("/")[2]
+            with lock:
+                running[host] += 1
+                max_running[host] = max(max_running[host], running[host])
+                max_total = max(max_total, sum(running.values()))
+            time.sleep(0.02)
+            with lock:
+                running[host] -= 1
+            response = requests.Response()
+            response.status_code = 200
+            return response
+
+        with patch.object(client.session, "send", side_effect=send):
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                hosts = ["http://slow.test.com", "http://fast.test.com"] * 8
+                list(executor.map(lambda host: client.send_request("GET", "orders", base_url=host), hosts))
+
+        self.assertEqual(max_running, {"slow.test.com": 2, "fast.test.com": 2})
+        # the requests of the other host are sent meanwhile
+        self.assertGreater(max_total, 2)
+
+    @responses.activate
+    def test_response_cookies_not_kept(self):
+        client = GenericHttpClient("http://test.com/api/", max_retries=0)
+        responses.add(responses.GET, "http://test.com/api/login", status=200, headers={"Set-Cookie": "sid=abc; Path=/"})
+        responses.add(responses.GET, "http://test.com/api/orders", status=200)
+
+        client.send_request("GET", "login")
+        client.send_request("GET", "orders")
+
+        self.assertEqual(len(client.session.cookies), 0)
+        self.assertNotIn("Cookie", responses.calls[1].request.headers)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -9,6 +9,7 @@ import unittest
 
 import mock
 from freezegun import freeze_time
+from keboola.component.dao import TableDefinition
 
 from component import Component
 from user_functions import UserFunctions
@@ -25,6 +26,28 @@ class TestComponent(unittest.TestCase):
             comp.run()
 
 
+class TestStorageColumnTypes(unittest.TestCase):
+    def test_types_from_manifest(self):
+        manifest = {
+            "id": "in.c-test.orders",
+            "columns": ["id", "price", "active", "created", "note"],
+            "column_metadata": {
+                "id": [{"key": "KBC.datatype.basetype", "value": "INTEGER"}],
+                "price": [{"key": "KBC.datatype.basetype", "value": "NUMERIC"}],
+                "active": [{"key": "KBC.datatype.basetype", "value": "BOOLEAN"}],
+                "created": [{"key": "KBC.datatype.basetype", "value": "DATE"}],
+            },
+        }
+        in_table = TableDefinition(
+            "orders.csv", schema=TableDefinition.return_schema_from_manifest(manifest), stage="in"
+        )
+
+        self.assertEqual(
+            Component._get_storage_column_types(in_table),
+            {"id": "number", "price": "number", "active": "bool", "created": "string"},
+        )
+
+
 class TestUserFunctions(unittest.TestCase):
     def setUp(self) -> None:
         self.uf = UserFunctions()
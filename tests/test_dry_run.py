@@ -0,0 +1,52 @@
+import io
+import unittest
+
+from dry_run import DryRunReport
+
+
+class TestDryRunReport(unittest.TestCase):
+    def test_request_stats_per_endpoint(self):
+        report = DryRunReport()
+        report.add_request("post", "http://test.com/orders?date=1", json=[{"id": 1}])
+        report.add_request("POST", "http://test.com/orders", json=[{"id": 1}, {"id": 2}])
+        report.add_request("DELETE", "http://test.com/orders/1")
+
+        result = report.to_dict()
+        self.assertEqual(result["request_count"], 3)
+        orders = result["endpoints"]["POST http://test.com/orders"]
+        self.assertEqual(orders["request_count"], 2)
+        self.assertEqual(orders["body_bytes_min"], len('[{"id": 1}]'))
+        self.assertEqual(orders["body_bytes_max"], len('[{"id": 1}, {"id": 2}]'))
+        self.assertEqual(result["endpoints"]["DELETE http://test.com/orders/1"]["body_bytes_max"], 0)
+
+    def test_samples_do_not_contain_secret_values(self):
+        report = DryRunReport(sample_requests=1)
+        report.add_request(
+            "POST", "http://test.com/orders", headers={"Authorization": "secret"}, params={"token": "secret"}, data="a"
+        )
+        report.add_request("POST", "http://test.com/orders", data="b")
+
+        samples = report.to_dict()["sample_requests"]
+        self.assertEqual(len(samples), 1)
+        self.assertEqual(samples[0]["headers"], ["Authorization"])
+        self.assertEqual(samples[0]["query_parameters"], ["token"])
+        self.assertNotIn("secret", str(samples))
+
+    def test_binary_stream_size_keeps_position(self):
+        report = DryRunReport()
+        stream = io.BytesIO(b"0123456789")
+        report.add_request("POST", "http://test.com/upload", data=stream)
+
+        self.assertEqual(report.to_dict()["endpoints"]["POST http://test.com/upload"]["body_bytes_max"], 10)
+        self.assertEqual(stream.tell(), 0)
+
+    def test_conversion_throughput(self):
+        report = DryRunReport()
+        report.add_conversion(100, 0.5)
+        report.add_conversion(100, 0.5)
+
+        self.assertEqual(report.to_dict()["conversion"], {"rows": 200, "seconds": 1.0, "rows_per_second": 200.0})
+
+
+if __name__ == "__main__":
+    unittest.main()
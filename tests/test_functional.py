@@ -1,6 +1,13 @@
+import json
 import os
 import re
+import shutil
+import tempfile
+import threading
+import time
 import unittest
+from email.parser import BytesParser
+from email.policy import HTTP
 from pathlib import Path
 from unittest.mock import patch
 
@@ -25,6 +32,18 @@ class TestComponent(unittest.TestCase):
         os.environ["KBC_DATADIR"] = test_dir
         return Component()
 
+    @staticmethod
+    def _patch_configuration(comp: Component, **parameters):
+        # the configuration is loaded again on each access, the changed one is kept while patched
+        configuration = comp.configuration
+        for key, value in parameters.items():
+            configuration.parameters[key].update(value)
+        return patch.object(Component, "configuration", new=property(lambda _: configuration))
+
+    def _init_component(self, comp: Component, **parameters):
+        with self._patch_configuration(comp, **parameters):
+            comp.init_component()
+
     @responses.activate
     def test_binary_payload_iterations(self):
         test_name = "binary_iterations"
@@ -111,6 +130,336 @@ class TestComponent(unittest.TestCase):
         except UserException as e:
             self.assertIn(response_text, str(e))
 
+    @responses.activate
+    def test_dry_run_sends_nothing(self):
+        test_name = "dry_run"
+        comp = self._get_test_component(test_name)
+        comp.run()
+
+        self.assertEqual(len(responses.calls), 0)
+        with open(os.path.join(comp.files_out_path, "dry_run_report.json")) as inp:
+            report = json.load(inp)
+        shutil.rmtree(os.path.join(self.tests_dir, test_name, "out"))
+
+        self.assertEqual(report["request_count"], 2)
+        self.assertEqual(report["endpoints"]["POST http://functional/test/123"]["request_count"], 1)
+        self.assertEqual(len(report["sample_requests"]), 1)
+        self.assertEqual(report["sample_requests"][0]["query_parameters"], ["date"])
+
+    @responses.activate
+    def test_multiple_tables_with_endpoint_override(self):
+        test_name = "multiple_tables"
+        comp = self._get_test_component(test_name)
+
+        orders = responses.add(
+            responses.POST,
+            url="http://functional/test",
+            match=[responses.matchers.json_params_matcher([{"id": 1, "amount": 10}, {"id": 2, "amount": 20}])],
+        )
+        customers = responses.add(
+            responses.POST,
+            url="http://functional/customers",
+            match=[responses.matchers.json_params_matcher([{"id": 1, "name": "Alice"}])],
+        )
+        comp.run()
+
+        self.assertEqual(orders.call_count, 1)
+        self.assertEqual(customers.call_count, 1)
+
+    @responses.activate
+    def test_sliced_compressed_table(self):
+        test_name = "sliced_table"
+        comp = self._get_test_component(test_name)
+
+        orders = responses.add(
+            responses.POST,
+            url="http://functional/test",
+            match=[
+                responses.matchers.json_params_matcher(
+                    [{"id": 1, "note": "first\nline"}, {"id": 2, "note": "second"}, {"id": 3, "note": "third"}]
+                )
+            ],
+        )
+        comp.run()
+
+        self.assertEqual(orders.call_count, 1)
+
+    @responses.activate
+    def test_resume_from_checkpoint(self):
+        test_name = "resume_checkpoint"
+        comp = self._get_test_component(test_name)
+        os.makedirs(os.path.join(self.tests_dir, test_name, "out"), exist_ok=True)
+
+        resumed = responses.add(
+            responses.POST,
+            url="http://functional/test",
+            match=[responses.matchers.json_params_matcher([{"id": 3, "amount": 30}, {"id": 4, "amount": 40}])],
+        )
+        failed = responses.add(
+            responses.POST,
+            url="http://functional/test",
+            status=400,
+            match=[responses.matchers.json_params_matcher([{"id": 5, "amount": 50}])],
+        )
+        with self.assertRaises(UserException):
+            comp.run()
+
+        with open(os.path.join(self.tests_dir, test_name, "out", "state.json")) as inp:
+            state = json.load(inp)
+        shutil.rmtree(os.path.join(self.tests_dir, test_name, "out"))
+
+        self.assertEqual((resumed.call_count, failed.call_count), (1, 1))
+        self.assertEqual(
+            state["row_checkpoints"],
+            {"orders.csv": {"row": 4, "table": {"id": None, "last_import_date": None, "size": 35, "rows": 5}}},
+        )
+
+    @responses.activate
+    def test_checkpoint_of_changed_table_ignored(self):
+        data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, data_dir)
+        shutil.copytree(os.path.join(self.tests_dir, "resume_checkpoint"), data_dir, dirs_exist_ok=True)
+        os.makedirs(os.path.join(data_dir, "out"))
+        # the table of the failed run was replaced by a new load under the same name
+        with open(os.path.join(data_dir, "in", "tables", "orders.csv"), mode="w") as out_file:
+            out_file.write("id,amount\n6,60\n7,70\n8,80\n")
+        os.environ["KBC_DATADIR"] = data_dir
+
+        all_rows = responses.add(
+            responses.POST,
+            url="http://functional/test",
+            match=[responses.matchers.json_params_matcher([{"id": 6, "amount": 60}, {"id": 7, "amount": 70}])],
+        )
+        responses.add(
+            responses.POST,
+            url="http://functional/test",
+            match=[responses.matchers.json_params_matcher([{"id": 8, "amount": 80}])],
+        )
+        Component().run()
+
+        with open(os.path.join(data_dir, "out", "state.json")) as inp:
+            state = json.load(inp)
+        self.assertEqual(all_rows.call_count, 1)
+        self.assertEqual(state["row_checkpoints"], {})
+
+    @responses.activate
+    def test_resume_without_chunk_size(self):
+        test_name = "resume_checkpoint"
+        out_dir = os.path.join(self.tests_dir, test_name, "out")
+        update_checkpoint = Component._update_checkpoint
+        sent_rows = []
+
+        def record_sent_rows(component, result, completed):
+            sent_rows.append(result.start_row + result.rows_sent)
+            update_checkpoint(component, result, completed)
+
+        for chunk_size in (None, 0):
+            comp = self._get_test_component(test_name)
+            os.makedirs(out_dir, exist_ok=True)
+            self.addCleanup(shutil.rmtree, out_dir, ignore_errors=True)
+            json_mapping = {
+                "nesting_delimiter": "__",
+                "chunk_size": chunk_size,
+                "column_data_types": {"autodetect": True},
+            }
+            resumed = responses.add(
+                responses.POST,
+                url="http://functional/test",
+                match=[
+                    responses.matchers.json_params_matcher(
+                        [{"id": 3, "amount": 30}, {"id": 4, "amount": 40}, {"id": 5, "amount": 50}]
+                    )
+                ],
+            )
+
+            with self._patch_configuration(comp, request_content={"json_mapping": json_mapping}):
+                with patch.object(Component, "_update_checkpoint", record_sent_rows):
+                    comp.run()
+
+            with open(os.path.join(out_dir, "state.json")) as inp:
+                state = json.load(inp)
+            self.assertEqual(resumed.call_count, 1)
+            self.assertEqual(state["row_checkpoints"], {})
+            self.assertEqual(sent_rows.pop(), 5)
+            responses.reset()
+
+    @responses.activate
+    def test_ndjson_bulk_requests(self):
+        test_name = "ndjson"
+        comp = self._get_test_component(test_name)
+
+        bodies = []
+
+        def callback(request):
+            bodies.append(b"".join(request.body).decode("utf-8"))
+            return 200, {}, ""
+
+        responses.add_callback(responses.POST, url="http://functional/_bulk", callback=callback)
+        comp.run()
+
+        self.assertEqual(responses.calls[0].request.headers["Content-Type"], "application/x-ndjson")
+        self.assertEqual(
+            bodies,
+            [
+                '{"index": {"_id": "1"}}\n{"id": 1, "address": {"city": "Prague"}}\n'
+                '{"index": {"_id": "2"}}\n{"id": 2, "address": {"city": "Brno"}}\n',
+                '{"index": {"_id": "3"}}\n{"id": 3, "address": {"city": "Ostrava\\nCentre"}}\n',
+            ],
+        )
+
+    @responses.activate
+    def test_multipart_upload_per_iteration_group(self):
+        test_name = "multipart"
+        comp = self._get_test_component(test_name)
+
+        uploads = {}
+
+        def callback(request):
+            message = BytesParser(policy=HTTP).parsebytes(
+                f"Content-Type: {request.headers['Content-Type']}\r\n\r\n".encode("utf-8") + b"".join(request.body)
+            )
+            uploads[request.url] = {
+                part.get_param("name", header="content-disposition"): (part.get_filename(), part.get_content())
+                for part in message.iter_parts()
+            }
+            return 200, {}, ""
+
+        responses.add_callback(responses.POST, url=re.compile("http://functional/upload/.*"), callback=callback)
+        comp.run()
+
+        self.assertEqual(
+            uploads,
+            {
+                "http://functional/upload/a": {
+                    "source": (None, "keboola"),
+                    "account": (None, "a"),
+                    "data": ("a.csv", "id,amount\n1,10\n2,20\n"),
+                },
+                "http://functional/upload/b": {
+                    "source": (None, "keboola"),
+                    "account": (None, "b"),
+                    "data": ("b.csv", "id,amount\n3,30\n"),
+                },
+            },
+        )
+
+    @responses.activate
+    def test_base_url_resolved_per_iteration(self):
+        test_name = "iteration_base_url"
+        comp = self._get_test_component(test_name)
+
+        responses.add(responses.DELETE, url=re.compile(r"http://\w+\.functional/orders/\d+"))
+        comp.run()
+
+        self.assertEqual(
+            [call.request.url for call in responses.calls],
+            [
+                "http://alpha.functional/orders/1",
+                "http://beta.functional/orders/2",
+                "http://alpha.functional/orders/3",
+            ],
+        )
+        self.assertEqual(comp._client.base_url, "http://[[tenant]].functional/api/")
+
+    @responses.activate
+    def test_deferred_retry(self):
+        test_name = "deferred_retry"
+        comp = self._get_test_component(test_name)
+        failures = {"123": 1}
+
+        def respond(request):
+            row_id = json.loads(request.body)["id"]
+            if failures.get(row_id):
+                failures[row_id] -= 1
+                return 503, {}, ""
+            return 200, {}, ""
+
+        responses.add_callback(responses.POST, url="https://functional/test", callback=respond)
+        comp.run()
+
+        # the failed request is retried later, the following requests are not blocked
+        self.assertEqual(
+            [json.loads(call.request.body)["id"] for call in responses.calls], ["123", "234", "345", "123"]
+        )
+
+    @responses.activate
+    def test_partitioned_lanes_keep_order_per_key(self):
+        test_name = "partitioned_lanes"
+        comp = self._get_test_component(test_name)
+        running = 0
+        max_running = 0
+        lock = threading.Lock()
+
+        def respond(request):
+            nonlocal running, max_running
+            with lock:
+                running += 1
+                max_running = max(max_running, running)
+            time.sleep(0.01)
+            with lock:
+                running -= 1
+            return 200, {}, ""
+
+        responses.add_callback(responses.PUT, url=re.compile("http://functional/api/customers/[A-F]"), callback=respond)
+        comp.run()
+
+        versions = {}
+        for call in responses.calls:
+            versions.setdefault(call.request.url[-1], []).append(json.loads(call.request.body)["version"])
+        self.assertEqual(versions, {customer: ["1", "2", "3", "4"] for customer in "ABCDEF"})
+        self.assertGreater(max_running, 1)
+
+    @patch("http_generic.client.GenericHttpClient.send_request")
+    def test_certificates_written_once(self, send_request):
+        comp = self._get_test_component("partitioned_lanes")
+        api = {"caCertificate": "CA CERTIFICATE", "#clientCertificate": "CLIENT CERTIFICATE"}
+
+        with self._patch_configuration(comp, api=api):
+            comp.run()
+
+        # the same files are used by all iterations, so they share the pooled connections
+        certificate_files = {(call.kwargs["verify"], call.kwargs["cert"]) for call in send_request.call_args_list}
+        self.assertEqual(send_request.call_count, 24)
+        self.assertEqual(len(certificate_files), 1)
+        for path in certificate_files.pop():
+            self.assertFalse(os.path.exists(path))
+
+    def test_hedging_disabled_with_partitioning_lanes(self):
+        comp = self._get_test_component("partitioned_lanes")
+        self._init_component(comp, api={"hedging": {"enabled": True}}, partitioning={"lanes": 1})
+        self.assertIsNotNone(comp._client._hedging)
+
+        self._init_component(comp, api={"hedging": {"enabled": True}})
+        self.assertIsNone(comp._client._hedging)
+
+    def test_partitioning_disabled_with_deferred_retries(self):
+        comp = self._get_test_component("partitioned_lanes")
+        self._init_component(comp, api={"retry_config": {"deferred": {"enabled": True}}})
+
+        with self.assertLogs(level="WARNING"):
+            self.assertIsNone(comp._build_lanes(has_iterations=True))
+
+    @responses.activate
+    def test_duplicate_empty_requests_skipped(self):
+        test_name = "dedup_empty_request"
+        comp = self._get_test_component(test_name)
+
+        responses.add(responses.DELETE, url=re.compile(r"http://functional/api/orders/\d+"))
+        with self.assertLogs(level="INFO") as logs:
+            comp.run()
+
+        self.assertEqual(
+            [call.request.url for call in responses.calls],
+            [
+                "http://functional/api/orders/1",
+                "http://functional/api/orders/2",
+                "http://functional/api/orders/3",
+            ],
+        )
+        self.assertTrue(
+            any("3 requests sent" in line and "3 duplicate requests skipped" in line for line in logs.output)
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,122 @@
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from http_generic.client import GenericHttpClient
+from http_generic.hedging import HedgingPolicy
+
+
+class _SlowFirstHandler(BaseHTTPRequestHandler):
+    """
+    Responds to the first request after a delay, to the other ones immediately.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def _respond(self):
+        with self.server.lock:
+            self.server.requests += 1
+            delay = self.server.delay if self.server.requests == 1 else 0
+        time.sleep(delay)
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        self._respond()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self._respond()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestHedgingPolicy(unittest.TestCase):
+    def test_delay_from_percentile(self):
+        policy = HedgingPolicy(percentile=90, min_samples=10)
+        for latency in range(1, 10):
+            policy.record_latency(latency / 100)
+        self.assertIsNone(policy.get_delay())
+
+        policy.record_latency(1.0)
+
+        self.assertEqual(policy.get_delay(), 1.0)
+        self.assertEqual(HedgingPolicy(delay=0.2).get_delay(), 0.2)
+
+    def test_hedge_budget(self):
+        policy = HedgingPolicy(max_ratio=0.2)
+        for _ in range(10):
+            policy.start_request()
+
+        self.assertEqual([policy.try_hedge() for _ in range(3)], [True, True, False])
+
+    def test_methods(self):
+        self.assertEqual(
+            [HedgingPolicy().applies_to(method) for method in ("GET", "put", "DELETE", "POST", "PATCH")],
+            [True, True, True, False, False],
+        )
+        self.assertTrue(HedgingPolicy(allow_non_idempotent=True).applies_to("POST"))
+        with self.assertRaises(ValueError):
+            HedgingPolicy(max_ratio=2)
+
+
+class TestHedgedRequests(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowFirstHandler)
+        self.server.requests = 0
+        self.server.delay = 0.5
+        self.server.lock = threading.Lock()
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, args=(0.01,), daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def _get_client(self, policy: HedgingPolicy) -> GenericHttpClient:
+        client = GenericHttpClient(
+            f"http://127.0.0.1:{self.server.server_address[1]}/api/", hedging=policy, max_retries=0
+        )
+        self.addCleanup(client.close)
+        return client
+
+    def test_slow_request_hedged(self):
+        policy = HedgingPolicy(delay=0.05, max_ratio=1)
+        client = self._get_client(policy)
+
+        start = time.perf_counter()
+        client.send_request("GET", "orders")
+
+        self.assertLess(time.perf_counter() - start, 0.4)
+        self.assertEqual(self.server.requests, 2)
+        self.assertEqual((policy.requests, policy.hedged, policy.hedge_wins), (1, 1, 1))
+
+    def test_hedged_request_counts_against_host_limit(self):
+        policy = HedgingPolicy(delay=0.05, max_ratio=1)
+        client = GenericHttpClient(
+            f"http://127.0.0.1:{self.server.server_address[1]}/api/",
+            hedging=policy,
+            max_retries=0,
+            max_requests_per_host=1,
+        )
+        self.addCleanup(client.close)
+
+        start = time.perf_counter()
+        client.send_request("GET", "orders")
+
+        # the duplicate waits until the slow request finished
+        self.assertGreaterEqual(time.perf_counter() - start, 0.5)
+        self.assertEqual(policy.hedge_wins, 0)
+
+    def test_post_not_hedged(self):
+        policy = HedgingPolicy(delay=0.05, max_ratio=1)
+        client = self._get_client(policy)
+
+        client.send_request("POST", "orders", data="1")
+
+        self.assertEqual((policy.requests, self.server.requests), (0, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,166 @@
+import csv
+import io
+import unittest
+
+from json_converter import JsonConverter, RowConversionPlan
+
+
+def _reader(csv_string: str):
+    return csv.reader(io.StringIO(csv_string), lineterminator="\n")
+
+
+class TestRowConversionPlan(unittest.TestCase):
+    def test_nested_columns(self):
+        plan = RowConversionPlan(["id", "address___city", "address___country"], nesting_delimiter="___")
+
+        self.assertEqual(
+            plan.convert_row(["123", "London", "UK"]), {"id": 123, "address": {"city": "London", "country": "UK"}}
+        )
+
+    def test_deep_nesting_single_column(self):
+        plan = RowConversionPlan(["compan_name_code"], nesting_delimiter="_")
+
+        self.assertEqual(plan.convert_row(["TEST Inc."]), {"compan": {"name": {"code": "TEST Inc."}}})
+
+    def test_renamed_column_moved_to_end_of_parent(self):
+        plan = RowConversionPlan(
+            ["id", "address___city", "address___country", "phone"],
+            nesting_delimiter="___",
+            column_name_override={"address___city": "city.address"},
+        )
+        result = plan.convert_row(["1", "London", "UK", "755"])
+
+        self.assertEqual(result, {"id": 1, "address": {"country": "UK", "city.address": "London"}, "phone": 755})
+        self.assertEqual(list(result["address"].keys()), ["country", "city.address"])
+
+    def test_column_types(self):
+        plan = RowConversionPlan(
+            ["phone", "rank", "active", "json", "other"],
+            column_types={"phone": "string", "rank": "number", "active": "bool", "json": "object"},
+            infer_undefined=False,
+        )
+
+        self.assertEqual(
+            plan.convert_row(["755", "1.5", "yes", '{"a": [1]}', "12"]),
+            {"phone": "755", "rank": 1.5, "active": True, "json": {"a": [1]}, "other": "12"},
+        )
+        self.assertEqual(plan.convert_row(["", "", "", "", ""])["rank"], None)
+        self.assertEqual(
+            [plan.convert_row(["755", value, "yes", "{}", "12"])["rank"] for value in ("+1", ".5", " 12 ", "1e5")],
+            [1, 0.5, 12, 100000.0],
+        )
+        for value in ("nan", "inf", "1e999"):
+            with self.assertRaisesRegex(ValueError, f'column "rank": Value "{value}" is not a finite number'):
+                plan.convert_row(["755", value, "yes", "{}", "12"])
+        with self.assertRaisesRegex(ValueError, 'column "rank": Value "1,5" is not a number'):
+            plan.convert_row(["755", "1,5", "yes", "{}", "12"])
+
+    def test_inferred_types(self):
+        plan = RowConversionPlan(["a", "b", "c", "d", "e", "f"])
+
+        self.assertEqual(
+            plan.convert_row(["123", "1.5", "NaN", "007", "True", "1e999"]),
+            {"a": 123, "b": 1.5, "c": "NaN", "d": "007", "e": True, "f": "1e999"},
+        )
+
+    def test_plan_compiled_once(self):
+        plan = RowConversionPlan(["id", "a__b"])
+
+        self.assertEqual([c.name for c in plan.columns], ["id", "a__b"])
+        self.assertEqual(plan.columns[1].parents, ("a",))
+
+    def test_short_row_padded(self):
+        plan = RowConversionPlan(["a", "b"], infer_undefined=False)
+
+        self.assertEqual(plan.convert_row(["1"]), {"a": "1", "b": ""})
+
+    def test_unsupported_type_fails(self):
+        with self.assertRaises(ValueError):
+            RowConversionPlan(["a"], column_types={"a": "date"})
+
+    def test_conflicting_columns_fail(self):
+        with self.assertRaises(ValueError):
+            RowConversionPlan(["a", "a__b"])
+
+
+class TestJsonConverter(unittest.TestCase):
+    def test_chunks(self):
+        converter = JsonConverter(chunk_size=2, column_data_types=[{"column": "phone", "type": "string"}])
+        chunks = list(converter.convert_stream(_reader("id,phone\n1,755\n2,766\n3,777\n")))
+
+        self.assertEqual(chunks, [[{"id": 1, "phone": "755"}, {"id": 2, "phone": "766"}], [{"id": 3, "phone": "777"}]])
+        self.assertEqual(converter.rows_converted, 3)
+
+    def test_single_row_chunk_is_object(self):
+        converter = JsonConverter(chunk_size=1)
+        chunks = list(converter.convert_stream(_reader("id\n1\n2\n")))
+
+        self.assertEqual(chunks, [{"id": 1}, {"id": 2}])
+
+    def test_legacy_type_override_format(self):
+        converter = JsonConverter(chunk_size=1, column_data_types=[{"id": "string"}])
+
+        self.assertEqual(list(converter.convert_stream(_reader("id\n1\n"))), [{"id": "1"}])
+
+    def test_data_wrapper(self):
+        converter = JsonConverter(chunk_size=2, data_wrapper='{"data": [[data]]}')
+
+        self.assertEqual(list(converter.convert_stream(_reader("id\n1\n"))), [{"data": [{"id": 1}]}])
+
+    def test_sample_inferred_types_are_stable(self):
+        converter = JsonConverter(chunk_size=10, inference_sample_size=2)
+        rows = list(converter.convert_stream(_reader("zip,price,active\n12345,1,true\n23456,,false\n1234A,2.5,n/a\n")))
+
+        self.assertEqual(
+            rows[0],
+            [
+                {"zip": 12345, "price": 1, "active": True},
+                {"zip": 23456, "price": None, "active": False},
+                {"zip": "1234A", "price": 2.5, "active": "n/a"},
+            ],
+        )
+
+    def test_sample_mixed_column_is_string(self):
+        converter = JsonConverter(chunk_size=10, inference_sample_size=10)
+        rows = list(converter.convert_stream(_reader("zip\n12345\n1234A\n")))
+
+        self.assertEqual(rows[0], [{"zip": "12345"}, {"zip": "1234A"}])
+
+    def test_sample_override_takes_precedence(self):
+        converter = JsonConverter(chunk_size=1, inference_sample_size=10, column_data_types=[{"zip": "string"}])
+
+        self.assertEqual(list(converter.convert_stream(_reader("zip\n123\n"))), [{"zip": "123"}])
+
+    def test_sample_fallbacks(self):
+        csv_string = "zip\n123\nabc\n"
+        converter = JsonConverter(chunk_size=10, inference_sample_size=1, type_fallback="null")
+        self.assertEqual(list(converter.convert_stream(_reader(csv_string))), [[{"zip": 123}, {"zip": None}]])
+
+        converter = JsonConverter(chunk_size=10, inference_sample_size=1, type_fallback="fail")
+        with self.assertRaises(ValueError):
+            list(converter.convert_stream(_reader(csv_string)))
+
+        with self.assertRaises(ValueError):
+            JsonConverter(type_fallback="unknown")
+
+    def test_storage_types_overridden_by_datatype_override(self):
+        converter = JsonConverter(
+            chunk_size=1,
+            infer_data_types=False,
+            storage_column_types={"id": "number", "zip": "number"},
+            column_data_types=[{"column": "zip", "type": "string"}],
+        )
+
+        self.assertEqual(
+            list(converter.convert_stream(_reader("id,zip,name\n1,007,5\n"))), [{"id": 1, "zip": "007", "name": "5"}]
+        )
+
+    def test_empty_file(self):
+        converter = JsonConverter(chunk_size=2)
+
+        self.assertEqual(list(converter.convert_stream(_reader(""))), [])
+        self.assertEqual(list(converter.convert_stream(_reader("id\n"))), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
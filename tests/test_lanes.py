@@ -0,0 +1,53 @@
+import threading
+import time
+import unittest
+
+from lanes import LanesStopped, OrderedLanes
+
+
+class TestOrderedLanes(unittest.TestCase):
+    def test_order_kept_per_key(self):
+        lanes = OrderedLanes(4)
+        sent = []
+        lock = threading.Lock()
+
+        def send(key, value):
+            time.sleep(0.001 * (value % 3))
+            with lock:
+                sent.append((key, value))
+
+        for value in range(30):
+            for key in ("a", "b", "c", "d", "e"):
+                lanes.submit((key,), lambda key=key, value=value: send(key, value))
+        lanes.close()
+
+        for key in ("a", "b", "c", "d", "e"):
+            self.assertEqual([value for sent_key, value in sent if sent_key == key], list(range(30)))
+        self.assertEqual(sum(lanes.tasks), 150)
+
+    def test_lanes_sent_concurrently(self):
+        lanes = OrderedLanes(2)
+        keys = [("first",), ("second",)]
+        self.assertNotEqual(lanes.get_lane(keys[0]), lanes.get_lane(keys[1]))
+        both_running = threading.Barrier(2, timeout=1)
+
+        for key in keys:
+            lanes.submit(key, both_running.wait)
+        lanes.close()
+
+    def test_failure_stops_lanes(self):
+        lanes = OrderedLanes(2, queue_size=1)
+
+        def fail():
+            raise ValueError("invalid row")
+
+        lanes.submit(("first",), fail)
+        with self.assertRaises(LanesStopped):
+            for _ in range(100):
+                lanes.submit(("first",), lambda: time.sleep(0.01))
+        with self.assertRaisesRegex(ValueError, "invalid row"):
+            lanes.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import gzip
+import io
+import unittest
+from email.parser import BytesParser
+from email.policy import HTTP
+
+from multipart import MultipartBody
+
+CSV_DATA = b'id,name\n1,"multi\nline"\n2,second\n'
+
+
+class _NonSeekableStream(io.BytesIO):
+    def seekable(self):
+        return False
+
+
+def _parse_parts(body: MultipartBody) -> dict:
+    message = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {body.content_type}\r\n\r\n".encode("utf-8") + b"".join(body)
+    )
+    return {
+        part.get_param("name", header="content-disposition"): (
+            part.get_filename(),
+            part.get_content_type(),
+            part.get_payload(decode=True),
+        )
+        for part in message.iter_parts()
+    }
+
+
+class TestMultipartBody(unittest.TestCase):
+    def test_fields_and_file_part(self):
+        body = MultipartBody(
+            io.BytesIO(CSV_DATA), "orders.csv", fields={"source": "keboola", "batch": 1, "tags": ["a", 'b"']}
+        )
+
+        parts = _parse_parts(body)
+
+        self.assertEqual(parts["file"], ("orders.csv", "text/csv", CSV_DATA))
+        self.assertEqual(parts["source"][2], b"keboola")
+        self.assertEqual(parts["batch"][2], b"1")
+        self.assertEqual(parts["tags"][2], b'["a", "b\\""]')
+        self.assertEqual(list(parts), ["source", "batch", "tags", "file"])
+        self.assertEqual(body.len, len(b"".join(body)))
+
+    def test_body_replayed(self):
+        for stream in (io.BytesIO(CSV_DATA), _NonSeekableStream(CSV_DATA)):
+            body = MultipartBody(stream, "orders.csv", file_field="upload")
+            first_attempt = b"".join(body)
+
+            self.assertEqual(b"".join(body), first_attempt)
+            self.assertEqual(_parse_parts(body)["upload"][2], CSV_DATA)
+            body.close()
+
+    def test_gzipped_file_part(self):
+        body = MultipartBody(io.BytesIO(CSV_DATA), "orders.csv", compress=True)
+
+        file_name, content_type, content = _parse_parts(body)["file"]
+
+        self.assertEqual((file_name, content_type), ("orders.csv.gz", "application/gzip"))
+        self.assertEqual(gzip.decompress(content), CSV_DATA)
+        # sent with the chunked transfer encoding
+        self.assertFalse(hasattr(body, "len"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import io
+import json
+import unittest
+from unittest.mock import patch
+
+import ndjson
+from json_converter import JsonConverter
+from ndjson import NdjsonConverter
+
+CSV_DATA = "id,name,address__city\n" + "".join(f"{i},Name {i},City {i}\n" for i in range(1, 6))
+
+
+def _bodies(csv_string: str = CSV_DATA, **kwargs) -> list:
+    converter = NdjsonConverter(JsonConverter(nesting_delimiter="__", chunk_size=1), **kwargs)
+    return [b"".join(body) for body in converter.iterate_bodies(io.StringIO(csv_string))]
+
+
+class TestNdjsonConverter(unittest.TestCase):
+    def test_rows_as_lines(self):
+        bodies = _bodies()
+
+        self.assertEqual(len(bodies), 1)
+        lines = bodies[0].decode("utf-8").splitlines()
+        self.assertEqual(json.loads(lines[0]), {"id": 1, "name": "Name 1", "address": {"city": "City 1"}})
+        self.assertEqual(len(lines), 5)
+        self.assertTrue(bodies[0].endswith(b"\n"))
+
+    def test_row_and_byte_limits(self):
+        self.assertEqual([body.count(b"\n") for body in _bodies(max_rows=2)], [2, 2, 1])
+
+        line_size = len(_bodies(max_rows=1)[0])
+        self.assertEqual([body.count(b"\n") for body in _bodies(max_bytes=line_size * 2 + 1)], [2, 2, 1])
+        # a line larger than the limit is sent on its own
+        self.assertEqual([body.count(b"\n") for body in _bodies(max_bytes=1)], [1] * 5)
+
+    def test_line_prefix(self):
+        bodies = _bodies(
+            'id,name\n1,"quoted ""name"""\n', line_prefix='{"index": {"_index": "people", "_id": "[[name]]"}}'
+        )
+
+        action, document = bodies[0].decode("utf-8").splitlines()
+        self.assertEqual(json.loads(action), {"index": {"_index": "people", "_id": 'quoted "name"'}})
+        self.assertEqual(json.loads(document), {"id": 1, "name": 'quoted "name"'})
+
+    def test_static_line_prefix(self):
+        lines = _bodies(line_prefix='{"create": {}}')[0].splitlines()
+
+        self.assertEqual(lines[0::2], [b'{"create": {}}'] * 5)
+
+    def test_unknown_prefix_column_fails(self):
+        with self.assertRaises(ValueError):
+            _bodies(line_prefix='{"index": {"_id": "[[missing]]"}}')
+
+    def test_body_replayed(self):
+        converter = NdjsonConverter(JsonConverter(chunk_size=1), max_rows=3)
+        bodies = converter.iterate_bodies(io.StringIO(CSV_DATA))
+        body = next(bodies)
+
+        with patch.object(ndjson, "SEND_BLOCK_SIZE", 1):
+            # interrupted after the first row, e.g. by a connection error
+            next(iter(body))
+            first_attempt = b"".join(body)
+            self.assertEqual(b"".join(body), first_attempt)
+        self.assertEqual((body.rows, first_attempt.count(b"\n")), (3, 3))
+
+    def test_unsent_body_drained(self):
+        converter = NdjsonConverter(JsonConverter(chunk_size=1), max_rows=2)
+
+        bodies = list(converter.iterate_bodies(io.StringIO(CSV_DATA)))
+
+        self.assertEqual([body.rows for body in bodies], [2, 2, 1])
+        self.assertEqual(converter.converter.rows_converted, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
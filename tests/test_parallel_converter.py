@@ -0,0 +1,48 @@
+import csv
+import io
+import json
+import unittest
+
+from json_converter import JsonConverter
+from parallel_converter import ParallelConverter
+
+CSV_DATA = "id,address__city,active,zip\n" + "".join(f"{i},City {i},{i % 2 == 0},{i:05d}\n" for i in range(1, 51))
+
+
+def _convert(csv_string: str = CSV_DATA, **kwargs) -> list:
+    converter = JsonConverter(**kwargs)
+    payloads = list(converter.convert_file(io.StringIO(csv_string)))
+    return [json.loads(payload) if isinstance(payload, bytes) else payload for payload in payloads]
+
+
+class TestParallelConverter(unittest.TestCase):
+    def test_same_as_in_process(self):
+        expected = _convert(chunk_size=7, data_wrapper='{"data": [[data]]}')
+
+        self.assertEqual(_convert(chunk_size=7, data_wrapper='{"data": [[data]]}', workers=2), expected)
+
+    def test_small_tasks_keep_order(self):
+        converter = JsonConverter(chunk_size=1, inference_sample_size=5)
+        parallel_converter = ParallelConverter(converter, workers=2, task_rows=3)
+        reader = csv.reader(io.StringIO(CSV_DATA), lineterminator="\n")
+
+        payloads = [json.loads(payload) for payload in parallel_converter.convert_stream(reader)]
+
+        self.assertEqual(payloads, _convert(chunk_size=1, inference_sample_size=5))
+        self.assertEqual(converter.rows_converted, 50)
+
+    def test_unordered(self):
+        rows = [row for chunk in _convert(chunk_size=10, workers=2, preserve_order=False) for row in chunk]
+
+        self.assertEqual(sorted(row["id"] for row in rows), list(range(1, 51)))
+
+    def test_worker_error_is_raised(self):
+        with self.assertRaises(ValueError):
+            _convert("id\n1\nabc\n", chunk_size=1, workers=2, inference_sample_size=1, type_fallback="fail")
+
+    def test_empty_file(self):
+        self.assertEqual(_convert("id\n", chunk_size=2, workers=2), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
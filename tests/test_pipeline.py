@@ -0,0 +1,50 @@
+import io
+import threading
+import unittest
+
+from json_converter import JsonConverter
+from pipeline import JsonPipeline
+
+CSV_DATA = "id,address__city\n" + "".join(f"{i},City {i}\n" for i in range(1, 101))
+
+
+class TestJsonPipeline(unittest.TestCase):
+    def test_payloads_in_order(self):
+        payloads = []
+        pipeline = JsonPipeline(read_buffer=1, convert_buffer=1, read_batch_rows=7)
+
+        pipeline.run(io.StringIO(CSV_DATA), JsonConverter(chunk_size=10), payloads.append)
+
+        expected = list(JsonConverter(chunk_size=10).convert_file(io.StringIO(CSV_DATA)))
+        self.assertEqual(payloads, expected)
+        metrics = pipeline.get_metrics()
+        self.assertEqual(metrics["rows"]["items"], 15)
+        self.assertEqual(metrics["payloads"]["items"], 10)
+        self.assertLessEqual(metrics["payloads"]["depth_max"], 1)
+
+    def test_conversion_error_is_raised(self):
+        converter = JsonConverter(chunk_size=1, inference_sample_size=1, type_fallback="fail")
+
+        with self.assertRaises(ValueError):
+            JsonPipeline(2, 2).run(io.StringIO("id\n1\nabc\n"), converter, lambda payload: None)
+
+    def test_sender_error_stops_stages(self):
+        def send(payload):
+            raise RuntimeError("Sending failed")
+
+        with self.assertRaises(RuntimeError):
+            JsonPipeline(1, 1, read_batch_rows=1).run(io.StringIO(CSV_DATA), JsonConverter(chunk_size=1), send)
+        self.assertFalse([t for t in threading.enumerate() if t.name.startswith("pipeline-")])
+
+    def test_serialized_engine_merges_read_and_convert(self):
+        payloads = []
+        pipeline = JsonPipeline(2, 2)
+
+        pipeline.run(io.StringIO(CSV_DATA), JsonConverter(chunk_size=50, workers=2), payloads.append)
+
+        self.assertEqual(len(payloads), 2)
+        self.assertNotIn("rows", pipeline.get_metrics())
+
+
+if __name__ == "__main__":
+    unittest.main()
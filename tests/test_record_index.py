@@ -0,0 +1,72 @@
+import csv
+import io
+import os
+import tempfile
+import unittest
+
+from record_index import RecordIndex, count_records
+
+CSV_DATA = (
+    'id,"multi\nline header"\n'
+    '1,"quoted\nnewline"\n'
+    '2,"escaped ""quote"" and\n""newline"""\n'
+    "3,plain\n"
+    '4,"\n\n"\n'
+    '5,""\n'
+    "6,last"
+)
+
+
+class TestRecordIndex(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".csv")
+        self._write(CSV_DATA)
+        os.close(handle)
+        self.rows = list(csv.reader(io.StringIO(CSV_DATA), lineterminator="\n"))
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def _write(self, data: str):
+        with open(self.path, "w", encoding="utf-8", newline="") as out_file:
+            out_file.write(data)
+
+    def _read_rows(self, index: RecordIndex, start_row: int, end_row: int = None) -> list:
+        with index.open_rows(start_row, end_row) as in_stream:
+            return list(csv.reader(in_stream, lineterminator="\n"))
+
+    def test_count_records(self):
+        self.assertEqual(count_records(b'a,"b\n"\nc,""""\n', 0), (2, 0))
+        self.assertEqual(count_records(b'\n"\n', 0), (1, 1))
+        self.assertEqual(count_records(b'x\n"\n', 1), (1, 0))
+
+    def test_row_ranges(self):
+        for block_size in (1, 7, 1024):
+            with RecordIndex(self.path, block_size=block_size) as index:
+                self.assertEqual(index.row_count, 6)
+                for start_row in range(8):
+                    for end_row in range(start_row, 8):
+                        self.assertEqual(
+                            self._read_rows(index, start_row, end_row),
+                            [self.rows[0]] + self.rows[1 + start_row:1 + end_row],
+                        )
+
+    def test_split(self):
+        with RecordIndex(self.path) as index:
+            ranges = index.split(4)
+            shards = [self._read_rows(index, start_row, end_row)[1:] for start_row, end_row in ranges]
+
+        self.assertEqual(ranges, [(0, 1), (1, 3), (3, 4), (4, 6)])
+        self.assertEqual([row for shard in shards for row in shard], self.rows[1:])
+
+    def test_empty_and_header_only_files(self):
+        for data, header in (("", ""), ("id,name", "id,name"), ("id,name\n", "id,name\n")):
+            self._write(data)
+            with RecordIndex(self.path) as index:
+                self.assertEqual(index.row_count, 0)
+                with index.open_rows() as in_stream:
+                    self.assertEqual(in_stream.read(), header)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+
+from request_dedup import RequestDeduplicator
+
+
+class TestRequestDeduplicator(unittest.TestCase):
+    def test_duplicates_skipped(self):
+        deduplicator = RequestDeduplicator()
+
+        self.assertFalse(deduplicator.is_duplicate("DELETE", "http://test.com/orders/1", {"a": 1, "b": 2}))
+        self.assertTrue(deduplicator.is_duplicate("delete", "http://test.com/orders/1", {"b": 2, "a": 1}))
+        self.assertFalse(deduplicator.is_duplicate("GET", "http://test.com/orders/1", {"a": 1, "b": 2}))
+        self.assertFalse(deduplicator.is_duplicate("DELETE", "http://test.com/orders/1", {"a": 1}))
+        self.assertEqual(deduplicator.skipped, 1)
+
+    def test_headers_in_fingerprint(self):
+        deduplicator = RequestDeduplicator()
+
+        self.assertFalse(deduplicator.is_duplicate("DELETE", "http://test.com/orders/1", headers={"X-Tenant": "a"}))
+        self.assertTrue(deduplicator.is_duplicate("DELETE", "http://test.com/orders/1", headers={"x-tenant": "a"}))
+        self.assertFalse(deduplicator.is_duplicate("DELETE", "http://test.com/orders/1", headers={"X-Tenant": "b"}))
+
+    def test_memory_bounded(self):
+        deduplicator = RequestDeduplicator(max_entries=2)
+        for order_id in (1, 2, 3):
+            deduplicator.is_duplicate("DELETE", f"http://test.com/orders/{order_id}")
+
+        # the oldest fingerprint was dropped
+        self.assertFalse(deduplicator.is_duplicate("DELETE", "http://test.com/orders/1"))
+        self.assertTrue(deduplicator.is_duplicate("DELETE", "http://test.com/orders/3"))
+        with self.assertRaises(ValueError):
+            RequestDeduplicator(max_entries=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import threading
+import time
+import unittest
+
+from keboola.component import UserException
+
+from http_generic.client import RetryableRequestError
+from retry_queue import DeferredRetryQueue
+
+
+class _FlakyEndpoint:
+    """
+    Fails each request with a retryable error the configured number of times.
+    """
+
+    def __init__(self, failures: dict):
+        self.failures = failures
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def send_request(self, method, endpoint_path, **kwargs):
+        with self._lock:
+            self.sent.append(endpoint_path)
+            if self.failures.get(endpoint_path, 0) > 0:
+                self.failures[endpoint_path] -= 1
+                raise RetryableRequestError(f"{endpoint_path} failed")
+
+
+class TestDeferredRetryQueue(unittest.TestCase):
+    def test_failed_requests_retried(self):
+        endpoint = _FlakyEndpoint({"first": 2, "second": 1})
+        retry_queue = DeferredRetryQueue(endpoint.send_request, max_attempts=3, backoff_factor=0.01)
+
+        retry_queue.defer(dict(method="POST", endpoint_path="first"), RetryableRequestError("first failed"))
+        retry_queue.defer(dict(method="POST", endpoint_path="second"), RetryableRequestError("second failed"))
+        retry_queue.drain()
+
+        self.assertEqual(sorted(endpoint.sent), ["first", "first", "first", "second", "second"])
+        self.assertEqual((retry_queue.deferred, retry_queue.succeeded, retry_queue.failed), (2, 2, []))
+
+    def test_defer_does_not_wait_for_backoff(self):
+        endpoint = _FlakyEndpoint({})
+        retry_queue = DeferredRetryQueue(endpoint.send_request, backoff_factor=0.2)
+
+        start = time.perf_counter()
+        retry_queue.defer(dict(method="GET", endpoint_path="slow"), RetryableRequestError("slow failed"))
+        self.assertLess(time.perf_counter() - start, 0.1)
+
+        retry_queue.drain()
+        self.assertGreaterEqual(time.perf_counter() - start, 0.2)
+        self.assertEqual(endpoint.sent, ["slow"])
+
+    def test_failures_aggregated(self):
+        endpoint = _FlakyEndpoint({"first": 10, "second": 1})
+        retry_queue = DeferredRetryQueue(endpoint.send_request, max_attempts=2, backoff_factor=0)
+        retry_queue.defer(dict(method="POST", endpoint_path="first"), RetryableRequestError("first failed"))
+        retry_queue.defer(dict(method="POST", endpoint_path="second"), RetryableRequestError("second failed"))
+
+        with self.assertRaisesRegex(UserException, "1 of 2 deferred requests failed after 2 retries: first failed"):
+            retry_queue.drain()
+        self.assertEqual(endpoint.sent.count("first"), 2)
+
+    def test_queue_bounded(self):
+        release = threading.Event()
+        retry_queue = DeferredRetryQueue(lambda **kwargs: release.wait(), backoff_factor=0, workers=1, max_pending=1)
+        retry_queue.defer(dict(method="GET", endpoint_path="first"), RetryableRequestError("first failed"))
+
+        deferred = threading.Event()
+        threading.Thread(
+            target=lambda: (retry_queue.defer(dict(method="GET", endpoint_path="second"), Exception()), deferred.set())
+        ).start()
+        self.assertFalse(deferred.wait(0.1))
+
+        release.set()
+        self.assertTrue(deferred.wait(1))
+        retry_queue.drain()
+        self.assertEqual(retry_queue.succeeded, 2)
+
+    def test_cancel_drops_scheduled_retries(self):
+        endpoint = _FlakyEndpoint({})
+        retry_queue = DeferredRetryQueue(endpoint.send_request, backoff_factor=10)
+        retry_queue.defer(dict(method="GET", endpoint_path="first"), RetryableRequestError("first failed"))
+
+        retry_queue.cancel()
+        retry_queue.drain()
+
+        self.assertEqual(endpoint.sent, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
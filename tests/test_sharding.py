@@ -0,0 +1,89 @@
+import csv
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import arrow_engine
+from json_converter import JsonConverter
+from sharding import find_record_boundaries, get_shard_range, open_shard
+
+CSV_DATA = (
+    'id,"multi\nline header"\n'
+    '1,"quoted\nnewline"\n'
+    '2,"escaped ""quote"" and\n""newline"""\n'
+    "3,plain\n"
+    '4,"\n\n"\n'
+    "5,last\n"
+)
+
+
+def _load(payload):
+    return json.loads(payload) if isinstance(payload, bytes) else payload
+
+
+def _read_shards(path: str, shard_count: int) -> list:
+    shards = []
+    for shard_index in range(shard_count):
+        with open_shard(path, shard_index, shard_count) as in_stream:
+            shards.append(list(csv.reader(in_stream, lineterminator="\n")))
+    return shards
+
+
+class TestSharding(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(handle, "wb") as out_file:
+            out_file.write(CSV_DATA.encode("utf-8"))
+        self.rows = list(csv.reader(io.StringIO(CSV_DATA), lineterminator="\n"))
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_boundaries_skip_quoted_newlines(self):
+        data = CSV_DATA.encode("utf-8")
+        record_starts = [0]
+        for row in self.rows:
+            out_stream = io.StringIO()
+            csv.writer(out_stream, lineterminator="\n").writerow(row)
+            record_starts.append(record_starts[-1] + len(out_stream.getvalue().encode("utf-8")))
+
+        boundaries = find_record_boundaries(io.BytesIO(data), list(range(len(data) + 1)), block_size=5)
+
+        self.assertEqual(sorted(set(boundaries)), record_starts)
+
+    def test_shards_cover_all_rows_once(self):
+        for shard_count in range(1, 8):
+            shards = _read_shards(self.path, shard_count)
+
+            self.assertTrue(all(shard[0] == self.rows[0] for shard in shards))
+            self.assertEqual([row for shard in shards for row in shard[1:]], self.rows[1:])
+
+    def test_header_only_file(self):
+        with open(self.path, "wb") as out_file:
+            out_file.write(b"id,name\n")
+
+        self.assertEqual(_read_shards(self.path, 3), [[["id", "name"]]] * 3)
+
+    def test_invalid_shard_fails(self):
+        with open(self.path, "rb") as in_file:
+            with self.assertRaises(ValueError):
+                get_shard_range(in_file, 2, 2)
+            with self.assertRaises(ValueError):
+                get_shard_range(in_file, 0, 0)
+
+    @unittest.skipUnless(arrow_engine.is_available(), "pyarrow is not installed")
+    def test_arrow_engine_reads_shard(self):
+        for shard_index in range(3):
+            payloads = []
+            for engine in ("python", "arrow"):
+                converter = JsonConverter(chunk_size=10, engine=engine)
+                with open_shard(self.path, shard_index, 3) as in_stream:
+                    payloads.append([_load(payload) for payload in converter.convert_file(in_stream)])
+
+            self.assertEqual(payloads[0], payloads[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
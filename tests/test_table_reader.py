@@ -0,0 +1,98 @@
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import arrow_engine
+import table_reader
+from json_converter import JsonConverter
+from sharding import get_shard_slices
+from table_reader import build_header, list_slices, open_table_stream
+
+HEADER = build_header(["id", "note"])
+
+
+class TestTableReader(unittest.TestCase):
+    def setUp(self):
+        self.table_dir = tempfile.mkdtemp()
+        self.rows = [[str(index), f"note {index}\nline"] for index in range(30)]
+        for slice_index in range(6):
+            slice_rows = self.rows[slice_index * 5:(slice_index + 1) * 5]
+            path = os.path.join(self.table_dir, f"slice_{slice_index}.csv")
+            if slice_index % 2:
+                out_file = gzip.open(path + ".gz", mode="wt", encoding="utf-8", newline="")
+            else:
+                out_file = open(path, mode="wt", encoding="utf-8", newline="")
+            with out_file:
+                csv.writer(out_file, lineterminator="\n").writerows(slice_rows)
+
+    def tearDown(self):
+        shutil.rmtree(self.table_dir)
+
+    def _read(self, slice_paths, **kwargs) -> list:
+        with open_table_stream(slice_paths, HEADER, **kwargs) as in_stream:
+            return list(csv.reader(in_stream, lineterminator="\n"))
+
+    def test_slices_streamed_in_order(self):
+        with patch.object(table_reader, "READ_BLOCK_SIZE", 7), patch.object(table_reader, "SLICE_BUFFER_BLOCKS", 2):
+            for slice_workers in (1, 3, 10):
+                self.assertEqual(
+                    self._read(list_slices(self.table_dir), slice_workers=slice_workers),
+                    [["id", "note"]] + self.rows,
+                )
+
+    def test_single_compressed_file_with_header(self):
+        path = os.path.join(self.table_dir, "table.csv.gz")
+        with gzip.open(path, mode="wb") as out_file:
+            out_file.write(HEADER + b"1,a\n")
+
+        with open_table_stream([path]) as in_stream:
+            self.assertEqual(in_stream.read(), "id,note\n1,a\n")
+
+    def test_slice_without_trailing_newline(self):
+        paths = [os.path.join(self.table_dir, name) for name in ("a.csv", "b.csv", "c.csv")]
+        for path, content in zip(paths, (b"3,4", b"", b"5,6\n")):
+            with open(path, mode="wb") as out_file:
+                out_file.write(content)
+
+        self.assertEqual(self._read(paths), [["id", "note"], ["3", "4"], ["5", "6"]])
+
+    def test_empty_sliced_table(self):
+        self.assertEqual(self._read([]), [["id", "note"]])
+
+    def test_slice_failure_raised(self):
+        path = os.path.join(self.table_dir, "broken.csv.gz")
+        with open(path, mode="wb") as out_file:
+            out_file.write(gzip.compress(b"1,a\n")[:-10])
+
+        with self.assertRaises(EOFError):
+            self._read([path])
+
+    def test_sharded_slices(self):
+        slice_paths = list_slices(self.table_dir)
+
+        shards = [get_shard_slices(slice_paths, shard_index, 4) for shard_index in range(4)]
+
+        self.assertEqual([path for shard in shards for path in shard], slice_paths)
+        self.assertEqual([len(shard) for shard in shards], [1, 2, 1, 2])
+
+    @unittest.skipUnless(arrow_engine.is_available(), "pyarrow is not installed")
+    def test_arrow_engine_reads_stream(self):
+        payloads = []
+        for engine in ("python", "arrow"):
+            converter = JsonConverter(chunk_size=10, engine=engine)
+            with open_table_stream(list_slices(self.table_dir), HEADER) as in_stream:
+                payloads.append(
+                    [json.loads(p) if isinstance(p, bytes) else p for p in converter.convert_file(in_stream)]
+                )
+
+        self.assertEqual(payloads[0], payloads[1])
+        self.assertEqual(len(payloads[0]), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
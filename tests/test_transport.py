@@ -0,0 +1,244 @@
+import io
+import json
+import socket
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from keboola.component import UserException
+
+from http_generic import transport
+from http_generic.auth import ApiKey
+from http_generic.client import GenericHttpClient
+
+try:
+    import h2.config
+    import h2.connection
+    import h2.events
+except ImportError:
+    h2 = None
+
+
+class H2StubServer:
+    """
+    HTTP/2 server without TLS (prior knowledge), responding with the handler for each received request.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.requests = []
+        self.connections = 0
+        self._socket = socket.create_server(("127.0.0.1", 0))
+        self.url = f"http://127.0.0.1:{self._socket.getsockname()[1]}/api/"
+        self._lock = threading.Lock()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                connection, _ = self._socket.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def _serve(self, connection: socket.socket):
+        h2_connection = h2.connection.H2Connection(
+            h2.config.H2Configuration(client_side=False, header_encoding="utf-8")
+        )
+        h2_connection.initiate_connection()
+        connection.sendall(h2_connection.data_to_send())
+        streams = {}
+        with connection:
+            while True:
+                data = connection.recv(65535)
+                if not data:
+                    return
+                for event in h2_connection.receive_data(data):
+                    if isinstance(event, h2.events.RequestReceived):
+                        streams[event.stream_id] = (dict(event.headers), bytearray())
+                    elif isinstance(event, h2.events.DataReceived):
+                        streams[event.stream_id][1].extend(event.data)
+                        h2_connection.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+                    elif isinstance(event, h2.events.StreamEnded):
+                        headers, body = streams.pop(event.stream_id)
+                        with self._lock:
+                            self.requests.append((headers, bytes(body)))
+                            status, content = self.handler(headers, bytes(body))
+                        h2_connection.send_headers(
+                            event.stream_id, [(":status", str(status)), ("content-length", str(len(content)))]
+                        )
+                        h2_connection.send_data(event.stream_id, content, end_stream=True)
+                connection.sendall(h2_connection.data_to_send())
+
+    def close(self):
+        # wakes up the blocked accept
+        self._socket.shutdown(socket.SHUT_RDWR)
+        self._socket.close()
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        time.sleep(self.server.delay)
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestTransports(unittest.TestCase):
+    def test_unsupported_transport(self):
+        with self.assertRaises(ValueError):
+            GenericHttpClient("http://test.com/api/", transport="http3")
+        with self.assertRaises(ValueError):
+            GenericHttpClient("http://test.com/api/", pool_size=0)
+
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+        self.server.connections = 0
+        self.server.delay = 0
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, args=(0.01,), daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/api/"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _get_client(self, **kwargs) -> GenericHttpClient:
+        client = GenericHttpClient(self.url, max_retries=0, **kwargs)
+        self.addCleanup(client.close)
+        return client
+
+    def test_connections_reused(self):
+        client = self._get_client()
+        for _ in range(5):
+            client.send_request("GET", "orders")
+
+        self.assertEqual(client.get_pool_stats(), dict(hits=4, misses=1, preconnected=0, expired=0, discarded=0))
+        self.assertEqual(self.server.connections, 1)
+
+    def test_preconnect(self):
+        client = self._get_client(preconnect=3)
+        client.send_request("GET", "orders")
+        client.send_request("GET", "orders")
+
+        stats = client.get_pool_stats()
+        self.assertEqual((stats["preconnected"], stats["hits"], stats["misses"]), (3, 2, 0))
+        self.assertEqual(self.server.connections, 3)
+
+    def test_idle_connection_closed(self):
+        client = self._get_client(keep_alive_timeout=0.05)
+        client.send_request("GET", "orders")
+        client.send_request("GET", "orders")
+        time.sleep(0.1)
+        client.send_request("GET", "orders")
+
+        stats = client.get_pool_stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["expired"]), (1, 2, 1))
+
+    def test_full_pool_discards_connections(self):
+        self.server.delay = 0.1
+        client = self._get_client(pool_size=1)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda i: client.send_request("GET", "orders"), range(4)))
+
+        stats = client.get_pool_stats()
+        self.assertEqual(stats["misses"], 4)
+        self.assertEqual(stats["discarded"], 3)
+
+
+@unittest.skipUnless(transport.is_http2_available(), "httpx and h2 are not installed")
+class TestHttp2Transport(unittest.TestCase):
+    def _start_server(self, handler) -> H2StubServer:
+        server = H2StubServer(handler)
+        self.addCleanup(server.close)
+        return server
+
+    def _get_client(self, server: H2StubServer, **kwargs) -> GenericHttpClient:
+        client = GenericHttpClient(server.url, transport="http2", backoff_factor=0, **kwargs)
+        self.addCleanup(client.close)
+        return client
+
+    def test_concurrent_requests_multiplexed(self):
+        server = self._start_server(lambda headers, body: (200, body))
+        client = self._get_client(server, max_retries=0)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda i: client.send_request("POST", "orders", json={"id": i}), range(40)))
+
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(sorted(json.loads(body)["id"] for _, body in server.requests), list(range(40)))
+        self.assertEqual(server.requests[0][0][":path"], "/api/orders")
+        self.assertEqual(server.requests[0][0]["content-type"], "application/json")
+
+    def test_retried_status(self):
+        statuses = iter([503, 503, 200])
+        server = self._start_server(lambda headers, body: (next(statuses), b""))
+        client = self._get_client(server, max_retries=2, status_forcelist=(503,))
+
+        client.send_request("POST", "orders", data=io.BytesIO(b"id\n1\n"))
+
+        self.assertEqual([body for _, body in server.requests], [b"id\n1\n"] * 3)
+
+    def test_error_messages(self):
+        server = self._start_server(lambda headers, body: (400 if b"invalid" in body else 503, b"error detail"))
+        client = self._get_client(server, max_retries=1, status_forcelist=(503,))
+
+        with self.assertRaisesRegex(UserException, "non-retryable error. Status Code: 400. Response: error detail"):
+            client.send_request("POST", "orders", data="invalid")
+        with self.assertRaisesRegex(UserException, "too many retries. Status Code: 503. Response: error detail"):
+            client.send_request("POST", "orders", data="valid")
+
+    def test_connection_error(self):
+        with socket.socket() as unused_socket:
+            unused_socket.bind(("127.0.0.1", 0))
+            port = unused_socket.getsockname()[1]
+        client = GenericHttpClient(f"http://127.0.0.1:{port}/api/", transport="http2", max_retries=1, backoff_factor=0)
+        self.addCleanup(client.close)
+
+        with self.assertRaisesRegex(UserException, 'Request "GET: orders" failed with the following error'):
+            client.send_request("GET", "orders")
+
+    def test_auth_and_streamed_body(self):
+        server = self._start_server(lambda headers, body: (200, b""))
+        client = self._get_client(server, max_retries=0)
+        client._auth = ApiKey(key="X-Api-Key", _ApiKey__token="secret", position="headers")
+
+        client.send_request("POST", "upload", data=iter([b"first,", b"second"]), headers={"X-Test": "1"})
+
+        headers, body = server.requests[0]
+        self.assertEqual((headers["x-api-key"], headers["x-test"], body), ("secret", "1", b"first,second"))
+
+    def test_evicted_client_closed_when_released(self):
+        adapter = transport.Http2Adapter()
+        self.addCleanup(adapter.close)
+
+        with patch.object(transport, "MAX_CLIENTS", 1):
+            sending = adapter._acquire_client("http://first.test.com/", True, None, {})
+            idle = adapter._acquire_client("https://second.test.com/", True, None, {})
+            adapter._release_client(idle)
+            adapter._acquire_client("https://third.test.com/", False, None, {})
+
+        # the first client is still sending a request, the idle one is closed right away
+        self.assertEqual((sending.is_closed, idle.is_closed), (False, True))
+        adapter._release_client(sending)
+        self.assertTrue(sending.is_closed)
+
+
+if __name__ == "__main__":
+    unittest.main()